@@ -3,13 +3,20 @@ Advanced Analytics Router.
 Provides comprehensive analytics, risk assessment, and fraud detection endpoints.
 """
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from fastapi import APIRouter, HTTPException, Query, Depends, Body
-from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Body, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, constr
 
 from app.security.auth import SecurityManager, TokenData
 from app.analytics.engine import AnalyticsEngine, PatternDetector, RiskScorer
-from app.services.db import DatabaseService
+from app.intelligence.pattern_detector import pattern_engine, AlertSeverity, PatternType
+from app.intelligence.alert_cache import CachedAlerts, pattern_cache
+from app.intelligence.pattern_detector import PatternAlert
+from app.intelligence.streaming import stream_detector
+from app.intelligence import merchant_risk
+from app.llm.adapter import llm_adapter
+from app.security.pii_redactor import pii_redactor, PIIMatch
 from app.security.pii_handler import PIIHandler
 from app.core.config import get_settings
 
@@ -17,10 +24,21 @@ settings = get_settings()
 router = APIRouter(prefix="/v1/analytics", tags=["analytics"])
 security = SecurityManager()
 analytics = AnalyticsEngine()
-db = DatabaseService()
 pii_handler = PIIHandler()
 
 # Response Models
+class PatternAlertResponse(BaseModel):
+    """Pattern alert response."""
+    id: str
+    pattern_type: str
+    severity: str
+    title: str
+    description: str
+    entities_involved: List[str]
+    confidence_score: float
+    detected_at: datetime
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
 class PatternResponse(BaseModel):
     """Pattern detection response."""
     type: str
@@ -37,6 +55,12 @@ class MerchantRiskResponse(BaseModel):
     factors: Dict[str, Any]
     stats: Dict[str, Any]
 
+class MerchantRiskRankingResponse(BaseModel):
+    """Riskiest merchants of a window, from the materialized scores"""
+    days_back: int
+    refreshed_at: datetime
+    merchants: List[MerchantRiskResponse]
+
 class PIIAnalysisResponse(BaseModel):
     """PII analysis response"""
     original_text: str
@@ -46,14 +70,43 @@ class PIIAnalysisResponse(BaseModel):
     redaction_count: int
     detected_types: List[str]
 
+class PIIBatchRequest(BaseModel):
+    """Batch PII analysis request"""
+    texts: List[constr(max_length=settings.max_narrative_length)] = Field(..., min_items=1, max_items=10000)
+
 class LLMUsageResponse(BaseModel):
     """LLM usage statistics response"""
     total_cost: float
     total_tokens: int
     provider_stats: Dict[str, Any]
 
+class LiveAlertsResponse(BaseModel):
+    """Alerts fired by the streaming detector as cases completed"""
+    alerts: List[PatternAlertResponse]
+    detector: Dict[str, Any]
+
+def _alert_response(alert: PatternAlert) -> PatternAlertResponse:
+    return PatternAlertResponse(
+        id=alert.id,
+        pattern_type=alert.pattern_type.value,
+        severity=alert.severity.value,
+        title=alert.title,
+        description=alert.description,
+        entities_involved=alert.entities_involved,
+        confidence_score=alert.confidence_score,
+        detected_at=alert.detected_at,
+        metadata=alert.metadata
+    )
+
+def _set_cache_age(response: Response, cached: CachedAlerts) -> int:
+    """Expose the age of cached alerts as an HTTP ``Age`` header; returns it"""
+    age = int(cached.age_seconds())
+    response.headers["Age"] = str(age)
+    return age
+
 @router.get("/patterns", response_model=List[PatternAlertResponse])
 async def get_pattern_alerts(
+    response: Response,
     days_back: int = Query(30, ge=1, le=90, description="Days to analyze"),
     severity: Optional[str] = Query(None, description="Filter by severity level"),
     pattern_type: Optional[str] = Query(None, description="Filter by pattern type")
@@ -66,9 +119,14 @@ async def get_pattern_alerts(
     - Unusual customer behavior
     - Temporal anomalies
     - Amount-based suspicious patterns
+    
+    Alerts come from a per-window cache refreshed in the background; the
+    ``Age`` response header gives their age in seconds.
     """
     try:
-        alerts = await pattern_engine.analyze_dispute_patterns(days_back)
+        cached = await pattern_cache.get(days_back)
+        _set_cache_age(response, cached)
+        alerts = cached.alerts
         
         # Apply filters
         if severity:
@@ -86,24 +144,41 @@ async def get_pattern_alerts(
                 raise HTTPException(status_code=400, detail=f"Invalid pattern type: {pattern_type}")
         
         # Convert to response format
-        return [
-            PatternAlertResponse(
-                id=alert.id,
-                pattern_type=alert.pattern_type.value,
-                severity=alert.severity.value,
-                title=alert.title,
-                description=alert.description,
-                entities_involved=alert.entities_involved,
-                confidence_score=alert.confidence_score,
-                detected_at=alert.detected_at,
-                metadata=alert.metadata
-            )
-            for alert in alerts
-        ]
+        return [_alert_response(alert) for alert in alerts]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Pattern analysis failed: {str(e)}")
 
+@router.get("/alerts/live", response_model=LiveAlertsResponse)
+async def get_live_alerts(limit: int = Query(100, ge=1, le=1000, description="Most recent alerts to return")):
+    """
+    Alerts fired in real time as cases completed, most recent first
+    
+    Unlike /patterns, these come from sliding-window thresholds evaluated
+    on every case (``ENABLE_REAL_TIME_ALERTS``), within this worker.
+    """
+    return LiveAlertsResponse(
+        alerts=[_alert_response(alert) for alert in stream_detector.recent_alerts(limit)],
+        detector=stream_detector.stats()
+    )
+
+@router.get("/merchants/risk", response_model=MerchantRiskRankingResponse)
+async def get_riskiest_merchants(
+    top_k: int = Query(100, ge=1, le=10000, description="Number of merchants to return"),
+    days_back: int = Query(settings.pattern_detection_window_days, ge=1, le=90, description="Days to analyze")
+):
+    """
+    Rank the whole merchant portfolio by risk score, riskiest first
+    
+    Scores use the same factors as /merchants/{id}/risk, computed for all
+    merchants in bulk and materialized; they are refreshed incrementally
+    when older than ``MERCHANT_RISK_REFRESH_SECONDS``.
+    """
+    try:
+        return MerchantRiskRankingResponse(**await merchant_risk.top_merchants(days_back, top_k))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Risk ranking failed: {str(e)}")
+
 @router.get("/merchants/{merchant_id}/risk", response_model=MerchantRiskResponse)
 async def get_merchant_risk_score(
     merchant_id: str,
@@ -133,28 +208,41 @@ async def analyze_pii(text: str):
     before sending text to LLM providers for processing.
     """
     try:
-        # Detect PII
-        pii_matches = pii_redactor.detect_pii(text)
-        
-        # Generate redacted version
-        redacted_text, _ = pii_redactor.redact_text(text)
-        
-        # Create summary
-        pii_summary = pii_redactor.get_redaction_summary(pii_matches)
-        detected_types = list(set(match.pii_type.value for match in pii_matches))
-        
-        return PIIAnalysisResponse(
-            original_text=text,
-            redacted_text=redacted_text,
-            pii_detected=len(pii_matches) > 0,
-            pii_summary=pii_summary,
-            redaction_count=len(pii_matches),
-            detected_types=detected_types
-        )
+        # Detect PII and generate redacted version
+        redacted_text, pii_matches = pii_redactor.redact_text(text)
+        return _pii_analysis(text, redacted_text, pii_matches)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PII analysis failed: {str(e)}")
 
+@router.post("/pii/analyze/batch")
+async def analyze_pii_batch(request: PIIBatchRequest):
+    """
+    Analyze a batch of texts for PII
+    
+    Texts are redacted across the worker process pool. The response is
+    NDJSON: one PIIAnalysisResponse per line, in request order, streamed
+    as results become ready.
+    """
+    async def lines():
+        index = 0
+        async for redacted_text, pii_matches in pii_redactor.stream_redact_many(request.texts):
+            analysis = _pii_analysis(request.texts[index], redacted_text, pii_matches)
+            index += 1
+            yield analysis.json() + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _pii_analysis(text: str, redacted_text: str, pii_matches: List[PIIMatch]) -> PIIAnalysisResponse:
+    return PIIAnalysisResponse(
+        original_text=text,
+        redacted_text=redacted_text,
+        pii_detected=len(pii_matches) > 0,
+        pii_summary=pii_redactor.get_redaction_summary(pii_matches),
+        redaction_count=len(pii_matches),
+        detected_types=list(set(match.pii_type.value for match in pii_matches))
+    )
+
 @router.get("/llm/usage", response_model=LLMUsageResponse)
 async def get_llm_usage_stats():
     """
@@ -179,7 +267,7 @@ async def get_llm_usage_stats():
         raise HTTPException(status_code=500, detail=f"Usage stats retrieval failed: {str(e)}")
 
 @router.get("/dashboard")
-async def get_dashboard_data(days_back: int = Query(7, ge=1, le=30)):
+async def get_dashboard_data(response: Response, days_back: int = Query(7, ge=1, le=30)):
     """
     Get comprehensive dashboard data for analytics overview
     
@@ -187,8 +275,9 @@ async def get_dashboard_data(days_back: int = Query(7, ge=1, le=30)):
     for the specified time period.
     """
     try:
-        # Get pattern alerts
-        alerts = await pattern_engine.analyze_dispute_patterns(days_back)
+        # Get pattern alerts (cached; see /patterns)
+        cached = await pattern_cache.get(days_back)
+        alerts = cached.alerts
         
         # Get LLM usage stats
         llm_stats = llm_adapter.get_usage_stats()
@@ -221,6 +310,8 @@ async def get_dashboard_data(days_back: int = Query(7, ge=1, le=30)):
         return {
             "period_days": days_back,
             "generated_at": datetime.utcnow(),
+            "alerts_computed_at": datetime.utcfromtimestamp(cached.computed_at),
+            "cache_age_seconds": _set_cache_age(response, cached),
             "alerts": alert_summary,
             "llm_usage": {
                 "total_cost": llm_stats.get("total_cost", 0.0),
@@ -238,11 +329,13 @@ async def get_dashboard_data(days_back: int = Query(7, ge=1, le=30)):
         raise HTTPException(status_code=500, detail=f"Dashboard data generation failed: {str(e)}")
 
 @router.get("/health")
-async def analytics_health_check():
+async def analytics_health_check(response: Response):
     """Health check for analytics services"""
+    cache_age = None
     try:
-        # Test pattern engine
-        test_alerts = await pattern_engine.analyze_dispute_patterns(1)
+        # Test pattern engine (through the cache: a recent analysis suffices)
+        cached = await pattern_cache.get(1)
+        cache_age = _set_cache_age(response, cached)
         pattern_engine_healthy = True
     except Exception:
         pattern_engine_healthy = False
@@ -275,5 +368,6 @@ async def analytics_health_check():
             "llm_adapter": "healthy" if llm_adapter_healthy else "unhealthy",
             "pii_redactor": "healthy" if pii_redactor_healthy else "unhealthy"
         },
+        "pattern_cache_age_seconds": cache_age,
         "timestamp": datetime.utcnow()
     }
\ No newline at end of file
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.domain.schemas import DisputeIn, DisputeOut, Classification, Recommendation, MetricsOut, AuditLogOut, AuditEventOut
 from app.services.orchestrator import process_case, get_dispute_by_id, get_audit_log
 from app.infra.db import get_db
-from app.telemetry.metrics import metrics
+from app.telemetry.metrics import metrics, WINDOW_PATTERN
 from app.telemetry.audit import get_audit_events
 import uuid
 import time
@@ -94,11 +95,11 @@ async def get_dispute_audit_log(dispute_id: str):
         
         events = [
             AuditEventOut(
-                step=event.step,
-                timestamp=event.timestamp,
-                latency_ms=event.latency_ms,
-                success=event.success,
-                details=event.payload_json.get("details") if event.payload_json else None
+                step=event["step"],
+                timestamp=event["timestamp"],
+                latency_ms=event["latency_ms"],
+                success=event["success"],
+                details=event.get("details")
             )
             for event in audit_events
         ]
@@ -112,9 +113,11 @@ async def get_dispute_audit_log(dispute_id: str):
         raise HTTPException(status_code=500, detail=f"Error retrieving audit log: {str(e)}")
 
 @router.get("/metrics", response_model=MetricsOut)
-async def get_metrics():
+async def get_metrics(
+    window: Optional[str] = Query(None, regex=WINDOW_PATTERN, description="Rolling window (1m, 5m, 1h); lifetime if omitted")
+):
     """Get system metrics"""
-    return metrics.snapshot()
+    return metrics.snapshot(window)
 
 @router.get("/health")
 async def health_check():
@@ -0,0 +1,95 @@
+"""
+Bounded In-Process Caches.
+
+``LRUCache`` is a size-bounded, optionally TTL-bounded mapping whose
+lookups are reported to the ``cache_requests_total`` metric under the
+cache's name.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+from ..telemetry.prometheus import record_cache
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    Least-recently-used cache with per-entry expiry.
+
+    Every entry expires ``ttl_seconds`` after it was stored (never if
+    ``ttl_seconds`` is None) or at the absolute ``expires_at`` passed to
+    ``set``, whichever comes first. Expired entries are dropped when looked
+    up or when they reach the LRU end.
+
+    ``on_evict(key, value, expires_at)`` is called for live entries pushed
+    out by the size bound, e.g. to spill them to slower storage.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int,
+        ttl_seconds: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, V, float], None]] = None
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+
+    def get(self, key: Hashable, now: Optional[float] = None) -> Optional[V]:
+        now = time.time() if now is None else now
+        entry = self._entries.get(key)
+        if entry is not None and now >= entry[1]:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            record_cache(self.name, False)
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        record_cache(self.name, True)
+        return entry[0]
+
+    def set(self, key: Hashable, value: V, expires_at: Optional[float] = None, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        deadline = now + self.ttl_seconds if self.ttl_seconds is not None else float("inf")
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        self._entries[key] = (value, deadline)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            evicted_key, (evicted, evicted_deadline) = self._entries.popitem(last=False)
+            if self.on_evict is not None and evicted_deadline > now:
+                self.on_evict(evicted_key, evicted, evicted_deadline)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
@@ -69,6 +69,16 @@ class Settings(BaseModel):
         os.getenv("JWT_SECRET", "changeme"),
         description="JWT signing secret"
     )
+    auth_cache_size: int = Field(
+        int(os.getenv("AUTH_CACHE_SIZE", "10000")),
+        description="Max verified tokens / API-key principals cached",
+        ge=1
+    )
+    auth_cache_ttl_seconds: int = Field(
+        int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60")),
+        description="Max time a cached credential is trusted (revocation delay)",
+        ge=0
+    )
     cors_origins: List[str] = Field(
         os.getenv("CORS_ORIGINS", "*").split(","),
         description="Allowed CORS origins"
@@ -110,6 +120,52 @@ class Settings(BaseModel):
         ge=0.0,
         le=1.0
     )
+    pii_spacy_model: str = Field(
+        os.getenv("PII_SPACY_MODEL", "en_core_web_lg"),
+        description="spaCy model used by the presidio analyzer"
+    )
+    pii_analysis_cache_size: int = Field(
+        int(os.getenv("PII_ANALYSIS_CACHE_SIZE", "1024")),
+        description="Presidio analyses cached by text digest",
+        ge=1
+    )
+    pii_scan_chunk_size: int = Field(
+        int(os.getenv("PII_SCAN_CHUNK_SIZE", "8192")),
+        description="Characters per window when scanning long narratives for PII",
+        ge=256
+    )
+    pii_tokenize_for_llm: bool = Field(
+        os.getenv("PII_TOKENIZE_FOR_LLM", "0") == "1",
+        description="Replace PII sent to the LLM with reversible per-case tokens instead of masks"
+    )
+    pii_vault_key: Optional[str] = Field(
+        os.getenv("PII_VAULT_KEY"),
+        description="Fernet key encrypting vault mappings (random per process if unset)"
+    )
+    pii_vault_max_entries: int = Field(
+        int(os.getenv("PII_VAULT_MAX_ENTRIES", "100000")),
+        description="Token mappings kept in memory",
+        ge=1
+    )
+    pii_vault_ttl_seconds: int = Field(
+        int(os.getenv("PII_VAULT_TTL_SECONDS", "86400")),
+        description="Lifetime of a token mapping",
+        ge=60
+    )
+    pii_vault_spill_dir: str = Field(
+        os.getenv("PII_VAULT_SPILL_DIR", ""),
+        description="Directory for mappings evicted from memory (empty = discard)"
+    )
+    pii_batch_workers: int = Field(
+        int(os.getenv("PII_BATCH_WORKERS", "0")),
+        description="Worker processes for batch PII redaction (0 = CPU count)",
+        ge=0
+    )
+    pii_batch_chunk_size: int = Field(
+        int(os.getenv("PII_BATCH_CHUNK_SIZE", "32")),
+        description="Texts sent to a batch redaction worker at a time",
+        ge=1
+    )
     max_narrative_length: int = Field(
         int(os.getenv("MAX_NARRATIVE_LENGTH", "10000")),
         description="Max narrative text length",
@@ -121,6 +177,26 @@ class Settings(BaseModel):
         description="API rate limit per minute",
         ge=1
     )
+    rate_limit_burst: int = Field(
+        int(os.getenv("RATE_LIMIT_BURST", "20")),
+        description="Requests a key may send back to back before being paced",
+        ge=1
+    )
+    rate_limit_backend: str = Field(
+        os.getenv("RATE_LIMIT_BACKEND", "memory"),
+        description="Rate limiter state: memory (per replica) or redis (shared)",
+        regex="^(memory|redis)$"
+    )
+    rate_limit_lease_size: int = Field(
+        int(os.getenv("RATE_LIMIT_LEASE_SIZE", "4")),
+        description="Requests a replica may take from Redis at once and spend locally",
+        ge=1
+    )
+    rate_limit_lease_ttl_ms: int = Field(
+        int(os.getenv("RATE_LIMIT_LEASE_TTL_MS", "250")),
+        description="How long a locally held lease stays valid",
+        ge=0
+    )
     
     # Analytics settings
     enable_pattern_detection: bool = Field(
@@ -133,6 +209,51 @@ class Settings(BaseModel):
         ge=1,
         le=365
     )
+    pattern_cache_ttl_seconds: int = Field(
+        int(os.getenv("PATTERN_CACHE_TTL_SECONDS", "60")),
+        description="Age after which cached pattern alerts are revalidated in the background",
+        ge=1
+    )
+    pattern_cache_max_stale_seconds: int = Field(
+        int(os.getenv("PATTERN_CACHE_MAX_STALE_SECONDS", "600")),
+        description="Extra age for which stale alerts are still served while revalidating",
+        ge=0
+    )
+    pattern_cache_invalidate_cases: int = Field(
+        int(os.getenv("PATTERN_CACHE_INVALIDATE_CASES", "50")),
+        description="New cases after which cached alerts are revalidated early",
+        ge=1
+    )
+    pattern_refresh_interval_seconds: int = Field(
+        int(os.getenv("PATTERN_REFRESH_INTERVAL_SECONDS", "30")),
+        description="Cadence of the background pattern alert refresh",
+        ge=1
+    )
+    stream_window_seconds: int = Field(
+        int(os.getenv("STREAM_WINDOW_SECONDS", "3600")),
+        description="Sliding window of the real-time (streaming) pattern thresholds",
+        ge=1
+    )
+    stream_bucket_seconds: int = Field(
+        int(os.getenv("STREAM_BUCKET_SECONDS", "300")),
+        description="Time bucket of the streaming window counters",
+        ge=1
+    )
+    stream_max_entities: int = Field(
+        int(os.getenv("STREAM_MAX_ENTITIES", "100000")),
+        description="Merchants (and, separately, customers) tracked by the streaming detector",
+        ge=1
+    )
+    stream_alert_buffer: int = Field(
+        int(os.getenv("STREAM_ALERT_BUFFER", "1000")),
+        description="Recent streaming alerts kept for /v1/analytics/alerts/live",
+        ge=1
+    )
+    merchant_risk_refresh_seconds: int = Field(
+        int(os.getenv("MERCHANT_RISK_REFRESH_SECONDS", "3600")),
+        description="Cadence of the incremental merchant risk score refresh",
+        ge=1
+    )
     risk_score_threshold: float = Field(
         float(os.getenv("RISK_SCORE_THRESHOLD", "0.8")),
         description="Risk score alert threshold",
@@ -149,10 +270,90 @@ class Settings(BaseModel):
         int(os.getenv("METRICS_PORT", "9090")),
         description="Prometheus metrics port"
     )
+    metrics_multiproc_dir: Optional[str] = Field(
+        os.getenv("METRICS_MULTIPROC_DIR"),
+        description="Shared directory for multi-worker metrics (single-process if unset)"
+    )
+    prometheus_max_label_values: int = Field(
+        int(os.getenv("PROMETHEUS_MAX_LABEL_VALUES", "50")),
+        description="Max distinct values per Prometheus label before collapsing to 'other'",
+        ge=1
+    )
+    prometheus_max_series: int = Field(
+        int(os.getenv("PROMETHEUS_MAX_SERIES", "200")),
+        description="Max label combinations per multi-label Prometheus metric before collapsing to 'other'",
+        ge=1
+    )
     enable_audit_logging: bool = Field(
         os.getenv("ENABLE_AUDIT_LOGGING", "1") == "1",
         description="Enable detailed audit logging"
     )
+    audit_max_events_per_case: int = Field(
+        int(os.getenv("AUDIT_MAX_EVENTS_PER_CASE", "64")),
+        description="Max audit events buffered per case",
+        ge=1
+    )
+    audit_max_open_cases: int = Field(
+        int(os.getenv("AUDIT_MAX_OPEN_CASES", "10000")),
+        description="Max cases with an open audit buffer",
+        ge=1
+    )
+    audit_orphan_ttl_seconds: int = Field(
+        int(os.getenv("AUDIT_ORPHAN_TTL_SECONDS", "300")),
+        description="Age after which an unclosed audit buffer is evicted",
+        ge=1
+    )
+    audit_log_dir: str = Field(
+        os.getenv("AUDIT_LOG_DIR", "./audit_log"),
+        description="Directory for append-only audit log segments (a writer-NNN subdirectory per worker)"
+    )
+    access_log_dir: str = Field(
+        os.getenv("ACCESS_LOG_DIR", "./access_log"),
+        description="Directory for HTTP access event segments, kept apart from dispute audit trails"
+    )
+    audit_segment_max_bytes: int = Field(
+        int(os.getenv("AUDIT_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024))),
+        description="Audit log segment size before rotation",
+        ge=1024
+    )
+    audit_flush_interval_ms: int = Field(
+        int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "50")),
+        description="Max time audit records wait for a group fsync",
+        ge=0
+    )
+    audit_queue_max_records: int = Field(
+        int(os.getenv("AUDIT_QUEUE_MAX_RECORDS", "100000")),
+        description="Max audit records waiting for the writer; further records are dropped and counted",
+        ge=1
+    )
+    audit_retention_days: int = Field(
+        int(os.getenv("AUDIT_RETENTION_DAYS", "365")),
+        description="Audit log retention period",
+        ge=1
+    )
+    audit_compaction_interval_seconds: int = Field(
+        int(os.getenv("AUDIT_COMPACTION_INTERVAL_SECONDS", "3600")),
+        description="Interval between audit log retention/compaction runs",
+        ge=60
+    )
+    enable_tracing: bool = Field(
+        os.getenv("ENABLE_TRACING", "1") == "1",
+        description="Enable pipeline span tracing"
+    )
+    trace_buffer_size: int = Field(
+        int(os.getenv("TRACE_BUFFER_SIZE", "1000")),
+        description="Finished traces kept in memory for /v1/debug/traces",
+        ge=1
+    )
+    trace_export_path: Optional[str] = Field(
+        os.getenv("TRACE_EXPORT_PATH"),
+        description="File for OTLP/JSON trace export (disabled if unset)"
+    )
+    trace_slow_ms: float = Field(
+        float(os.getenv("TRACE_SLOW_MS", "1000")),
+        description="Default threshold for slow traces",
+        ge=0
+    )
     
     # Feature flags
     enable_advanced_enrichment: bool = Field(
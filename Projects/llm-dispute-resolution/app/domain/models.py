@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Text, DateTime, Integer, Float, Boolean, JSON, ForeignKey
+from sqlalchemy import String, Text, DateTime, Integer, Float, Boolean, JSON, ForeignKey, LargeBinary, Index
 import datetime as dt
 import uuid
 from typing import Optional, List
@@ -12,6 +12,20 @@ class Base(DeclarativeBase):
 
 class DisputeCase(Base):
     __tablename__ = "dispute_case"
+    __table_args__ = (
+        # Window scans (rollup backfill, analytics): leads with created_at and
+        # carries the grouped/aggregated columns, so they never touch the table
+        Index(
+            "ix_dispute_case_created_window",
+            "created_at", "merchant_id", "customer_id", "amount_cents", "classification"
+        ),
+        # Per-merchant lookups and per-merchant aggregates (fraud rate, amounts)
+        Index(
+            "ix_dispute_case_merchant_created",
+            "merchant_id", "created_at", "amount_cents", "classification"
+        ),
+        Index("ix_dispute_case_customer_created", "customer_id", "created_at"),
+    )
     
     id: Mapped[str] = mapped_column(String, primary_key=True, default=_uuid)
     external_ref: Mapped[Optional[str]] = mapped_column(String, nullable=True)
@@ -54,6 +68,9 @@ class AuditEvent(Base):
 
 class EvidenceItem(Base):
     __tablename__ = "evidence_item"
+    __table_args__ = (
+        Index("ix_evidence_item_case", "dispute_case_id"),
+    )
     
     id: Mapped[str] = mapped_column(String, primary_key=True, default=_uuid)
     dispute_case_id: Mapped[str] = mapped_column(String, ForeignKey("dispute_case.id"))
@@ -68,6 +85,11 @@ class EvidenceItem(Base):
 
 class TransactionLedger(Base):
     __tablename__ = "transaction_ledger"
+    __table_args__ = (
+        # Enrichment: a customer's transactions in a time range, newest first
+        Index("ix_transaction_ledger_customer_time", "customer_id", "occurred_at"),
+        Index("ix_transaction_ledger_merchant_time", "merchant_id", "occurred_at"),
+    )
     
     id: Mapped[str] = mapped_column(String, primary_key=True, default=_uuid)
     customer_id: Mapped[str] = mapped_column(String)
@@ -77,3 +99,75 @@ class TransactionLedger(Base):
     occurred_at: Mapped[float] = mapped_column(Float)
     status: Mapped[str] = mapped_column(String, default="COMPLETED")
     transaction_type: Mapped[str] = mapped_column(String, default="PURCHASE")
+
+
+# Hourly rollups of dispute_case, maintained as cases are persisted
+# (app/intelligence/rollups.py) and read by the pattern detectors
+
+class MerchantHourRollup(Base):
+    __tablename__ = "rollup_merchant_hour"
+    __table_args__ = (
+        # The primary key serves window reads; this serves per-merchant ones
+        Index("ix_rollup_merchant_hour_merchant", "merchant_id", "bucket_start"),
+    )
+    
+    bucket_start: Mapped[dt.datetime] = mapped_column(DateTime, primary_key=True)
+    merchant_id: Mapped[str] = mapped_column(String, primary_key=True)
+    dispute_count: Mapped[int] = mapped_column(Integer, default=0)
+    fraud_count: Mapped[int] = mapped_column(Integer, default=0)
+    amount_sum: Mapped[int] = mapped_column(Integer, default=0)
+    fraud_amount_sum: Mapped[int] = mapped_column(Integer, default=0)
+    customers_hll: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    amount_hist: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # log-amount bin -> count
+
+class CustomerHourRollup(Base):
+    __tablename__ = "rollup_customer_hour"
+    __table_args__ = (
+        Index("ix_rollup_customer_hour_customer", "customer_id", "bucket_start"),
+    )
+    
+    bucket_start: Mapped[dt.datetime] = mapped_column(DateTime, primary_key=True)
+    customer_id: Mapped[str] = mapped_column(String, primary_key=True)
+    dispute_count: Mapped[int] = mapped_column(Integer, default=0)
+    amount_sum: Mapped[int] = mapped_column(Integer, default=0)
+    merchants_hll: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+
+class LabelHourRollup(Base):
+    __tablename__ = "rollup_label_hour"
+    
+    bucket_start: Mapped[dt.datetime] = mapped_column(DateTime, primary_key=True)
+    label_bucket: Mapped[str] = mapped_column(String, primary_key=True)  # FRAUD or OTHER
+    hour_of_day: Mapped[int] = mapped_column(Integer)
+    dispute_count: Mapped[int] = mapped_column(Integer, default=0)
+    amount_sum: Mapped[int] = mapped_column(Integer, default=0)
+    round_amount_count: Mapped[int] = mapped_column(Integer, default=0)
+    round_amounts: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # amount -> count
+
+
+# Materialized merchant risk scores, refreshed in bulk (app/intelligence/merchant_risk.py)
+
+class MerchantRiskScore(Base):
+    __tablename__ = "merchant_risk_score"
+    __table_args__ = (
+        # Top-K by score within a window, read backwards in the endpoint's order (no sort step)
+        Index("ix_merchant_risk_score_rank", "window_days", "risk_score", "merchant_id"),
+    )
+    
+    window_days: Mapped[int] = mapped_column(Integer, primary_key=True)
+    merchant_id: Mapped[str] = mapped_column(String, primary_key=True)
+    risk_score: Mapped[float] = mapped_column(Float)
+    risk_level: Mapped[str] = mapped_column(String)
+    fraud_score: Mapped[float] = mapped_column(Float)
+    frequency_score: Mapped[float] = mapped_column(Float)
+    diversity_score: Mapped[float] = mapped_column(Float)
+    total_disputes: Mapped[int] = mapped_column(Integer)
+    fraud_disputes: Mapped[int] = mapped_column(Integer)
+    amount_sum: Mapped[int] = mapped_column(Integer)
+    unique_customers: Mapped[int] = mapped_column(Integer)
+    computed_at: Mapped[dt.datetime] = mapped_column(DateTime)
+
+class MerchantRiskRefresh(Base):
+    __tablename__ = "merchant_risk_refresh"
+    
+    window_days: Mapped[int] = mapped_column(Integer, primary_key=True)
+    refreshed_at: Mapped[dt.datetime] = mapped_column(DateTime)
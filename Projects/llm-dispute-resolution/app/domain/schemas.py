@@ -46,12 +46,22 @@ class DisputeOut(BaseModel):
     latency_ms: int
 
 
+class LatencyQuantilesOut(BaseModel):
+    p50: float
+    p90: float
+    p95: float
+    p99: float
+
+
 class MetricsOut(BaseModel):
     total_cases: int
     classification_latency_ms_p95: float
     recommendation_latency_ms_p95: float
+    classification_latency_ms: LatencyQuantilesOut
+    recommendation_latency_ms: LatencyQuantilesOut
     cases_by_label: Dict[str, int]
     avg_cost_per_case_usd: float
+    window: str = "lifetime"
 
 
 class AuditEventOut(BaseModel):
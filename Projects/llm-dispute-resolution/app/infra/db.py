@@ -1,6 +1,8 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from ..core.config import get_settings
 from ..domain.models import Base
+from ..telemetry.tracing import tracer
+from ..telemetry.prometheus import DB_SESSION
 from contextlib import asynccontextmanager
 
 class DBState:
@@ -22,15 +24,16 @@ async def get_session():
     if not db_state.session_maker:
         await init_db()
     assert db_state.session_maker
-    async with db_state.session_maker() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+    with tracer.span("db.session"), DB_SESSION.time():
+        async with db_state.session_maker() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                await session.close()
 
 async def get_db():
     """FastAPI dependency for database session"""
@@ -0,0 +1,150 @@
+"""
+Cached Pattern Alerts.
+
+Pattern analysis results are cached per ``days_back`` and served
+stale-while-revalidate: an entry older than the TTL, or computed before
+more than ``pattern_cache_invalidate_cases`` new cases arrived, is still
+returned while a single background task recomputes it. A background loop
+also checks every recently requested window on a fixed cadence and
+recomputes the stale ones, so dashboards rarely wait for an analysis.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from ..core.config import get_settings
+from ..telemetry.metrics import metrics
+from ..telemetry.prometheus import record_cache
+from .pattern_detector import PatternAlert, PatternDetectionEngine, pattern_engine
+
+settings = get_settings()
+
+# Windows requested by the analytics endpoints by default, kept warm from start-up
+PRECOMPUTE_DAYS = (1, 7, 30)
+
+
+@dataclass
+class CachedAlerts:
+    """Alerts for one window, with when (and at which case count) they were computed"""
+    days_back: int
+    alerts: List[PatternAlert]
+    computed_at: float
+    total_cases: int
+
+    def age_seconds(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.computed_at
+
+
+class PatternAlertCache:
+    """Per-window pattern alerts with stale-while-revalidate refreshes"""
+
+    def __init__(
+        self,
+        engine: PatternDetectionEngine,
+        case_count: Callable[[], int],
+        ttl_seconds: float,
+        max_stale_seconds: float,
+        invalidate_after_cases: int
+    ):
+        self.engine = engine
+        self.case_count = case_count
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.invalidate_after_cases = invalidate_after_cases
+        self._entries: Dict[int, CachedAlerts] = {}
+        self._tasks: Dict[int, asyncio.Task] = {}
+        # Windows to keep refreshed, by when they were last requested
+        self._requested: Dict[int, float] = {days_back: time.time() for days_back in PRECOMPUTE_DAYS}
+
+    def is_stale(self, entry: CachedAlerts, now: Optional[float] = None) -> bool:
+        return (
+            entry.age_seconds(now) > self.ttl_seconds
+            or self.case_count() - entry.total_cases >= self.invalidate_after_cases
+        )
+
+    async def get(self, days_back: int) -> CachedAlerts:
+        """
+        Alerts for ``days_back``, computed only on a cold or expired entry.
+
+        Stale entries are returned immediately and revalidated in the
+        background; past ``ttl + max_stale`` the caller waits for fresh ones.
+        """
+        now = time.time()
+        self._requested[days_back] = now
+        entry = self._entries.get(days_back)
+        if entry is None or entry.age_seconds(now) > self.ttl_seconds + self.max_stale_seconds:
+            record_cache("pattern_alerts", False)
+            return await self._refresh(days_back)
+        record_cache("pattern_alerts", True)
+        if self.is_stale(entry, now):
+            self._task(days_back)  # not awaited: serve stale meanwhile
+        return entry
+
+    def _task(self, days_back: int) -> asyncio.Task:
+        """The running recompute of one window, started if there is none"""
+        task = self._tasks.get(days_back)
+        if task is None:
+            task = asyncio.create_task(self._compute(days_back))
+            self._tasks[days_back] = task
+            task.add_done_callback(lambda t: self._finished(days_back, t))
+        return task
+
+    async def _refresh(self, days_back: int) -> CachedAlerts:
+        # Concurrent callers share one analysis; a cancelled caller does not cancel it
+        return await asyncio.shield(self._task(days_back))
+
+    def _finished(self, days_back: int, task: asyncio.Task) -> None:
+        self._tasks.pop(days_back, None)
+        if not task.cancelled():
+            task.exception()  # retrieved here; callers awaiting it still see it
+
+    async def _compute(self, days_back: int) -> CachedAlerts:
+        total_cases = self.case_count()
+        alerts = await self.engine.analyze_dispute_patterns(days_back)
+        entry = CachedAlerts(days_back, alerts, time.time(), total_cases)
+        self._entries[days_back] = entry
+        return entry
+
+    async def refresh_stale(self) -> List[int]:
+        """
+        Recompute the requested windows that are missing or stale.
+
+        Windows nobody requested within the last stale period are dropped
+        (the pre-computed ones are always kept). Returns the windows
+        recomputed.
+        """
+        now = time.time()
+        horizon = self.ttl_seconds + self.max_stale_seconds
+        refreshed = []
+        for days_back, requested_at in list(self._requested.items()):
+            if now - requested_at > horizon and days_back not in PRECOMPUTE_DAYS:
+                # Nobody asked for this window lately: stop keeping it warm
+                del self._requested[days_back]
+                self._entries.pop(days_back, None)
+                continue
+            entry = self._entries.get(days_back)
+            if entry is not None and not self.is_stale(entry, now):
+                continue
+            try:
+                await self._refresh(days_back)
+                refreshed.append(days_back)
+            except Exception as e:
+                print(f"Pattern alert refresh error: {e}")
+        return refreshed
+
+    async def run_refresh(self, interval_seconds: float) -> None:
+        """Refresh stale windows every ``interval_seconds``, forever"""
+        while True:
+            await self.refresh_stale()
+            await asyncio.sleep(interval_seconds)
+
+# Global pattern alert cache
+pattern_cache = PatternAlertCache(
+    pattern_engine,
+    metrics.total_cases,
+    ttl_seconds=settings.pattern_cache_ttl_seconds,
+    max_stale_seconds=settings.pattern_cache_max_stale_seconds,
+    invalidate_after_cases=settings.pattern_cache_invalidate_cases
+)
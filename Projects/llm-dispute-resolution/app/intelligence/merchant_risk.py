@@ -0,0 +1,312 @@
+"""
+Bulk Merchant Risk Scoring.
+
+Scores every merchant at once with the factors of the per-merchant risk
+score (fraud rate, dispute frequency, customer diversity):
+
+- one grouped query over ``rollup_merchant_hour`` for the counts
+- one streamed read of the hourly customer sketches, in merchant order,
+  merged and counted a batch at a time with NumPy
+- vectorized scoring of the resulting columns
+
+Scores are materialized in ``merchant_risk_score`` per window. A refresh is
+incremental: only merchants with new hours since the last refresh, or with
+hours that have since left the window, are re-scored. Refreshes upsert their
+rows, so workers refreshing the same window at once do not conflict.
+"""
+
+import asyncio
+import datetime as dt
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from ..core.config import get_settings
+from ..domain.models import MerchantHourRollup, MerchantRiskRefresh, MerchantRiskScore
+from ..infra.db import get_session
+from .rollups import MERCHANT_HLL_PRECISION, _insert, hour_bucket
+from .sketches import estimate_counts, merge_runs
+
+settings = get_settings()
+
+# Risk level thresholds on the 0-100 score, highest first
+RISK_LEVELS = [(70, "HIGH"), (40, "MEDIUM"), (20, "LOW"), (0, "MINIMAL")]
+
+# Spares duplicate refreshes within a process; across workers the upserts keep
+# concurrent refreshes safe
+_refresh_lock = asyncio.Lock()
+
+
+def score_merchants(totals: pd.DataFrame, days_back: int) -> pd.DataFrame:
+    """
+    Risk scores for every row of ``totals`` (indexed by merchant_id, with
+    ``dispute_count``, ``fraud_count``, ``amount_sum``, ``unique_customers``).
+    """
+    disputes = totals["dispute_count"].to_numpy(dtype=np.float64)
+    safe_disputes = np.maximum(disputes, 1)
+    fraud_rate = totals["fraud_count"].to_numpy() / safe_disputes
+    dispute_frequency = disputes / days_back  # Disputes per day
+    diversity_ratio = totals["unique_customers"].to_numpy() / safe_disputes
+
+    # Fraud rate (0-40 points), frequency (0-30), lack of customer diversity (0-20)
+    fraud_score = np.minimum(40, fraud_rate * 100)
+    frequency_score = np.minimum(30, dispute_frequency * 10)
+    diversity_score = np.maximum(0, 20 - diversity_ratio * 20)
+    risk_score = np.minimum(100, fraud_score + frequency_score + diversity_score)
+
+    thresholds = np.array([threshold for threshold, _ in RISK_LEVELS])
+    levels = np.array([level for _, level in RISK_LEVELS], dtype=object)
+    risk_level = levels[np.argmax(risk_score[:, np.newaxis] >= thresholds, axis=1)]
+
+    return pd.DataFrame({
+        "risk_score": risk_score,
+        "risk_level": risk_level,
+        "fraud_score": fraud_score,
+        "frequency_score": frequency_score,
+        "diversity_score": diversity_score,
+        "fraud_rate": fraud_rate,
+        "dispute_frequency": dispute_frequency,
+        "diversity_ratio": diversity_ratio,
+        "avg_amount": totals["amount_sum"].to_numpy() / safe_disputes,
+    }, index=totals.index)
+
+
+async def merchant_totals(
+    session: AsyncSession,
+    since: dt.datetime,
+    merchants: Optional[Union[Select, List[str]]] = None,
+    batch_size: int = 2000
+) -> pd.DataFrame:
+    """
+    Window totals and distinct customers per merchant, from the rollups.
+
+    Args:
+        since: Start of the window (rounded down to the hour)
+        merchants: Optional merchant_ids (or a subquery of them) to restrict to
+    """
+    rollup = MerchantHourRollup
+    conditions = [rollup.bucket_start >= hour_bucket(since)]
+    if merchants is not None:
+        conditions.append(rollup.merchant_id.in_(merchants))
+
+    result = await session.execute(
+        select(
+            rollup.merchant_id,
+            func.sum(rollup.dispute_count).label("dispute_count"),
+            func.sum(rollup.fraud_count).label("fraud_count"),
+            func.sum(rollup.amount_sum).label("amount_sum"),
+        ).where(*conditions).group_by(rollup.merchant_id)
+    )
+    totals = pd.DataFrame(result.all(), columns=["merchant_id", "dispute_count", "fraud_count", "amount_sum"])
+    totals = totals.set_index("merchant_id")
+
+    unique = await _distinct_customers(session, conditions, batch_size)
+    totals["unique_customers"] = unique.reindex(totals.index, fill_value=0)
+    return totals
+
+
+async def _distinct_customers(session: AsyncSession, conditions: list, batch_size: int) -> pd.Series:
+    """Merge each merchant's hourly sketches in merchant order, holding one batch at a time"""
+    rollup = MerchantHourRollup
+    stmt = select(rollup.merchant_id, rollup.customers_hll).where(
+        *conditions, rollup.customers_hll.is_not(None)
+    ).order_by(rollup.merchant_id).execution_options(yield_per=batch_size)
+
+    width = 1 << MERCHANT_HLL_PRECISION
+    ids: List[str] = []
+    counts: List[np.ndarray] = []
+    pending_id: Optional[str] = None
+    pending: Optional[np.ndarray] = None
+    async for batch in (await session.stream(stmt)).partitions():
+        batch_ids = np.array([row[0] for row in batch], dtype=object)
+        registers = np.frombuffer(b"".join(row[1] for row in batch), dtype=np.uint8).reshape(-1, width)
+        starts = np.concatenate(([0], np.flatnonzero(batch_ids[1:] != batch_ids[:-1]) + 1))
+        merged = merge_runs(registers, starts)
+        group_ids = batch_ids[starts]
+        # The last merchant of the previous batch may continue here
+        if pending_id is not None:
+            if group_ids[0] == pending_id:
+                np.maximum(merged[0], pending, out=merged[0])
+            else:
+                ids.append(pending_id)
+                counts.append(estimate_counts(pending[np.newaxis, :]))
+        ids.extend(group_ids[:-1])
+        counts.append(estimate_counts(merged[:-1]))
+        pending_id, pending = group_ids[-1], merged[-1].copy()
+    if pending_id is not None:
+        ids.append(pending_id)
+        counts.append(estimate_counts(pending[np.newaxis, :]))
+    return pd.Series(np.concatenate(counts) if counts else [], index=ids, dtype=np.int64)
+
+
+def risk_report(merchant_id: str, row: Any) -> Dict[str, Any]:
+    """The per-merchant risk report from one row of totals joined with its scores"""
+    return {
+        "merchant_id": merchant_id,
+        "risk_score": round(float(row.risk_score), 2),
+        "risk_level": row.risk_level,
+        "factors": {
+            "fraud_rate": {"score": float(row.fraud_score), "value": float(row.fraud_rate)},
+            "dispute_frequency": {"score": float(row.frequency_score), "value": float(row.dispute_frequency)},
+            "customer_diversity": {"score": float(row.diversity_score), "value": float(row.diversity_ratio)},
+        },
+        "stats": {
+            "total_disputes": int(row.dispute_count),
+            "fraud_disputes": int(row.fraud_count),
+            "fraud_rate": round(float(row.fraud_rate), 3),
+            "avg_amount": float(row.avg_amount),
+            "unique_customers": int(row.unique_customers),
+            "dispute_frequency": round(float(row.dispute_frequency), 2),
+        },
+    }
+
+
+def _stored_report(score: MerchantRiskScore, days_back: int) -> Dict[str, Any]:
+    """``risk_report`` of a materialized score row"""
+    disputes = max(score.total_disputes, 1)
+    return risk_report(score.merchant_id, SimpleNamespace(
+        risk_score=score.risk_score,
+        risk_level=score.risk_level,
+        fraud_score=score.fraud_score,
+        frequency_score=score.frequency_score,
+        diversity_score=score.diversity_score,
+        fraud_rate=score.fraud_disputes / disputes,
+        dispute_frequency=score.total_disputes / days_back,
+        diversity_ratio=score.unique_customers / disputes,
+        avg_amount=score.amount_sum / disputes,
+        dispute_count=score.total_disputes,
+        fraud_count=score.fraud_disputes,
+        unique_customers=score.unique_customers,
+    ))
+
+
+async def refresh_merchant_risk(
+    session: AsyncSession,
+    days_back: int,
+    now: Optional[dt.datetime] = None,
+    full: bool = False
+) -> Dict[str, Any]:
+    """
+    Bring ``merchant_risk_score`` for a window up to date (commit is the caller's).
+
+    The first refresh of a window, or ``full=True``, scores every merchant.
+    Later ones re-score only merchants with rollup hours at or after the
+    last refresh's hour, or in the hours that have left the window since;
+    merchants with nothing left in the window are removed.
+
+    Returns:
+        Refresh summary: mode and merchants scored
+    """
+    now = now or dt.datetime.utcnow()
+    window = dt.timedelta(days=days_back)
+    since = hour_bucket(now - window)
+    state = await session.get(MerchantRiskRefresh, days_back)
+
+    rollup = MerchantHourRollup
+    scores = MerchantRiskScore
+    affected = None
+    if state is not None and not full:
+        affected = select(rollup.merchant_id).where(or_(
+            rollup.bucket_start >= hour_bucket(state.refreshed_at),
+            and_(rollup.bucket_start >= hour_bucket(state.refreshed_at - window), rollup.bucket_start < since)
+        )).distinct()
+
+    totals = await merchant_totals(session, since, affected)
+    scored = score_merchants(totals, days_back)
+
+    # Merchants with nothing left in the window. Decided from the rollups
+    # rather than from ``totals``, so a concurrent refresh's rows are kept.
+    stale = delete(scores).where(
+        scores.window_days == days_back,
+        ~select(rollup.merchant_id).where(
+            rollup.merchant_id == scores.merchant_id, rollup.bucket_start >= since
+        ).exists()
+    )
+    if affected is not None:
+        stale = stale.where(scores.merchant_id.in_(affected))
+    await session.execute(stale)
+
+    rows = pd.DataFrame({
+        "window_days": days_back,
+        "merchant_id": totals.index,
+        "risk_score": scored["risk_score"].to_numpy(),
+        "risk_level": scored["risk_level"].to_numpy(),
+        "fraud_score": scored["fraud_score"].to_numpy(),
+        "frequency_score": scored["frequency_score"].to_numpy(),
+        "diversity_score": scored["diversity_score"].to_numpy(),
+        "total_disputes": totals["dispute_count"].to_numpy(),
+        "fraud_disputes": totals["fraud_count"].to_numpy(),
+        "amount_sum": totals["amount_sum"].to_numpy(),
+        "unique_customers": totals["unique_customers"].to_numpy(),
+        "computed_at": now,
+    })
+    if len(rows):
+        # Bulk executemany; ORM objects would cost more than the scoring
+        upsert = _insert(session, scores)
+        await session.execute(
+            upsert.on_conflict_do_update(
+                index_elements=[scores.window_days, scores.merchant_id],
+                set_={
+                    column: upsert.excluded[column] for column in rows.columns
+                    if column not in ("window_days", "merchant_id")
+                }
+            ),
+            rows.astype(object).to_dict("records")
+        )
+    upsert = _insert(session, MerchantRiskRefresh).values(window_days=days_back, refreshed_at=now)
+    await session.execute(upsert.on_conflict_do_update(
+        index_elements=[MerchantRiskRefresh.window_days], set_={"refreshed_at": now}
+    ))
+    return {"mode": "incremental" if affected is not None else "full", "scored": len(totals)}
+
+
+async def top_merchants(
+    days_back: int,
+    top_k: int,
+    max_age_seconds: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    The ``top_k`` riskiest merchants of a window, from the materialized scores.
+
+    The scores are refreshed first when they are older than ``max_age_seconds``
+    (or were never computed for this window).
+    """
+    max_age_seconds = settings.merchant_risk_refresh_seconds if max_age_seconds is None else max_age_seconds
+    async with _refresh_lock:
+        async with get_session() as session:
+            state = await session.get(MerchantRiskRefresh, days_back)
+            now = dt.datetime.utcnow()
+            if state is None or (now - state.refreshed_at).total_seconds() > max_age_seconds:
+                await refresh_merchant_risk(session, days_back, now)
+                await session.commit()
+
+    async with get_session() as session:
+        refreshed_at = (await session.get(MerchantRiskRefresh, days_back)).refreshed_at
+        result = await session.execute(
+            select(MerchantRiskScore)
+            .where(MerchantRiskScore.window_days == days_back)
+            .order_by(MerchantRiskScore.risk_score.desc(), MerchantRiskScore.merchant_id.desc())
+            .limit(top_k)
+        )
+        return {
+            "days_back": days_back,
+            "refreshed_at": refreshed_at,
+            "merchants": [_stored_report(score, days_back) for score in result.scalars()],
+        }
+
+
+async def run_refresh(days_back: int, interval_seconds: float) -> None:
+    """Refresh the scores of one window incrementally, forever"""
+    while True:
+        try:
+            async with _refresh_lock:
+                async with get_session() as session:
+                    await refresh_merchant_risk(session, days_back)
+        except Exception as e:
+            print(f"Merchant risk refresh error: {e}")
+        await asyncio.sleep(interval_seconds)
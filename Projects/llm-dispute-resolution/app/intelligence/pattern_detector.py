@@ -1,6 +1,18 @@
 """
 Advanced Pattern Detection Engine
 
+Detectors read the hourly rollup tables (see ``rollups.py``) rather than
+scanning every case in the window, so their cost depends on the number of
+merchants, customers and hours, not on dispute volume. Windows are rounded
+down to the start of the hour.
+
+Each analysis reads the window once, in one session, into a
+``PatternFrame`` of DataFrames; the detectors are pure functions of that
+frame. The one per-case read is two columns (merchant, amount) fetched
+through a covering index straight into NumPy arrays, for the per-merchant
+robust z-scores of dispute amounts. It is limited to the merchants with
+enough disputes in the window to be scored, and skipped when there are none.
+
 This module provides intelligent pattern detection capabilities for:
 - Fraud cluster identification
 - Anomaly detection in dispute patterns
@@ -9,20 +21,27 @@ This module provides intelligent pattern detection capabilities for:
 - Customer behavior analysis
 """
 
-import asyncio
 import time
 import numpy as np
-from typing import Dict, List, Optional, Tuple, Any
+import pandas as pd
+from typing import Dict, List, Optional, Tuple, Any, Type
 from dataclasses import dataclass
+from functools import cached_property
 from enum import Enum
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import Counter, defaultdict
 import json
 
 from ..infra.db import get_session
-from ..domain.models import DisputeCase, TransactionLedger
-from sqlalchemy import select, func, and_, or_
-from sqlalchemy.sql import text
+from ..domain.models import Base, CustomerHourRollup, DisputeCase, LabelHourRollup, MerchantHourRollup
+from ..telemetry.tracing import tracer
+from ..telemetry import prometheus
+from .robust_stats import MAD_SCALE, OUTLIER_Z, GroupStats, robust_zscores
+from .merchant_risk import merchant_totals, risk_report, score_merchants
+from .rollups import AMOUNT_BIN_WIDTH, FRAUD_BUCKET, LOG_AMOUNT_SCALE, hour_bucket, log_amounts
+from .sketches import estimate_counts, merge_runs
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 class PatternType(Enum):
     """Types of patterns that can be detected"""
@@ -52,6 +71,178 @@ class PatternAlert:
     detected_at: datetime
     metadata: Dict[str, Any]
 
+# Disputes a merchant needs in the window for a meaningful median amount
+MIN_AMOUNT_DISPUTES = 10
+# Up to this many merchants the amounts are read merchant by merchant through
+# the merchant index; with more, one scan of the window is cheaper
+MAX_AMOUNT_MERCHANTS = 500
+# A log amount is within this much of its histogram bin's midpoint (half a bin,
+# plus rounding), so binned medians, MADs and deviations are off by at most
+# twice that
+AMOUNT_BIN_SLACK = AMOUNT_BIN_WIDTH + 2
+
+
+@dataclass
+class CaseAmounts:
+    """Amount of every case in the window with a merchant, as columns"""
+    merchant_ids: np.ndarray  # distinct merchants; codes index into it
+    codes: np.ndarray         # int64 merchant code per case
+    amounts: np.ndarray       # int64 amount_cents per case
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+
+@dataclass
+class PatternFrame:
+    """One analysis window of the hourly rollups, shared by every detector"""
+    days_back: int
+    merchants: pd.DataFrame  # rollup_merchant_hour rows
+    customers: pd.DataFrame  # rollup_customer_hour rows
+    labels: pd.DataFrame     # rollup_label_hour rows
+    amounts: CaseAmounts     # dispute_case (merchant_id, amount_cents) of the merchants that may have outliers
+
+    @property
+    def rows_read(self) -> int:
+        return len(self.merchants) + len(self.customers) + len(self.labels) + len(self.amounts)
+
+    @cached_property
+    def merchant_amount_zscores(self) -> Tuple[np.ndarray, GroupStats]:
+        """
+        Robust z-score of each case amount against its merchant's median/MAD.
+
+        Amounts are compared on a log scale (fixed-point, see ``LOG_AMOUNT_SCALE``):
+        dispute amounts vary multiplicatively, and a linear MAD would flag
+        every merchant's ordinary large tickets.
+        """
+        return robust_zscores(self.amounts.codes, log_amounts(self.amounts.amounts), len(self.amounts.merchant_ids))
+
+    @cached_property
+    def merchant_totals(self) -> pd.DataFrame:
+        return self.merchants.groupby("merchant_id")[
+            ["dispute_count", "fraud_count", "amount_sum", "fraud_amount_sum"]
+        ].sum()
+
+    @cached_property
+    def customer_totals(self) -> pd.DataFrame:
+        return self.customers.groupby("customer_id")[["dispute_count", "amount_sum"]].sum()
+
+    @cached_property
+    def hourly_totals(self) -> pd.DataFrame:
+        labels = self.labels.assign(
+            fraud_count=self.labels["dispute_count"].where(self.labels["label_bucket"] == FRAUD_BUCKET, 0)
+        )
+        return labels.groupby("hour_of_day")[["dispute_count", "fraud_count"]].sum().sort_index()
+
+    @cached_property
+    def distinct_customer_counts(self) -> pd.Series:
+        return _distinct_counts(self.merchants, "merchant_id", "customers_hll")
+
+    @cached_property
+    def distinct_merchant_counts(self) -> pd.Series:
+        return _distinct_counts(self.customers, "customer_id", "merchants_hll")
+
+    def distinct_customers(self, merchant_id: str) -> int:
+        return int(self.distinct_customer_counts.get(merchant_id, 0))
+
+    def distinct_merchants(self, customer_id: str) -> int:
+        return int(self.distinct_merchant_counts.get(customer_id, 0))
+
+
+def _distinct_counts(rows: pd.DataFrame, key_column: str, sketch_column: str) -> pd.Series:
+    """Estimated distinct count per key, merging all of its hourly sketches in one pass"""
+    rows = rows.loc[rows[sketch_column].notna(), [key_column, sketch_column]]
+    if rows.empty:
+        return pd.Series(dtype=np.int64)
+    rows = rows.sort_values(key_column, kind="stable")
+    keys = rows[key_column].to_numpy()
+    registers = np.frombuffer(b"".join(rows[sketch_column]), dtype=np.uint8).reshape(len(rows), -1)
+    starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+    return pd.Series(estimate_counts(merge_runs(registers, starts)), index=keys[starts])
+
+
+async def _read_rollup(session: AsyncSession, model: Type[Base], since: datetime) -> pd.DataFrame:
+    table = model.__table__
+    result = await session.execute(select(table).where(table.c.bucket_start >= since))
+    return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+def _amount_merchants(merchants: pd.DataFrame) -> List[str]:
+    """
+    Merchants whose case amounts must be read to score them for outliers
+
+    Merchants with enough disputes are first scored on their hourly amount
+    histograms. Binning moves every statistic by at most
+    ``AMOUNT_BIN_SLACK``, so a merchant is only read if, allowing for that,
+    3 of its disputes could be outliers; those whose binned MAD is within
+    the slack of 0 always are. Merchants with hours rolled up before the
+    histograms existed are always read.
+    """
+    if merchants.empty:
+        return []
+    counts = merchants.groupby("merchant_id")["dispute_count"].sum()
+    scored = merchants[merchants["merchant_id"].isin(counts.index[counts >= MIN_AMOUNT_DISPUTES])]
+    unbinned = set(scored.loc[scored["amount_hist"].isna() & (scored["dispute_count"] > 0), "merchant_id"])
+    binned = scored[~scored["merchant_id"].isin(unbinned)]
+    if binned.empty:
+        return sorted(unbinned)
+
+    row_codes, merchant_ids = pd.factorize(binned["merchant_id"])
+    entries = [
+        (code, int(bin_), count)
+        for code, histogram in zip(row_codes, binned["amount_hist"]) for bin_, count in histogram.items()
+    ]
+    entry_codes, bins, entry_counts = (np.array(column, dtype=np.int64) for column in zip(*entries))
+    codes = np.repeat(entry_codes, entry_counts)
+    values = np.repeat(bins * AMOUNT_BIN_WIDTH + AMOUNT_BIN_WIDTH // 2, entry_counts)
+    _, stats = robust_zscores(codes, values, len(merchant_ids))
+
+    # Largest possible |z| per binned value: the deviation can only grow and
+    # the MAD only shrink by the slack (a MAD that may be 0 bounds nothing)
+    mad_low = stats.mad - AMOUNT_BIN_SLACK
+    scale = np.full(len(merchant_ids), np.inf)
+    np.divide(MAD_SCALE, mad_low, out=scale, where=mad_low > 0)
+    deviation = np.abs(values - stats.median[codes]) + AMOUNT_BIN_SLACK
+    possible = np.bincount(codes[deviation * scale[codes] > OUTLIER_Z], minlength=len(merchant_ids))
+    return sorted(unbinned | set(merchant_ids[possible >= 3]))
+
+
+async def _read_case_amounts(
+    session: AsyncSession, since: datetime, merchant_ids: List[str], batch_size: int = 50000
+) -> CaseAmounts:
+    """Stream the two columns in batches into arrays, without building ORM objects"""
+    merchant_batches, amount_batches = [], []
+    if merchant_ids:
+        stmt = select(DisputeCase.merchant_id, DisputeCase.amount_cents).where(
+            DisputeCase.created_at >= since,
+            DisputeCase.merchant_id.is_not(None)
+        ).execution_options(yield_per=batch_size)
+        if len(merchant_ids) <= MAX_AMOUNT_MERCHANTS:
+            stmt = stmt.where(DisputeCase.merchant_id.in_(merchant_ids))
+        async for batch in (await session.stream(stmt)).partitions():
+            batch_merchants, batch_amounts = zip(*batch)
+            merchant_batches.append(np.array(batch_merchants, dtype=object))
+            amount_batches.append(np.array(batch_amounts, dtype=np.int64))
+    if not amount_batches:
+        return CaseAmounts(np.array([], dtype=object), np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+    codes, merchant_ids = pd.factorize(np.concatenate(merchant_batches))
+    return CaseAmounts(np.asarray(merchant_ids, dtype=object), codes.astype(np.int64), np.concatenate(amount_batches))
+
+
+async def load_pattern_frame(days_back: int) -> PatternFrame:
+    """Read the rollups for the last ``days_back`` days in one session"""
+    since = hour_bucket(datetime.utcnow() - timedelta(days=days_back))
+    async with get_session() as session:
+        merchants = await _read_rollup(session, MerchantHourRollup, since)
+        return PatternFrame(
+            days_back=days_back,
+            merchants=merchants,
+            customers=await _read_rollup(session, CustomerHourRollup, since),
+            labels=await _read_rollup(session, LabelHourRollup, since),
+            amounts=await _read_case_amounts(session, since, _amount_merchants(merchants)),
+        )
+
+
 class PatternDetectionEngine:
     """
     Advanced pattern detection engine using statistical analysis
@@ -66,6 +257,8 @@ class PatternDetectionEngine:
             PatternType.TIME_ANOMALY: 0.65,
             PatternType.AMOUNT_ANOMALY: 0.7
         }
+        # Rows read and wall time of the most recent analysis
+        self.last_analysis: Dict[str, Any] = {}
     
     async def analyze_dispute_patterns(self, days_back: int = 30) -> List[PatternAlert]:
         """
@@ -78,367 +271,302 @@ class PatternDetectionEngine:
             List of pattern alerts
         """
         alerts = []
+        started = time.perf_counter()
         
-        # Parallel analysis of different pattern types
-        tasks = [
-            self._detect_fraud_clusters(days_back),
-            self._detect_merchant_anomalies(days_back),
-            self._detect_customer_anomalies(days_back),
-            self._detect_time_anomalies(days_back),
-            self._detect_amount_anomalies(days_back)
-        ]
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        with tracer.span("patterns.analyze", days_back=days_back) as span:
+            # One read of the window feeds every detector
+            frame = await load_pattern_frame(days_back)
+            
+            detectors = [
+                self._detect_fraud_clusters,
+                self._detect_merchant_anomalies,
+                self._detect_customer_anomalies,
+                self._detect_time_anomalies,
+                self._detect_amount_anomalies
+            ]
+            for detector in detectors:
+                try:
+                    alerts.extend(detector(frame))
+                except Exception as e:
+                    print(f"Pattern detection error: {e}")
+            
+            wall_seconds = time.perf_counter() - started
+            if span is not None:
+                span.set_attribute("rows_read", frame.rows_read)
+                span.set_attribute("alerts", len(alerts))
         
-        for result in results:
-            if isinstance(result, list):
-                alerts.extend(result)
-            elif isinstance(result, Exception):
-                print(f"Pattern detection error: {result}")
+        self.last_analysis = {
+            "days_back": days_back,
+            "rows_read": frame.rows_read,
+            "wall_ms": round(wall_seconds * 1000, 2),
+            "alerts": len(alerts),
+        }
+        prometheus.record_pattern_analysis(frame.rows_read, wall_seconds)
         
         return sorted(alerts, key=lambda x: (x.severity.value, x.confidence_score), reverse=True)
     
-    async def _detect_fraud_clusters(self, days_back: int) -> List[PatternAlert]:
+    def _detect_fraud_clusters(self, frame: PatternFrame) -> List[PatternAlert]:
         """Detect clusters of fraudulent disputes"""
         alerts = []
-        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+        days_back = frame.days_back
         
-        async with get_session() as session:
-            # Find fraud disputes by merchant
-            stmt = select(
-                DisputeCase.merchant_id,
-                func.count(DisputeCase.id).label('fraud_count'),
-                func.avg(DisputeCase.amount_cents).label('avg_amount')
-            ).where(
-                and_(
-                    DisputeCase.created_at >= cutoff_date,
-                    DisputeCase.classification.like('%FRAUD%')
-                )
-            ).group_by(DisputeCase.merchant_id)
-            
-            result = await session.execute(stmt)
-            merchant_fraud_stats = result.fetchall()
-            
-            for merchant_id, fraud_count, avg_amount in merchant_fraud_stats:
-                if fraud_count >= 5:  # Threshold for cluster detection
-                    confidence = min(0.9, 0.6 + (fraud_count - 5) * 0.05)
-                    
-                    severity = AlertSeverity.HIGH if fraud_count >= 10 else AlertSeverity.MEDIUM
-                    
-                    alerts.append(PatternAlert(
-                        id=f"fraud_cluster_{merchant_id}_{int(time.time())}",
-                        pattern_type=PatternType.FRAUD_CLUSTER,
-                        severity=severity,
-                        title=f"Fraud Cluster Detected - Merchant {merchant_id}",
-                        description=f"Detected {fraud_count} fraud disputes for merchant {merchant_id} in the last {days_back} days",
-                        entities_involved=[merchant_id],
-                        confidence_score=confidence,
-                        detected_at=datetime.utcnow(),
-                        metadata={
-                            "fraud_count": fraud_count,
-                            "avg_amount": float(avg_amount or 0),
-                            "days_analyzed": days_back
-                        }
-                    ))
+        # Fraud disputes by merchant
+        merchant_fraud_stats = frame.merchant_totals[frame.merchant_totals["fraud_count"] > 0]
+        
+        for merchant_id, row in merchant_fraud_stats.iterrows():
+            fraud_count = int(row["fraud_count"])
+            avg_amount = row["fraud_amount_sum"] / fraud_count
+            if fraud_count >= 5:  # Threshold for cluster detection
+                confidence = min(0.9, 0.6 + (fraud_count - 5) * 0.05)
+                
+                severity = AlertSeverity.HIGH if fraud_count >= 10 else AlertSeverity.MEDIUM
+                
+                alerts.append(PatternAlert(
+                    id=f"fraud_cluster_{merchant_id}_{int(time.time())}",
+                    pattern_type=PatternType.FRAUD_CLUSTER,
+                    severity=severity,
+                    title=f"Fraud Cluster Detected - Merchant {merchant_id}",
+                    description=f"Detected {fraud_count} fraud disputes for merchant {merchant_id} in the last {days_back} days",
+                    entities_involved=[merchant_id],
+                    confidence_score=confidence,
+                    detected_at=datetime.utcnow(),
+                    metadata={
+                        "fraud_count": fraud_count,
+                        "avg_amount": float(avg_amount),
+                        "days_analyzed": days_back
+                    }
+                ))
         
         return alerts
     
-    async def _detect_merchant_anomalies(self, days_back: int) -> List[PatternAlert]:
+    def _detect_merchant_anomalies(self, frame: PatternFrame) -> List[PatternAlert]:
         """Detect unusual patterns in merchant behavior"""
         alerts = []
-        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
         
-        async with get_session() as session:
-            # Calculate dispute rates by merchant
-            stmt = text("""
-                SELECT 
-                    merchant_id,
-                    COUNT(*) as total_disputes,
-                    COUNT(CASE WHEN classification LIKE '%FRAUD%' THEN 1 END) as fraud_disputes,
-                    AVG(amount_cents) as avg_amount,
-                    COUNT(DISTINCT customer_id) as unique_customers
-                FROM dispute_case 
-                WHERE created_at >= :cutoff_date 
-                GROUP BY merchant_id 
-                HAVING COUNT(*) >= 3
-            """)
+        # Dispute rates by merchant, for merchants with at least 3 disputes
+        merchant_stats = frame.merchant_totals[frame.merchant_totals["dispute_count"] >= 3]
+        
+        for merchant_id, row in merchant_stats.iterrows():
+            total_disputes = int(row["dispute_count"])
+            fraud_disputes = int(row["fraud_count"])
+            avg_amount = row["amount_sum"] / total_disputes
             
-            result = await session.execute(stmt, {"cutoff_date": cutoff_date})
-            merchant_stats = result.fetchall()
+            fraud_rate = fraud_disputes / total_disputes
             
-            for row in merchant_stats:
-                merchant_id = row.merchant_id
-                total_disputes = row.total_disputes
-                fraud_disputes = row.fraud_disputes
-                avg_amount = row.avg_amount
-                unique_customers = row.unique_customers
-                
-                fraud_rate = fraud_disputes / total_disputes if total_disputes > 0 else 0
+            # Anomaly detection based on fraud rate and customer diversity
+            if fraud_rate > 0.4:  # High fraud rate
+                unique_customers = frame.distinct_customers(merchant_id)
+                confidence = min(0.95, 0.5 + fraud_rate)
+                severity = AlertSeverity.HIGH if fraud_rate > 0.6 else AlertSeverity.MEDIUM
                 
-                # Anomaly detection based on fraud rate and customer diversity
-                if fraud_rate > 0.4:  # High fraud rate
-                    confidence = min(0.95, 0.5 + fraud_rate)
-                    severity = AlertSeverity.HIGH if fraud_rate > 0.6 else AlertSeverity.MEDIUM
-                    
-                    alerts.append(PatternAlert(
-                        id=f"merchant_anomaly_{merchant_id}_{int(time.time())}",
-                        pattern_type=PatternType.MERCHANT_ANOMALY,
-                        severity=severity,
-                        title=f"High Fraud Rate - Merchant {merchant_id}",
-                        description=f"Merchant {merchant_id} has {fraud_rate:.1%} fraud rate ({fraud_disputes}/{total_disputes} disputes)",
-                        entities_involved=[merchant_id],
-                        confidence_score=confidence,
-                        detected_at=datetime.utcnow(),
-                        metadata={
-                            "fraud_rate": fraud_rate,
-                            "total_disputes": total_disputes,
-                            "fraud_disputes": fraud_disputes,
-                            "avg_amount": float(avg_amount or 0),
-                            "unique_customers": unique_customers
-                        }
-                    ))
+                alerts.append(PatternAlert(
+                    id=f"merchant_anomaly_{merchant_id}_{int(time.time())}",
+                    pattern_type=PatternType.MERCHANT_ANOMALY,
+                    severity=severity,
+                    title=f"High Fraud Rate - Merchant {merchant_id}",
+                    description=f"Merchant {merchant_id} has {fraud_rate:.1%} fraud rate ({fraud_disputes}/{total_disputes} disputes)",
+                    entities_involved=[merchant_id],
+                    confidence_score=confidence,
+                    detected_at=datetime.utcnow(),
+                    metadata={
+                        "fraud_rate": fraud_rate,
+                        "total_disputes": total_disputes,
+                        "fraud_disputes": fraud_disputes,
+                        "avg_amount": float(avg_amount),
+                        "unique_customers": unique_customers
+                    }
+                ))
         
         return alerts
     
-    async def _detect_customer_anomalies(self, days_back: int) -> List[PatternAlert]:
+    def _detect_customer_anomalies(self, frame: PatternFrame) -> List[PatternAlert]:
         """Detect unusual customer dispute patterns"""
         alerts = []
-        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
         
-        async with get_session() as session:
-            # Find customers with multiple disputes
-            stmt = select(
-                DisputeCase.customer_id,
-                func.count(DisputeCase.id).label('dispute_count'),
-                func.count(func.distinct(DisputeCase.merchant_id)).label('merchant_count'),
-                func.sum(DisputeCase.amount_cents).label('total_amount')
-            ).where(
-                DisputeCase.created_at >= cutoff_date
-            ).group_by(
-                DisputeCase.customer_id
-            ).having(
-                func.count(DisputeCase.id) >= 3
-            )
+        # Customers with multiple disputes
+        customer_stats = frame.customer_totals[frame.customer_totals["dispute_count"] >= 5]
+        
+        for customer_id, row in customer_stats.iterrows():
+            dispute_count = int(row["dispute_count"])
+            total_amount = row["amount_sum"]
+            merchant_count = frame.distinct_merchants(customer_id)
             
-            result = await session.execute(stmt)
-            customer_stats = result.fetchall()
+            # Higher suspicion if disputes span multiple merchants
+            merchant_diversity = merchant_count / dispute_count
+            confidence = 0.6 + (dispute_count - 5) * 0.05 + merchant_diversity * 0.2
+            confidence = min(0.95, confidence)
             
-            for customer_id, dispute_count, merchant_count, total_amount in customer_stats:
-                if dispute_count >= 5:  # Multiple disputes threshold
-                    # Higher suspicion if disputes span multiple merchants
-                    merchant_diversity = merchant_count / dispute_count
-                    confidence = 0.6 + (dispute_count - 5) * 0.05 + merchant_diversity * 0.2
-                    confidence = min(0.95, confidence)
-                    
-                    severity = AlertSeverity.HIGH if dispute_count >= 8 else AlertSeverity.MEDIUM
-                    
-                    alerts.append(PatternAlert(
-                        id=f"customer_anomaly_{customer_id}_{int(time.time())}",
-                        pattern_type=PatternType.CUSTOMER_ANOMALY,
-                        severity=severity,
-                        title=f"High Dispute Activity - Customer {customer_id}",
-                        description=f"Customer {customer_id} has {dispute_count} disputes across {merchant_count} merchants",
-                        entities_involved=[customer_id],
-                        confidence_score=confidence,
-                        detected_at=datetime.utcnow(),
-                        metadata={
-                            "dispute_count": dispute_count,
-                            "merchant_count": merchant_count,
-                            "total_amount": float(total_amount or 0),
-                            "merchant_diversity": merchant_diversity
-                        }
-                    ))
+            severity = AlertSeverity.HIGH if dispute_count >= 8 else AlertSeverity.MEDIUM
+            
+            alerts.append(PatternAlert(
+                id=f"customer_anomaly_{customer_id}_{int(time.time())}",
+                pattern_type=PatternType.CUSTOMER_ANOMALY,
+                severity=severity,
+                title=f"High Dispute Activity - Customer {customer_id}",
+                description=f"Customer {customer_id} has {dispute_count} disputes across {merchant_count} merchants",
+                entities_involved=[customer_id],
+                confidence_score=confidence,
+                detected_at=datetime.utcnow(),
+                metadata={
+                    "dispute_count": dispute_count,
+                    "merchant_count": merchant_count,
+                    "total_amount": float(total_amount),
+                    "merchant_diversity": merchant_diversity
+                }
+            ))
         
         return alerts
     
-    async def _detect_time_anomalies(self, days_back: int) -> List[PatternAlert]:
+    def _detect_time_anomalies(self, frame: PatternFrame) -> List[PatternAlert]:
         """Detect unusual temporal patterns in disputes"""
         alerts = []
-        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
         
-        async with get_session() as session:
-            # Analyze disputes by hour of day
-            stmt = text("""
-                SELECT 
-                    strftime('%H', created_at) as hour,
-                    COUNT(*) as dispute_count,
-                    COUNT(CASE WHEN classification LIKE '%FRAUD%' THEN 1 END) as fraud_count
-                FROM dispute_case 
-                WHERE created_at >= :cutoff_date 
-                GROUP BY strftime('%H', created_at)
-                ORDER BY hour
-            """)
+        # Disputes by hour of day
+        hourly_stats = frame.hourly_totals
+        
+        if len(hourly_stats) >= 5:  # Need sufficient data
+            hours = [int(hour) for hour in hourly_stats.index]
+            counts = [int(count) for count in hourly_stats["dispute_count"]]
             
-            result = await session.execute(stmt, {"cutoff_date": cutoff_date})
-            hourly_stats = result.fetchall()
+            # Simple anomaly detection using z-score
+            mean_count = np.mean(counts)
+            std_count = np.std(counts)
             
-            if len(hourly_stats) >= 5:  # Need sufficient data
-                hours = [int(row.hour) for row in hourly_stats]
-                counts = [row.dispute_count for row in hourly_stats]
-                
-                # Simple anomaly detection using z-score
-                mean_count = np.mean(counts)
-                std_count = np.std(counts)
-                
-                for i, (hour, count) in enumerate(zip(hours, counts)):
-                    if std_count > 0:
-                        z_score = abs(count - mean_count) / std_count
+            for i, (hour, count) in enumerate(zip(hours, counts)):
+                if std_count > 0:
+                    z_score = abs(count - mean_count) / std_count
+                    
+                    if z_score > 2.5:  # Significant deviation
+                        confidence = min(0.9, 0.5 + (z_score - 2.5) * 0.1)
+                        severity = AlertSeverity.MEDIUM if z_score > 3 else AlertSeverity.LOW
                         
-                        if z_score > 2.5:  # Significant deviation
-                            confidence = min(0.9, 0.5 + (z_score - 2.5) * 0.1)
-                            severity = AlertSeverity.MEDIUM if z_score > 3 else AlertSeverity.LOW
-                            
-                            alerts.append(PatternAlert(
-                                id=f"time_anomaly_hour_{hour}_{int(time.time())}",
-                                pattern_type=PatternType.TIME_ANOMALY,
-                                severity=severity,
-                                title=f"Unusual Activity - Hour {hour:02d}:00",
-                                description=f"Detected {count} disputes at hour {hour}, significantly above average ({mean_count:.1f})",
-                                entities_involved=[f"hour_{hour}"],
-                                confidence_score=confidence,
-                                detected_at=datetime.utcnow(),
-                                metadata={
-                                    "hour": hour,
-                                    "dispute_count": count,
-                                    "average_count": mean_count,
-                                    "z_score": z_score
-                                }
-                            ))
+                        alerts.append(PatternAlert(
+                            id=f"time_anomaly_hour_{hour}_{int(time.time())}",
+                            pattern_type=PatternType.TIME_ANOMALY,
+                            severity=severity,
+                            title=f"Unusual Activity - Hour {hour:02d}:00",
+                            description=f"Detected {count} disputes at hour {hour}, significantly above average ({mean_count:.1f})",
+                            entities_involved=[f"hour_{hour}"],
+                            confidence_score=confidence,
+                            detected_at=datetime.utcnow(),
+                            metadata={
+                                "hour": hour,
+                                "dispute_count": count,
+                                "average_count": mean_count,
+                                "z_score": z_score
+                            }
+                        ))
         
         return alerts
     
-    async def _detect_amount_anomalies(self, days_back: int) -> List[PatternAlert]:
+    def _detect_amount_anomalies(self, frame: PatternFrame) -> List[PatternAlert]:
         """Detect unusual patterns in dispute amounts"""
         alerts = []
-        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
         
-        async with get_session() as session:
-            # Analyze amount distributions
-            stmt = select(
-                DisputeCase.amount_cents,
-                DisputeCase.merchant_id,
-                DisputeCase.customer_id
-            ).where(
-                DisputeCase.created_at >= cutoff_date
-            )
-            
-            result = await session.execute(stmt)
-            amounts_data = result.fetchall()
+        # Analyze amount distributions
+        total_disputes = int(frame.labels["dispute_count"].sum())
+        
+        if total_disputes >= 10:  # Need sufficient data
+            # Detect suspiciously round amounts (multiples of $100, a potential fraud indicator)
+            round_disputes = int(frame.labels["round_amount_count"].sum())
+            round_percentage = round_disputes / total_disputes
+            amount_counts = Counter()
+            for round_amounts in frame.labels["round_amounts"].dropna():
+                amount_counts.update({int(amount): n for amount, n in round_amounts.items()})
             
-            if len(amounts_data) >= 10:  # Need sufficient data
-                amounts = [row.amount_cents for row in amounts_data]
+            if round_percentage > 0.3:  # More than 30% round amounts
+                confidence = min(0.8, 0.4 + round_percentage)
+                severity = AlertSeverity.MEDIUM if round_percentage > 0.5 else AlertSeverity.LOW
                 
-                # Detect suspiciously round amounts (potential fraud indicator)
-                round_amounts = [amt for amt in amounts if amt % 10000 == 0]  # Round to nearest $100
-                round_percentage = len(round_amounts) / len(amounts)
-                
-                if round_percentage > 0.3:  # More than 30% round amounts
-                    confidence = min(0.8, 0.4 + round_percentage)
-                    severity = AlertSeverity.MEDIUM if round_percentage > 0.5 else AlertSeverity.LOW
-                    
-                    alerts.append(PatternAlert(
-                        id=f"amount_anomaly_round_{int(time.time())}",
-                        pattern_type=PatternType.AMOUNT_ANOMALY,
-                        severity=severity,
-                        title="Suspicious Round Amount Pattern",
-                        description=f"{round_percentage:.1%} of disputes have suspiciously round amounts",
-                        entities_involved=["amount_pattern"],
-                        confidence_score=confidence,
-                        detected_at=datetime.utcnow(),
-                        metadata={
-                            "round_percentage": round_percentage,
-                            "total_disputes": len(amounts),
-                            "round_disputes": len(round_amounts),
-                            "common_amounts": list(set(round_amounts))[:10]
-                        }
-                    ))
+                alerts.append(PatternAlert(
+                    id=f"amount_anomaly_round_{int(time.time())}",
+                    pattern_type=PatternType.AMOUNT_ANOMALY,
+                    severity=severity,
+                    title="Suspicious Round Amount Pattern",
+                    description=f"{round_percentage:.1%} of disputes have suspiciously round amounts",
+                    entities_involved=["amount_pattern"],
+                    confidence_score=confidence,
+                    detected_at=datetime.utcnow(),
+                    metadata={
+                        "round_percentage": round_percentage,
+                        "total_disputes": total_disputes,
+                        "round_disputes": round_disputes,
+                        "common_amounts": [amount for amount, _ in amount_counts.most_common(10)]
+                    }
+                ))
+        
+        alerts.extend(self._detect_merchant_amount_outliers(frame))
+        return alerts
+    
+    def _detect_merchant_amount_outliers(self, frame: PatternFrame) -> List[PatternAlert]:
+        """Merchants with several disputes far from their usual amounts (robust z-scores)"""
+        alerts = []
+        amounts = frame.amounts
+        if not len(amounts):
+            return alerts
+        
+        zscores, stats = frame.merchant_amount_zscores
+        outliers = np.flatnonzero(np.abs(zscores) > OUTLIER_Z)
+        outlier_counts = np.bincount(amounts.codes[outliers], minlength=len(amounts.merchant_ids))
+        
+        # Enough disputes for a meaningful median, and 3 outliers among them
+        flagged = np.flatnonzero((stats.counts >= MIN_AMOUNT_DISPUTES) & (outlier_counts >= 3))
+        if not len(flagged):
+            return alerts
+        
+        # Outliers grouped by merchant, most extreme first
+        outliers = outliers[np.isin(amounts.codes[outliers], flagged)]
+        outliers = outliers[np.lexsort((-np.abs(zscores[outliers]), amounts.codes[outliers]))]
+        groups = np.split(outliers, np.flatnonzero(np.diff(amounts.codes[outliers])) + 1)
+        
+        for group in groups:
+            code = amounts.codes[group[0]]
+            merchant_id = amounts.merchant_ids[code]
+            outlier_count = len(group)
+            dispute_count = int(stats.counts[code])
+            max_z = float(abs(zscores[group[0]]))
+            outlier_share = outlier_count / dispute_count
+            confidence = min(0.85, 0.5 + outlier_count * 0.05)
+            severity = AlertSeverity.MEDIUM if outlier_share > 0.2 or max_z > 10 else AlertSeverity.LOW
+            
+            alerts.append(PatternAlert(
+                id=f"amount_anomaly_merchant_{merchant_id}_{int(time.time())}",
+                pattern_type=PatternType.AMOUNT_ANOMALY,
+                severity=severity,
+                title=f"Unusual Dispute Amounts - Merchant {merchant_id}",
+                description=f"{outlier_count} of {dispute_count} disputes for merchant {merchant_id} are far from its median amount",
+                entities_involved=[merchant_id],
+                confidence_score=confidence,
+                detected_at=datetime.utcnow(),
+                metadata={
+                    "outlier_count": outlier_count,
+                    "dispute_count": dispute_count,
+                    "median_amount": int(round(np.expm1(stats.median[code] / LOG_AMOUNT_SCALE))),
+                    "mad_log": float(stats.mad[code] / LOG_AMOUNT_SCALE),
+                    "max_abs_z_score": max_z,
+                    "outlier_amounts": [int(amount) for amount in amounts.amounts[group[:10]]]
+                }
+            ))
         
         return alerts
     
     async def get_merchant_risk_score(self, merchant_id: str, days_back: int = 30) -> Dict[str, Any]:
-        """Calculate comprehensive risk score for a merchant"""
+        """Calculate comprehensive risk score for a merchant (same scoring as the bulk scorer)"""
         cutoff_date = datetime.utcnow() - timedelta(days=days_back)
         
         async with get_session() as session:
-            # Get merchant dispute statistics
-            stmt = text("""
-                SELECT 
-                    COUNT(*) as total_disputes,
-                    COUNT(CASE WHEN classification LIKE '%FRAUD%' THEN 1 END) as fraud_disputes,
-                    AVG(amount_cents) as avg_amount,
-                    COUNT(DISTINCT customer_id) as unique_customers,
-                    MIN(created_at) as first_dispute,
-                    MAX(created_at) as last_dispute
-                FROM dispute_case 
-                WHERE merchant_id = :merchant_id AND created_at >= :cutoff_date
-            """)
-            
-            result = await session.execute(stmt, {
-                "merchant_id": merchant_id,
-                "cutoff_date": cutoff_date
-            })
-            
-            stats = result.fetchone()
-            
-            if not stats or stats.total_disputes == 0:
-                return {
-                    "merchant_id": merchant_id,
-                    "risk_score": 0.0,
-                    "risk_level": "UNKNOWN",
-                    "factors": {"reason": "No recent dispute data"}
-                }
-            
-            # Calculate risk factors
-            fraud_rate = stats.fraud_disputes / stats.total_disputes
-            dispute_frequency = stats.total_disputes / days_back  # Disputes per day
-            
-            # Risk scoring algorithm
-            risk_score = 0.0
-            risk_factors = {}
-            
-            # Fraud rate contribution (0-40 points)
-            fraud_score = min(40, fraud_rate * 100)
-            risk_score += fraud_score
-            risk_factors["fraud_rate"] = {"score": fraud_score, "value": fraud_rate}
-            
-            # Dispute frequency contribution (0-30 points)
-            freq_score = min(30, dispute_frequency * 10)
-            risk_score += freq_score
-            risk_factors["dispute_frequency"] = {"score": freq_score, "value": dispute_frequency}
-            
-            # Customer diversity (lack of diversity = higher risk) (0-20 points)
-            diversity_ratio = stats.unique_customers / stats.total_disputes
-            diversity_score = max(0, 20 - (diversity_ratio * 20))
-            risk_score += diversity_score
-            risk_factors["customer_diversity"] = {"score": diversity_score, "value": diversity_ratio}
-            
-            # Normalize to 0-100 scale
-            risk_score = min(100, risk_score)
-            
-            # Determine risk level
-            if risk_score >= 70:
-                risk_level = "HIGH"
-            elif risk_score >= 40:
-                risk_level = "MEDIUM"
-            elif risk_score >= 20:
-                risk_level = "LOW"
-            else:
-                risk_level = "MINIMAL"
-            
+            totals = await merchant_totals(session, cutoff_date, [merchant_id])
+        
+        if totals.empty or totals["dispute_count"].iloc[0] == 0:
             return {
                 "merchant_id": merchant_id,
-                "risk_score": round(risk_score, 2),
-                "risk_level": risk_level,
-                "factors": risk_factors,
-                "stats": {
-                    "total_disputes": stats.total_disputes,
-                    "fraud_disputes": stats.fraud_disputes,
-                    "fraud_rate": round(fraud_rate, 3),
-                    "avg_amount": float(stats.avg_amount or 0),
-                    "unique_customers": stats.unique_customers,
-                    "dispute_frequency": round(dispute_frequency, 2)
-                }
+                "risk_score": 0.0,
+                "risk_level": "UNKNOWN",
+                "factors": {"reason": "No recent dispute data"}
             }
+        
+        row = totals.join(score_merchants(totals, days_back)).iloc[0]
+        return risk_report(merchant_id, row)
 
 # Global pattern detection engine instance
 pattern_engine = PatternDetectionEngine()
\ No newline at end of file
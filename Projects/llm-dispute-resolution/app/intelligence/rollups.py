@@ -0,0 +1,265 @@
+"""
+Hourly Dispute Rollups.
+
+Maintains per-hour aggregates of ``dispute_case`` so the pattern detectors
+read a few rows per merchant, customer or hour instead of scanning every
+case in the window:
+
+- ``rollup_merchant_hour``: disputes, fraud disputes and amounts per
+  merchant, with a HyperLogLog of distinct customers and a histogram of
+  log amounts (``AMOUNT_BIN_WIDTH`` bins)
+- ``rollup_customer_hour``: disputes and amounts per customer, with a
+  HyperLogLog of distinct merchants
+- ``rollup_label_hour``: disputes per hour-of-day and label bucket (FRAUD
+  or OTHER), with round-amount counts
+
+``record_case`` updates all three in the session that persists the case.
+Counters are bumped with a single atomic upsert; the sketch, histogram and
+round-amount columns are then merged under the row lock that upsert took.
+``rebuild_rollups`` recomputes the hours before a cutoff from
+``dispute_case`` (backfill), leaving the hours live cases still update.
+"""
+
+import datetime as dt
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Type
+
+import numpy as np
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..domain.models import (
+    Base, CustomerHourRollup, DisputeCase, LabelHourRollup, MerchantHourRollup,
+)
+from .sketches import HyperLogLog
+
+# Distinct customers per merchant can be large; merchants per customer are few
+MERCHANT_HLL_PRECISION = 10
+CUSTOMER_HLL_PRECISION = 8
+
+# Amounts that are a whole number of $100 count as "round"
+ROUND_AMOUNT_CENTS = 10000
+
+# Fixed-point scale of log amounts (1e-6 resolution), and the width of the
+# amount histogram bins on that scale (0.5% apart)
+LOG_AMOUNT_SCALE = 1_000_000
+AMOUNT_BIN_WIDTH = LOG_AMOUNT_SCALE // 200
+
+# How long a case may take to commit after its created_at: a rebuild leaves
+# the hour this long ago and everything after it to ``record_case``
+REBUILD_MARGIN = dt.timedelta(minutes=5)
+
+FRAUD_BUCKET = "FRAUD"
+OTHER_BUCKET = "OTHER"
+
+
+def is_fraud(label: Optional[str]) -> bool:
+    """Same rule as the detectors' former ``classification LIKE '%FRAUD%'``"""
+    return label is not None and "FRAUD" in label.upper()
+
+
+def hour_bucket(timestamp: dt.datetime) -> dt.datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def log_amounts(amounts) -> np.ndarray:
+    """Amounts in cents on the fixed-point log scale the outlier detector compares them on"""
+    return np.rint(np.log1p(np.asarray(amounts, dtype=np.float64)) * LOG_AMOUNT_SCALE).astype(np.int64)
+
+
+def amount_bin(amount: int) -> str:
+    """Histogram bin of an amount, as a JSON key"""
+    return str(int(log_amounts(max(amount, 0))) // AMOUNT_BIN_WIDTH)
+
+
+def _insert(session: AsyncSession, model: Type[Base]):
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Rollup upserts are not implemented for {dialect}")
+
+
+async def _upsert_counts(
+    session: AsyncSession,
+    model: Type[Base],
+    keys: Dict[str, Any],
+    counts: Dict[str, int],
+    **fixed: Any
+) -> None:
+    """Insert the row (with ``fixed`` values) or add ``counts`` to it, atomically"""
+    table = model.__table__
+    stmt = _insert(session, model).values(**keys, **counts, **fixed)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + stmt.excluded[name] for name in counts}
+    )
+    await session.execute(stmt)
+
+
+async def _merge_row(session: AsyncSession, model: Type[Base], keys: Dict[str, Any], merge) -> None:
+    """Read-modify-write of non-additive columns; the preceding upsert holds the row lock"""
+    table = model.__table__
+    where = [table.c[name] == value for name, value in keys.items()]
+    row = (await session.execute(select(table).where(*where))).one()
+    values = merge(row)
+    if values:
+        await session.execute(update(table).where(*where).values(**values))
+
+
+async def record_case(session: AsyncSession, case: DisputeCase) -> None:
+    """Add a newly persisted case to the rollups (call before committing it)"""
+    if case.created_at is None:
+        case.created_at = dt.datetime.utcnow()
+    bucket = hour_bucket(case.created_at)
+    amount = case.amount_cents
+    fraud = is_fraud(case.classification)
+    round_amount = amount % ROUND_AMOUNT_CENTS == 0
+
+    if case.merchant_id:
+        keys = {"bucket_start": bucket, "merchant_id": case.merchant_id}
+        await _upsert_counts(session, MerchantHourRollup, keys, {
+            "dispute_count": 1,
+            "fraud_count": int(fraud),
+            "amount_sum": amount,
+            "fraud_amount_sum": amount if fraud else 0,
+        })
+        await _merge_row(session, MerchantHourRollup, keys, lambda row: {
+            "amount_hist": _add_to_histogram(row.amount_hist, amount_bin(amount)),
+            **({
+                "customers_hll": _add_to_sketch(row.customers_hll, case.customer_id, MERCHANT_HLL_PRECISION)
+            } if case.customer_id else {}),
+        })
+
+    if case.customer_id:
+        keys = {"bucket_start": bucket, "customer_id": case.customer_id}
+        await _upsert_counts(session, CustomerHourRollup, keys, {"dispute_count": 1, "amount_sum": amount})
+        if case.merchant_id:
+            await _merge_row(session, CustomerHourRollup, keys, lambda row: {
+                "merchants_hll": _add_to_sketch(row.merchants_hll, case.merchant_id, CUSTOMER_HLL_PRECISION)
+            })
+
+    keys = {"bucket_start": bucket, "label_bucket": FRAUD_BUCKET if fraud else OTHER_BUCKET}
+    await _upsert_counts(session, LabelHourRollup, keys, {
+        "dispute_count": 1,
+        "amount_sum": amount,
+        "round_amount_count": int(round_amount),
+    }, hour_of_day=bucket.hour)
+    if round_amount:
+        await _merge_row(session, LabelHourRollup, keys, lambda row: {
+            "round_amounts": _add_round_amount(row.round_amounts, amount)
+        })
+
+
+def _add_to_sketch(data: Optional[bytes], value: str, precision: int) -> bytes:
+    sketch = HyperLogLog.from_bytes(data, precision)
+    sketch.add(value)
+    return sketch.to_bytes()
+
+
+def _add_to_histogram(histogram: Optional[dict], key: str) -> dict:
+    histogram = dict(histogram or {})
+    histogram[key] = histogram.get(key, 0) + 1
+    return histogram
+
+
+def _add_round_amount(round_amounts: Optional[dict], amount: int) -> dict:
+    return _add_to_histogram(round_amounts, str(amount))
+
+
+async def rebuild_rollups(
+    session: AsyncSession,
+    batch_size: int = 5000,
+    before: Optional[dt.datetime] = None,
+) -> int:
+    """
+    Recompute the rollups of every hour before ``before`` from
+    ``dispute_case`` in one streamed pass.
+
+    Rows from ``before`` on are neither read nor replaced, so increments
+    that ``record_case`` makes while the rebuild runs are never lost.
+
+    Args:
+        session: Session the rollups are replaced in
+        batch_size: Cases fetched per round trip
+        before: Start of the first hour left alone; defaults to the hour
+            ``REBUILD_MARGIN`` ago
+
+    Returns:
+        Number of cases read
+    """
+    before = hour_bucket(before or dt.datetime.utcnow() - REBUILD_MARGIN)
+    merchants: Dict[tuple, dict] = defaultdict(lambda: {
+        "dispute_count": 0, "fraud_count": 0, "amount_sum": 0, "fraud_amount_sum": 0,
+        "customers": HyperLogLog(MERCHANT_HLL_PRECISION), "amount_hist": Counter(),
+    })
+    customers: Dict[tuple, dict] = defaultdict(lambda: {
+        "dispute_count": 0, "amount_sum": 0, "merchants": HyperLogLog(CUSTOMER_HLL_PRECISION),
+    })
+    labels: Dict[tuple, dict] = defaultdict(lambda: {
+        "dispute_count": 0, "amount_sum": 0, "round_amount_count": 0, "round_amounts": Counter(),
+    })
+
+    cases = 0
+    stmt = select(
+        DisputeCase.created_at, DisputeCase.merchant_id, DisputeCase.customer_id,
+        DisputeCase.amount_cents, DisputeCase.classification
+    ).where(DisputeCase.created_at < before).execution_options(yield_per=batch_size)
+    async for created_at, merchant_id, customer_id, amount, label in await session.stream(stmt):
+        cases += 1
+        bucket = hour_bucket(created_at)
+        fraud = is_fraud(label)
+        if merchant_id:
+            m = merchants[bucket, merchant_id]
+            m["dispute_count"] += 1
+            m["amount_sum"] += amount
+            m["amount_hist"][amount_bin(amount)] += 1
+            if fraud:
+                m["fraud_count"] += 1
+                m["fraud_amount_sum"] += amount
+            if customer_id:
+                m["customers"].add(customer_id)
+        if customer_id:
+            c = customers[bucket, customer_id]
+            c["dispute_count"] += 1
+            c["amount_sum"] += amount
+            if merchant_id:
+                c["merchants"].add(merchant_id)
+        l = labels[bucket, FRAUD_BUCKET if fraud else OTHER_BUCKET]
+        l["dispute_count"] += 1
+        l["amount_sum"] += amount
+        if amount % ROUND_AMOUNT_CENTS == 0:
+            l["round_amount_count"] += 1
+            l["round_amounts"][str(amount)] += 1
+
+    for model in (MerchantHourRollup, CustomerHourRollup, LabelHourRollup):
+        await session.execute(delete(model).where(model.bucket_start < before))
+    session.add_all(
+        MerchantHourRollup(
+            bucket_start=bucket, merchant_id=merchant_id,
+            dispute_count=m["dispute_count"], fraud_count=m["fraud_count"],
+            amount_sum=m["amount_sum"], fraud_amount_sum=m["fraud_amount_sum"],
+            customers_hll=m["customers"].to_bytes() if m["customers"].registers.any() else None,
+            amount_hist=dict(m["amount_hist"]),
+        )
+        for (bucket, merchant_id), m in merchants.items()
+    )
+    session.add_all(
+        CustomerHourRollup(
+            bucket_start=bucket, customer_id=customer_id,
+            dispute_count=c["dispute_count"], amount_sum=c["amount_sum"],
+            merchants_hll=c["merchants"].to_bytes() if c["merchants"].registers.any() else None,
+        )
+        for (bucket, customer_id), c in customers.items()
+    )
+    session.add_all(
+        LabelHourRollup(
+            bucket_start=bucket, label_bucket=label_bucket, hour_of_day=bucket.hour,
+            dispute_count=l["dispute_count"], amount_sum=l["amount_sum"],
+            round_amount_count=l["round_amount_count"], round_amounts=dict(l["round_amounts"]) or None,
+        )
+        for (bucket, label_bucket), l in labels.items()
+    )
+    return cases
@@ -0,0 +1,78 @@
+"""
+Mergeable Cardinality Sketches.
+
+``HyperLogLog`` estimates distinct counts in fixed memory and merges by
+taking register maxima, so per-hour sketches stored in the rollup tables
+can be combined into a distinct count for any window of hours.
+``estimate_counts`` does the same estimate for many sketches at once, and
+``merge_runs`` merges runs of consecutive sketches.
+"""
+
+import hashlib
+from typing import Optional
+
+import numpy as np
+
+
+def estimate_counts(registers: np.ndarray) -> np.ndarray:
+    """Distinct-count estimates of a 2-D array of sketch registers, one sketch per row"""
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.ldexp(1.0, -registers.astype(np.int32)).sum(axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+    # Small cardinalities: linear counting
+    small = (estimate <= 2.5 * m) & (zeros > 0)
+    estimate[small] = m * np.log(m / zeros[small])
+    return np.rint(estimate).astype(np.int64)
+
+
+def merge_runs(registers: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Register maxima of each run of rows beginning at ``starts``"""
+    # Single-row runs are copied in one take; ``np.maximum.reduceat`` would do
+    # the rest, but on uint8 rows it is far slower than a max per run
+    ends = np.append(starts[1:], len(registers))
+    merged = registers[starts]
+    for run in np.flatnonzero(ends - starts > 1):
+        registers[starts[run]:ends[run]].max(axis=0, out=merged[run])
+    return merged
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter with ``2 ** precision`` one-byte registers.
+
+    Standard error is about ``1.04 / sqrt(2 ** precision)`` (3.3% at
+    precision 10); small cardinalities use linear counting and are close to
+    exact. Values are hashed with BLAKE2b, so sketches built in different
+    processes merge correctly.
+    """
+
+    def __init__(self, precision: int = 10, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def add(self, value: str) -> None:
+        h = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> int:
+        return int(estimate_counts(self.registers[np.newaxis, :])[0])
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes], precision: int = 10) -> "HyperLogLog":
+        """Sketch stored by ``to_bytes`` (an empty one for None)"""
+        if not data:
+            return cls(precision)
+        return cls(len(data).bit_length() - 1, np.frombuffer(data, dtype=np.uint8).copy())
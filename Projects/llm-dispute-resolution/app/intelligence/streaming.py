@@ -0,0 +1,274 @@
+"""
+Streaming Pattern Detection.
+
+Evaluates the pattern thresholds as cases complete, instead of waiting for
+someone to call the analytics API. Each merchant and customer has a
+sliding-window counter: a ring of time buckets with running totals, so an
+event costs a constant amount of work (at most one pass over the ring when
+a long idle gap expires it). Entities live in a size-bounded LRU that also
+drops those idle for a whole window, so memory stays bounded however many
+merchants and customers are seen. (A plain OrderedDict rather than
+``core.cache.LRUCache``: per-lookup cache metrics would cost more than the
+counting itself on this path.)
+
+Alerts fire the moment a threshold is crossed, once per severity level;
+an entity whose window decays below the threshold re-arms. Counts are per
+worker process.
+"""
+
+import datetime as dt
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional
+
+from ..core.config import get_settings
+from ..domain.models import DisputeCase
+from ..telemetry import prometheus
+from .pattern_detector import AlertSeverity, PatternAlert, PatternType
+from .rollups import is_fraud
+
+settings = get_settings()
+
+# Counter fields of every window
+DISPUTES, FRAUD, AMOUNT = range(3)
+N_FIELDS = 3
+
+# Per-entity slots of the alert level last fired (merchants use both, customers the first)
+FRAUD_CLUSTER_RULE, FRAUD_RATE_RULE = 0, 1
+CUSTOMER_BURST_RULE = 0
+
+
+class WindowCounter:
+    """Counts over the last ``n_buckets`` time buckets, kept as running totals"""
+
+    __slots__ = ("head", "slots", "totals")
+
+    def __init__(self, n_buckets: int):
+        self.head: Optional[int] = None  # bucket number of the newest slot
+        self.slots = [0] * (n_buckets * N_FIELDS)
+        self.totals = [0] * N_FIELDS
+
+    def add(self, bucket: int, disputes: int, fraud: int, amount: int) -> bool:
+        """Count an event in ``bucket``; False if it is older than the window"""
+        self.advance(bucket)
+        n_buckets = len(self.slots) // N_FIELDS
+        if bucket <= self.head - n_buckets:
+            return False
+        base = (bucket % n_buckets) * N_FIELDS
+        for field, value in ((DISPUTES, disputes), (FRAUD, fraud), (AMOUNT, amount)):
+            self.slots[base + field] += value
+            self.totals[field] += value
+        return True
+
+    def advance(self, bucket: int) -> None:
+        """Move the window forward to ``bucket``, expiring the buckets it leaves"""
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        n_buckets = len(self.slots) // N_FIELDS
+        for expired in range(self.head + 1, min(bucket, self.head + n_buckets) + 1):
+            base = (expired % n_buckets) * N_FIELDS
+            for field in range(N_FIELDS):
+                self.totals[field] -= self.slots[base + field]
+                self.slots[base + field] = 0
+        self.head = bucket
+
+
+class EntityWindow:
+    """Window counter of one merchant or customer, and the alert levels already fired"""
+
+    __slots__ = ("counter", "fired", "last_seen")
+
+    def __init__(self, n_buckets: int):
+        self.counter = WindowCounter(n_buckets)
+        self.fired = [0, 0]  # alert level last fired, per rule slot
+        self.last_seen = 0.0
+
+
+class EntityWindows:
+    """Size-bounded LRU of entity windows that also drops entities idle for a window"""
+
+    def __init__(self, n_buckets: int, max_entities: int, idle_seconds: float):
+        self.n_buckets = n_buckets
+        self.max_entities = max_entities
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[str, EntityWindow]" = OrderedDict()
+
+    def touch(self, key: str, now: float) -> EntityWindow:
+        entries = self._entries
+        window = entries.get(key)
+        if window is None or now - window.last_seen > self.idle_seconds:
+            window = entries[key] = EntityWindow(self.n_buckets)
+        entries.move_to_end(key)
+        window.last_seen = now
+        # The LRU end holds the longest idle: evict over the bound or past the idle time
+        while entries:
+            oldest = next(iter(entries.values()))
+            if len(entries) <= self.max_entities and now - oldest.last_seen <= self.idle_seconds:
+                break
+            entries.popitem(last=False)
+        return window
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class StreamingPatternDetector:
+    """
+    Sliding-window pattern thresholds evaluated on every completed case.
+
+    Thresholds follow the batch detectors, over ``window_seconds``:
+    - merchant fraud cluster: 5 fraud disputes (MEDIUM), 10 (HIGH)
+    - merchant anomaly: fraud rate above 40% (MEDIUM) or 60% (HIGH), from 3 disputes
+    - customer anomaly: 5 disputes (MEDIUM), 8 (HIGH)
+    """
+
+    def __init__(
+        self,
+        window_seconds: int,
+        bucket_seconds: int,
+        max_entities: int,
+        max_alerts: int
+    ):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, -(-window_seconds // bucket_seconds))
+        # Idle entities expire after a whole window: their counts would be zero
+        self.merchants = EntityWindows(self.n_buckets, max_entities, window_seconds)
+        self.customers = EntityWindows(self.n_buckets, max_entities, window_seconds)
+        self.alerts: Deque[PatternAlert] = deque(maxlen=max_alerts)
+        self.events = 0
+        self.late_events = 0
+
+    def observe(self, case: DisputeCase, now: Optional[float] = None) -> List[PatternAlert]:
+        """Count a completed case; returns the alerts it triggered"""
+        now = time.time() if now is None else now
+        occurred = case.created_at.replace(tzinfo=dt.timezone.utc).timestamp() if case.created_at else now
+        bucket = int(occurred // self.bucket_seconds)
+        fraud = int(is_fraud(case.classification))
+        self.events += 1
+
+        fired = []
+        late = False
+        if case.merchant_id:
+            window = self.merchants.touch(case.merchant_id, now)
+            if window.counter.add(bucket, 1, fraud, case.amount_cents):
+                fired.extend(self._check_merchant(case.merchant_id, window))
+            else:
+                late = True
+        if case.customer_id:
+            window = self.customers.touch(case.customer_id, now)
+            if window.counter.add(bucket, 1, fraud, case.amount_cents):
+                fired.extend(self._check_customer(case.customer_id, window))
+            else:
+                late = True
+        self.late_events += late
+        for alert in fired:
+            self.alerts.append(alert)
+            prometheus.record_stream_alert(alert.pattern_type.value)
+        return fired
+
+    def recent_alerts(self, limit: Optional[int] = None) -> List[PatternAlert]:
+        """Alerts fired so far, most recent first"""
+        alerts = list(reversed(self.alerts))
+        return alerts[:limit] if limit is not None else alerts
+
+    def stats(self) -> dict:
+        return {
+            "window_seconds": self.window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "events": self.events,
+            "late_events": self.late_events,
+            "merchants_tracked": len(self.merchants),
+            "customers_tracked": len(self.customers),
+            "alerts_buffered": len(self.alerts),
+        }
+
+    def _crossed(self, window: EntityWindow, rule: int, level: int) -> bool:
+        """True once per level reached; falling back below a level re-arms it"""
+        previous = window.fired[rule]
+        window.fired[rule] = level
+        return level > previous
+
+    def _check_merchant(self, merchant_id: str, window: EntityWindow) -> List[PatternAlert]:
+        alerts = []
+        disputes, fraud_count, amount = window.counter.totals
+
+        level = 2 if fraud_count >= 10 else 1 if fraud_count >= 5 else 0
+        if self._crossed(window, FRAUD_CLUSTER_RULE, level):
+            alerts.append(self._alert(
+                PatternType.FRAUD_CLUSTER, merchant_id, level,
+                title=f"Fraud Burst - Merchant {merchant_id}",
+                description=f"{fraud_count} fraud disputes for merchant {merchant_id} in the last {self._window_text()}",
+                confidence=min(0.9, 0.6 + (fraud_count - 5) * 0.05),
+                metadata={"fraud_count": fraud_count, "dispute_count": disputes}
+            ))
+
+        fraud_rate = fraud_count / disputes if disputes else 0.0
+        level = 0
+        if disputes >= 3:
+            level = 2 if fraud_rate > 0.6 else 1 if fraud_rate > 0.4 else 0
+        if self._crossed(window, FRAUD_RATE_RULE, level):
+            alerts.append(self._alert(
+                PatternType.MERCHANT_ANOMALY, merchant_id, level,
+                title=f"High Fraud Rate - Merchant {merchant_id}",
+                description=f"Merchant {merchant_id} has {fraud_rate:.1%} fraud rate ({fraud_count}/{disputes} disputes) in the last {self._window_text()}",
+                confidence=min(0.95, 0.5 + fraud_rate),
+                metadata={
+                    "fraud_rate": fraud_rate,
+                    "total_disputes": disputes,
+                    "fraud_disputes": fraud_count,
+                    "avg_amount": amount / disputes
+                }
+            ))
+        return alerts
+
+    def _check_customer(self, customer_id: str, window: EntityWindow) -> List[PatternAlert]:
+        disputes, _, amount = window.counter.totals
+        level = 2 if disputes >= 8 else 1 if disputes >= 5 else 0
+        if not self._crossed(window, CUSTOMER_BURST_RULE, level):
+            return []
+        return [self._alert(
+            PatternType.CUSTOMER_ANOMALY, customer_id, level,
+            title=f"Dispute Burst - Customer {customer_id}",
+            description=f"Customer {customer_id} filed {disputes} disputes in the last {self._window_text()}",
+            confidence=min(0.95, 0.6 + (disputes - 5) * 0.05),
+            metadata={"dispute_count": disputes, "total_amount": amount}
+        )]
+
+    def _alert(
+        self,
+        pattern_type: PatternType,
+        entity: str,
+        level: int,
+        title: str,
+        description: str,
+        confidence: float,
+        metadata: dict
+    ) -> PatternAlert:
+        return PatternAlert(
+            id=f"stream_{pattern_type.value}_{entity}_{int(time.time())}",
+            pattern_type=pattern_type,
+            severity=AlertSeverity.HIGH if level >= 2 else AlertSeverity.MEDIUM,
+            title=title,
+            description=description,
+            entities_involved=[entity],
+            confidence_score=confidence,
+            detected_at=dt.datetime.utcnow(),
+            metadata={**metadata, "window_seconds": self.window_seconds, "source": "stream"}
+        )
+
+    def _window_text(self) -> str:
+        minutes = self.window_seconds / 60
+        return f"{minutes / 60:g} hours" if minutes >= 60 else f"{minutes:g} minutes"
+
+
+# Global streaming detector, fed by process_case
+stream_detector = StreamingPatternDetector(
+    window_seconds=settings.stream_window_seconds,
+    bucket_seconds=settings.stream_bucket_seconds,
+    max_entities=settings.stream_max_entities,
+    max_alerts=settings.stream_alert_buffer
+)
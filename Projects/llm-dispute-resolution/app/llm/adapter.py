@@ -20,6 +20,8 @@ from dataclasses import dataclass
 import httpx
 from ..core.config import get_settings
 from ..security.pii_redactor import sanitize_for_llm
+from ..telemetry.tracing import tracer
+from ..telemetry import prometheus
 
 class LLMProvider(Enum):
     """Supported LLM providers"""
@@ -105,14 +107,17 @@ class OpenAIClient(BaseLLMClient):
             "response_format": kwargs.get("response_format", {"type": "text"})
         }
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        with tracer.span("llm.http", model=model) as span:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=headers,
+                    json=payload
+                )
+                if span is not None:
+                    span.set_attribute("http.status_code", response.status_code)
+                response.raise_for_status()
+                data = response.json()
         
         latency_ms = int((time.time() - start_time) * 1000)
         usage = data["usage"]
@@ -223,6 +228,7 @@ class LLMAdapter:
         self.clients = self._initialize_clients()
         self.prompts = self._load_prompt_templates()
         self.usage_stats = {"total_cost": 0.0, "total_tokens": 0}
+        self._call_slots = asyncio.Semaphore(self.settings.max_concurrent_llm_calls)
     
     def _initialize_clients(self) -> Dict[LLMProvider, BaseLLMClient]:
         """Initialize available LLM clients"""
@@ -302,11 +308,12 @@ Respond with JSON only:
         template = self.prompts["classify_dispute"]
         
         # Format prompt
-        prompt = template.template.format(
-            amount=amount / 100,  # Convert cents to dollars
-            currency=currency,
-            narrative=sanitized_narrative
-        )
+        with tracer.span("llm.prompt_format", template=template.name):
+            prompt = template.template.format(
+                amount=amount / 100,  # Convert cents to dollars
+                currency=currency,
+                narrative=sanitized_narrative
+            )
         
         # Execute LLM call
         response = await self._execute_llm_call(
@@ -317,7 +324,8 @@ Respond with JSON only:
         
         # Parse and validate response
         try:
-            result = json.loads(response.content)
+            with tracer.span("llm.json_parse"):
+                result = json.loads(response.content)
             result.update({
                 "latency_ms": response.latency_ms,
                 "cost_usd": response.cost_usd,
@@ -335,20 +343,22 @@ Respond with JSON only:
         template = self.prompts["recommend_action"]
         
         # Format prompt
-        prompt = template.template.format(
-            classification_label=classification.get("label", "UNKNOWN"),
-            classification_confidence=classification.get("confidence", 0.0),
-            classification_rationale=classification.get("rationale", ""),
-            recent_transactions=enrichment.get("recent_transactions", 0),
-            prior_disputes=enrichment.get("prior_disputes", 0)
-        )
+        with tracer.span("llm.prompt_format", template=template.name):
+            prompt = template.template.format(
+                classification_label=classification.get("label", "UNKNOWN"),
+                classification_confidence=classification.get("confidence", 0.0),
+                classification_rationale=classification.get("rationale", ""),
+                recent_transactions=enrichment.get("recent_transactions", 0),
+                prior_disputes=enrichment.get("prior_disputes", 0)
+            )
         
         # Execute LLM call
         response = await self._execute_llm_call(prompt=prompt, template=template)
         
         # Parse and validate response
         try:
-            result = json.loads(response.content)
+            with tracer.span("llm.json_parse"):
+                result = json.loads(response.content)
             result.update({
                 "latency_ms": response.latency_ms,
                 "cost_usd": response.cost_usd,
@@ -373,27 +383,60 @@ Respond with JSON only:
             {"role": "user", "content": prompt}
         ]
         
-        # Execute with retry logic
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = await client.chat_completion(
-                    messages=messages,
-                    model=model,
-                    max_tokens=template.max_tokens,
-                    temperature=0.1
-                )
-                
-                # Update usage statistics
-                self.usage_stats["total_cost"] += response.cost_usd
-                self.usage_stats["total_tokens"] += response.total_tokens
-                
-                return response
-                
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise
-                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+        with tracer.span(
+            "llm.call",
+            provider=provider.value,
+            model=model,
+            template=template.name,
+            template_version=template.version
+        ):
+            started = time.perf_counter()
+            # Execute with retry logic
+            max_retries = 3
+            for attempt in range(max_retries):
+                try:
+                    with tracer.span("llm.attempt", attempt=attempt + 1):
+                        # Wait for one of the max_concurrent_llm_calls slots
+                        with tracer.span("llm.queue_wait"):
+                            prometheus.LLM_QUEUE_DEPTH.inc()
+                            try:
+                                await self._call_slots.acquire()
+                            finally:
+                                prometheus.LLM_QUEUE_DEPTH.dec()
+                        prometheus.LLM_IN_FLIGHT.inc()
+                        try:
+                            response = await client.chat_completion(
+                                messages=messages,
+                                model=model,
+                                max_tokens=template.max_tokens,
+                                temperature=0.1
+                            )
+                        finally:
+                            self._call_slots.release()
+                            prometheus.LLM_IN_FLIGHT.dec()
+                    
+                    # Update usage statistics
+                    self.usage_stats["total_cost"] += response.cost_usd
+                    self.usage_stats["total_tokens"] += response.total_tokens
+                    prometheus.record_llm_call(
+                        provider=provider.value,
+                        model=model,
+                        template=template.name,
+                        template_version=template.version,
+                        seconds=time.perf_counter() - started,
+                        prompt_tokens=response.prompt_tokens,
+                        completion_tokens=response.completion_tokens,
+                        cost_usd=response.cost_usd
+                    )
+                    
+                    return response
+                    
+                except Exception as e:
+                    if attempt == max_retries - 1:
+                        raise
+                    prometheus.record_llm_retry(provider.value, model, template.name, template.version)
+                    with tracer.span("llm.backoff", attempt=attempt + 1):
+                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
         
         raise Exception("LLM call failed after all retries")
     
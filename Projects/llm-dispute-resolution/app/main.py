@@ -1,4 +1,5 @@
-from fastapi import FastAPI, Request, HTTPException, status
+import asyncio
+from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
@@ -6,10 +7,17 @@ from prometheus_client import start_http_server
 
 from app.api.routers import disputes, disputes_v1, analytics
 from app.infra.db import init_db
-from app.telemetry.metrics import metrics, audit
+from app.telemetry.metrics import metrics, metrics_router
+from app.telemetry.audit_log import access_log, audit_log
+from app.telemetry.tracing import tracer, traces_router
+from app.telemetry.readiness import readiness
+from app.security import batch, pii_handler
 from app.security.pii_handler import PIIHandler
 from app.security.auth import SecurityManager
+from app.security.middleware import SecurityMiddleware
 from app.analytics.engine import AnalyticsEngine
+from app.intelligence.alert_cache import pattern_cache
+from app.intelligence import merchant_risk
 from app.core.config import get_settings
 
 settings = get_settings()
@@ -28,11 +36,39 @@ async def lifespan(app: FastAPI):
     app.state.security = SecurityManager()
     app.state.pii_handler = PIIHandler()
     app.state.analytics = AnalyticsEngine()
+
+    # Load the presidio/spaCy engines in the background: /health answers
+    # at once, /ready once the warm-up has finished
+    warmup_task = asyncio.create_task(readiness.load("pii_engines", pii_handler.warm_up))
+
+    # Keep the analytics endpoints' pattern alerts precomputed
+    pattern_refresh_task = asyncio.create_task(
+        pattern_cache.run_refresh(settings.pattern_refresh_interval_seconds)
+    )
+    # ...and the merchant risk ranking of the default window
+    risk_refresh_task = asyncio.create_task(merchant_risk.run_refresh(
+        settings.pattern_detection_window_days, settings.merchant_risk_refresh_seconds
+    ))
+
+    # Audit and access log writers and their retention/compaction jobs
+    await audit_log.start()
+    await access_log.start()
+    compaction_tasks = [
+        asyncio.create_task(log.run_compaction(settings.audit_compaction_interval_seconds))
+        for log in (audit_log, access_log)
+    ]
     
     yield
     
-    # Shutdown - cleanup if needed
-    pass
+    # Shutdown
+    warmup_task.cancel()
+    pattern_refresh_task.cancel()
+    risk_refresh_task.cancel()
+    for task in compaction_tasks:
+        task.cancel()
+    await audit_log.stop()
+    await access_log.stop()
+    await asyncio.to_thread(batch.shutdown_all)
 
 app = FastAPI(
     title="LLM Dispute Resolution System",
@@ -50,56 +86,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.middleware("http")
-async def security_middleware(request: Request, call_next):
-    """Security and audit middleware."""
-    try:
-        # Skip auth for docs and metrics
-        if request.url.path in ["/docs", "/redoc", "/metrics", "/health"]:
-            return await call_next(request)
-            
-        # Verify API key
-        if request.url.path.startswith("/v1"):
-            key = request.headers.get("x-api-key")
-            if key != settings.api_key:
-                audit.log_security(
-                    event_type="AUTH_FAILURE",
-                    severity="HIGH",
-                    description="Invalid API key"
-                )
-                return JSONResponse(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={"detail": "Invalid API key"}
-                )
-                
-        # Check rate limits
-        await app.state.security.check_rate_limit(
-            key=request.headers.get("x-api-key", "anonymous")
-        )
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Log success
-        audit.log_access(
-            user_id=request.headers.get("x-api-key", "anonymous"),
-            resource=request.url.path,
-            action=request.method,
-            status="SUCCESS"
-        )
-        
-        return response
-        
-    except Exception as e:
-        # Log error
-        audit.log_access(
-            user_id=request.headers.get("x-api-key", "anonymous"),
-            resource=request.url.path,
-            action=request.method,
-            status="ERROR",
-            details={"error": str(e)}
-        )
-        raise
+# Authentication, rate limiting and access audit
+app.add_middleware(SecurityMiddleware)
 
 # Register routes
 app.include_router(disputes_v1.router)   # API v1 routes
@@ -119,6 +107,11 @@ async def health_check():
         }
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the lazily loaded components are warm."""
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
+
 @app.get("/")
 async def root():
     return {
@@ -145,3 +138,4 @@ app.include_router(disputes.router)      # Legacy v0 API
 app.include_router(disputes_v1.router)   # Enhanced v1 API 
 app.include_router(analytics.router)     # Advanced analytics API
 app.include_router(metrics_router)       # System metrics
+app.include_router(traces_router)        # Recent slow traces
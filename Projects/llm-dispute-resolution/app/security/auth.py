@@ -2,14 +2,22 @@
 Authentication and Authorization Module.
 Handles API security, rate limiting, and access control.
 """
+import hashlib
+import hmac
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional
 from fastapi import Depends, HTTPException, Security
 from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from app.core.cache import LRUCache
 from app.core.config import get_settings
+from app.telemetry.prometheus import RATE_LIMIT_REJECTIONS, record_cache
 import time
 
 settings = get_settings()
@@ -28,6 +36,11 @@ class Token(BaseModel):
     expires_in: int
 
 
+# Subject prefix of principals resolved from API keys, the only ones the
+# "*" scope is honored for
+API_KEY_SUBJECT_PREFIX = "api_key:"
+
+
 class TokenData(BaseModel):
     """JWT token data."""
     sub: str
@@ -35,49 +48,309 @@ class TokenData(BaseModel):
     exp: int
 
 
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate limit check for one key."""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the key's full burst is available again
+    retry_after: float  # seconds until the next request would be allowed (0 if allowed)
+
+    def headers(self) -> Dict[str, str]:
+        """``RateLimit-*`` response headers, plus ``Retry-After`` when denied."""
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(int(self.reset_after + 0.999)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, int(self.retry_after + 0.999)))
+        return headers
+
+
 class RateLimiter:
-    """Rate limiter using Redis."""
-    
-    def __init__(self):
+    """
+    Per-key rate limiter using the generic cell rate algorithm (GCRA).
+
+    Each key stores a single number, its theoretical arrival time (TAT), so
+    a check is O(1). Requests are spaced ``60 / rate_limit_per_minute``
+    seconds apart on average, with up to ``burst`` allowed back to back.
+    Keys whose TAT has passed are back at full burst and carry no state;
+    they are dropped lazily from the front of the LRU order on later checks.
+    """
+
+    def __init__(
+        self,
+        rate_per_minute: Optional[int] = None,
+        burst: Optional[int] = None,
+        max_keys: int = 1_000_000
+    ):
         """Initialize rate limiter."""
-        self.window_size = 60  # 1 minute
-        self.max_requests = settings.rate_limit_per_minute
-        self._cache = {}  # In-memory cache for development
-        
+        self.rate_per_minute = rate_per_minute or settings.rate_limit_per_minute
+        self.burst = burst or settings.rate_limit_burst
+        self.max_keys = max_keys
+        self.emission_interval = 60.0 / self.rate_per_minute
+        self.burst_tolerance = self.emission_interval * self.burst
+        self._tat: "OrderedDict[str, float]" = OrderedDict()  # least recently updated first
+
+    def _expire(self, now: float) -> None:
+        # Bounded work per call keeps the check O(1) amortised
+        for _ in range(2):
+            if not self._tat:
+                return
+            key, tat = next(iter(self._tat.items()))
+            if tat > now and len(self._tat) <= self.max_keys:
+                return
+            del self._tat[key]
+
+    def acquire(self, key: str, cost: int = 1, now: Optional[float] = None) -> RateLimitResult:
+        """Check and, if allowed, consume ``cost`` requests for ``key``."""
+        now = time.time() if now is None else now
+        self._expire(now)
+
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + self.emission_interval * cost
+        allow_at = new_tat - self.burst_tolerance
+
+        if now < allow_at:
+            return RateLimitResult(
+                allowed=False,
+                limit=self.burst,
+                remaining=0,
+                reset_after=tat - now,
+                retry_after=allow_at - now
+            )
+
+        self._tat[key] = new_tat
+        self._tat.move_to_end(key)
+        return RateLimitResult(
+            allowed=True,
+            limit=self.burst,
+            remaining=int((now - allow_at) / self.emission_interval),
+            reset_after=new_tat - now,
+            retry_after=0.0
+        )
+
+    async def check(self, key: str, cost: int = 1) -> RateLimitResult:
+        """Check and consume the rate limit for ``key``."""
+        return self.acquire(key, cost)
+
     async def is_rate_limited(self, key: str) -> bool:
         """Check if request should be rate limited."""
-        current_time = time.time()
-        window_start = current_time - self.window_size
-        
-        # Clean old entries
-        self._cache = {
-            k: v for k, v in self._cache.items() 
-            if v > window_start
-        }
-        
-        # Get requests in current window
-        requests = len([t for t in self._cache.values() if t > window_start])
-        
-        if requests >= self.max_requests:
-            return True
-            
-        self._cache[f"{key}:{current_time}"] = current_time
-        return False
+        return not (await self.check(key)).allowed
+
+
+# GCRA over one Redis key per API key, using the Redis clock so every
+# replica agrees on time. Grants up to ARGV[3] requests at once (a lease).
+# Returns {granted, remaining, reset_after_ms, retry_after_ms}.
+GCRA_LUA = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local available = math.floor((now + tolerance - tat) / interval)
+if available < 1 then
+    return {0, 0, math.ceil(tat - now), math.ceil(tat + interval - tolerance - now)}
+end
+local granted = math.min(wanted, available)
+local new_tat = tat + granted * interval
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(new_tat - now))
+return {granted, available - granted, math.ceil(new_tat - now), 0}
+"""
+
+
+@dataclass
+class _Lease:
+    """Requests granted by Redis that this replica may still spend locally."""
+    tokens: int
+    remaining: int
+    reset_at: float
+    expires_at: float
+    denied_until: float = 0.0
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    GCRA rate limiter shared by all replicas through Redis.
+
+    Each check is one atomic ``EVALSHA`` round-trip. To cut round-trips a
+    replica may take a small lease of up to ``lease_size`` requests and
+    spend it locally for ``lease_ttl`` seconds; unspent leased requests
+    expire with the lease. Denials are also cached until their
+    ``Retry-After``. If Redis is unreachable the limiter falls back to the
+    in-process GCRA limiter, retrying Redis after ``retry_interval``.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        lease_size: Optional[int] = None,
+        lease_ttl: Optional[float] = None,
+        retry_interval: float = 5.0,
+        client: Optional[aioredis.Redis] = None,
+        **kwargs
+    ):
+        """Initialize rate limiter."""
+        super().__init__(**kwargs)
+        self.lease_size = lease_size or settings.rate_limit_lease_size
+        self.lease_ttl = settings.rate_limit_lease_ttl_ms / 1000 if lease_ttl is None else lease_ttl
+        self.retry_interval = retry_interval
+        self._redis = client or aioredis.from_url(
+            redis_url or settings.redis_url,
+            socket_timeout=0.25,
+            socket_connect_timeout=0.25
+        )
+        self._script = self._redis.register_script(GCRA_LUA)
+        self._leases: "OrderedDict[str, _Lease]" = OrderedDict()
+        self._redis_down_until = 0.0
+
+    @staticmethod
+    def _redis_key(key: str) -> str:
+        # Never store raw API keys in Redis
+        return "ratelimit:" + hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    def _from_lease(self, key: str, now: float) -> Optional[RateLimitResult]:
+        lease = self._leases.get(key)
+        if lease is None:
+            return None
+        if now < lease.denied_until:
+            return RateLimitResult(
+                allowed=False,
+                limit=self.burst,
+                remaining=0,
+                reset_after=max(0.0, lease.reset_at - now),
+                retry_after=lease.denied_until - now
+            )
+        if lease.tokens > 0 and now < lease.expires_at:
+            lease.tokens -= 1
+            return RateLimitResult(
+                allowed=True,
+                limit=self.burst,
+                remaining=lease.remaining + lease.tokens,
+                reset_after=max(0.0, lease.reset_at - now),
+                retry_after=0.0
+            )
+        return None
+
+    def _store_lease(self, key: str, lease: _Lease) -> None:
+        self._leases[key] = lease
+        self._leases.move_to_end(key)
+        while len(self._leases) > self.max_keys:
+            self._leases.popitem(last=False)
+
+    async def check(self, key: str, cost: int = 1) -> RateLimitResult:
+        """Check and consume the rate limit for ``key``."""
+        now = time.time()
+        if cost == 1:
+            cached = self._from_lease(key, now)
+            record_cache("rate_limit_lease", cached is not None)
+            if cached is not None:
+                return cached
+
+        if now < self._redis_down_until:
+            return self.acquire(key, cost, now)
+        try:
+            granted, remaining, reset_ms, retry_ms = await self._script(
+                keys=[self._redis_key(key)],
+                args=[
+                    self.emission_interval * 1000,
+                    self.burst_tolerance * 1000,
+                    max(cost, self.lease_size if cost == 1 else cost)
+                ]
+            )
+        except (RedisError, OSError):
+            self._redis_down_until = now + self.retry_interval
+            return self.acquire(key, cost, now)
+
+        granted, remaining = int(granted), int(remaining)
+        reset_after, retry_after = int(reset_ms) / 1000, int(retry_ms) / 1000
+        if granted < cost:
+            self._store_lease(key, _Lease(0, 0, now + reset_after, now, denied_until=now + retry_after))
+            return RateLimitResult(
+                allowed=False,
+                limit=self.burst,
+                remaining=0,
+                reset_after=reset_after,
+                retry_after=retry_after
+            )
+
+        spare = granted - cost
+        if spare:
+            self._store_lease(key, _Lease(spare, remaining, now + reset_after, now + self.lease_ttl))
+        else:
+            self._leases.pop(key, None)
+        return RateLimitResult(
+            allowed=True,
+            limit=self.burst,
+            remaining=remaining + spare,
+            reset_after=reset_after,
+            retry_after=0.0
+        )
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def _digest(value: str) -> bytes:
+    return hashlib.sha256(value.encode()).digest()
 
 
 class SecurityManager:
     """Handles authentication, authorization and rate limiting."""
     
-    def __init__(self):
+    def __init__(self, api_keys: Optional[Iterable[str]] = None):
         """Initialize security manager."""
-        self.rate_limiter = RateLimiter()
-        
+        if settings.rate_limit_backend == "redis":
+            self.rate_limiter = RedisRateLimiter()
+        else:
+            self.rate_limiter = RateLimiter()
+
+        # Valid API keys are kept only as digests
+        self._api_key_digests = [
+            _digest(key) for key in (api_keys if api_keys is not None else [settings.api_key])
+        ]
+        # Verified credentials by digest. Entries live at most
+        # auth_cache_ttl_seconds, which bounds how long a revoked or rotated
+        # credential keeps working on this process.
+        self._token_cache: LRUCache[TokenData] = LRUCache(
+            "jwt", settings.auth_cache_size, settings.auth_cache_ttl_seconds
+        )
+        self._principal_cache: LRUCache[TokenData] = LRUCache(
+            "api_key_principal", settings.auth_cache_size, settings.auth_cache_ttl_seconds
+        )
+
+    def resolve_api_key(self, api_key: Optional[str]) -> Optional[TokenData]:
+        """Principal for a valid API key, or None if the key is invalid."""
+        if not api_key:
+            return None
+        digest = _digest(api_key)
+        principal = self._principal_cache.get(digest)
+        if principal is not None:
+            return principal
+
+        # Compare against every key so timing does not reveal which matched
+        valid = False
+        for known in self._api_key_digests:
+            valid |= hmac.compare_digest(digest, known)
+        if not valid:
+            return None
+
+        principal = TokenData(sub=f"{API_KEY_SUBJECT_PREFIX}{digest.hex()[:12]}", scopes=["*"], exp=0)
+        self._principal_cache.set(digest, principal)
+        return principal
+
     async def authenticate_api_key(
         self, 
         api_key: str = Security(api_key_header)
     ) -> bool:
         """Validate API key."""
-        if api_key != settings.api_key:
+        if self.resolve_api_key(api_key) is None:
             raise HTTPException(
                 status_code=401,
                 detail="Invalid API key"
@@ -113,6 +386,11 @@ class SecurityManager:
         token: str = Depends(oauth2_scheme)
     ) -> TokenData:
         """Verify JWT token."""
+        digest = _digest(token)
+        cached = self._token_cache.get(digest)
+        if cached is not None:
+            return cached
+
         try:
             payload = jwt.decode(
                 token,
@@ -125,12 +403,21 @@ class SecurityManager:
                     status_code=401,
                     detail="Token has expired"
                 )
+            # A token cannot pass itself off as an API key principal
+            if str(payload.get("sub", "")).startswith(API_KEY_SUBJECT_PREFIX):
+                raise HTTPException(
+                    status_code=401,
+                    detail="Invalid authentication credentials"
+                )
                 
-            return TokenData(
+            token_data = TokenData(
                 sub=payload.get("sub"),
                 scopes=payload.get("scopes", []),
                 exp=payload.get("exp")
             )
+            # Never serve a token from cache past its own expiry
+            self._token_cache.set(digest, token_data, expires_at=token_data.exp)
+            return token_data
             
         except JWTError:
             raise HTTPException(
@@ -138,23 +425,47 @@ class SecurityManager:
                 detail="Invalid authentication credentials"
             )
             
-    async def check_rate_limit(self, key: str) -> None:
+    async def check_rate_limit(self, key: str) -> RateLimitResult:
         """Check rate limit for API key."""
-        if await self.rate_limiter.is_rate_limited(key):
+        result = await self.rate_limiter.check(key)
+        if not result.allowed:
+            RATE_LIMIT_REJECTIONS.inc()
             raise HTTPException(
                 status_code=429,
-                detail="Rate limit exceeded"
+                detail="Rate limit exceeded",
+                headers=result.headers()
             )
+        return result
             
     def verify_scope(
         self,
         required_scope: str,
-        token_data: TokenData = Depends(verify_token)
+        token_data: TokenData
     ) -> bool:
-        """Verify token has required scope."""
-        if required_scope not in token_data.scopes:
+        """Verify token has required scope ("*" only counts for API keys)."""
+        wildcard = token_data.sub.startswith(API_KEY_SUBJECT_PREFIX) and "*" in token_data.scopes
+        if required_scope not in token_data.scopes and not wildcard:
             raise HTTPException(
                 status_code=403,
                 detail="Not enough permissions"
             )
-        return True
\ No newline at end of file
+        return True
+
+    def require_scope(self, required_scope: str) -> Callable:
+        """Dependency that verifies the bearer token (cached) and its scope."""
+        async def dependency(token: str = Depends(oauth2_scheme)) -> TokenData:
+            token_data = await self.verify_token(token)
+            self.verify_scope(required_scope, token_data)
+            return token_data
+        return dependency
+
+    def revoke_token(self, token: str) -> None:
+        """Drop a token from this process's cache so it is re-verified."""
+        self._token_cache.pop(_digest(token))
+
+    def cache_stats(self) -> Dict[str, dict]:
+        """Size and hit rate of the credential caches."""
+        return {
+            "jwt": self._token_cache.stats(),
+            "api_key_principal": self._principal_cache.stats(),
+        }
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Process-Pool Batch Redaction.
+
+Shards bulk redaction work across worker processes. Each worker builds its
+redactor once, in the pool initializer, so models such as presidio/spaCy
+are loaded once per worker and never pickled with the work. Only the texts
+and the results cross the process boundary. ``shutdown_all`` stops every
+pool's workers (server shutdown).
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence
+
+from ..core.config import get_settings
+
+settings = get_settings()
+
+# Every pool created, for shutdown_all
+_pools: List["BatchPool"] = []
+
+
+def chunked(items: Sequence[Any], size: int) -> List[Sequence[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class BatchPool:
+    """
+    Lazily started process pool running ``worker_fn`` over chunks of items.
+
+    ``worker_fn`` takes a chunk (a list of items) and returns one result per
+    item; it runs in a worker whose state was set up by ``initializer``.
+    Batches that fit in a single chunk, or a pool configured with one
+    worker, run in-process through ``local_fn`` instead, where start-up and
+    pickling would cost more than the work (``stream`` runs it in a thread).
+    """
+
+    def __init__(
+        self,
+        initializer: Callable[[], None],
+        worker_fn: Callable[[List[Any]], List[Any]],
+        local_fn: Callable[[List[Any]], List[Any]],
+        max_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.initializer = initializer
+        self.worker_fn = worker_fn
+        self.local_fn = local_fn
+        self.max_workers = max_workers or settings.pii_batch_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size or settings.pii_batch_chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        _pools.append(self)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers must not inherit the event loop or threads of the server
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=get_context("spawn"),
+                initializer=self.initializer
+            )
+        return self._executor
+
+    def _inline(self, items: Sequence[Any]) -> bool:
+        return self.max_workers <= 1 or len(items) <= self.chunk_size
+
+    def map(self, items: Sequence[Any]) -> List[Any]:
+        """Results for ``items``, in input order; blocks the caller (use ``stream`` from async code)"""
+        items = list(items)
+        if self._inline(items):
+            return self.local_fn(items)
+        results: List[Any] = []
+        for chunk_results in self._pool().map(self.worker_fn, chunked(items, self.chunk_size)):
+            results.extend(chunk_results)
+        return results
+
+    async def stream(self, items: Sequence[Any]) -> AsyncIterator[Any]:
+        """
+        Yield results in input order as their chunks complete, without
+        blocking the event loop. At most two chunks per worker are in flight.
+        """
+        items = list(items)
+        if self._inline(items):
+            for result in await asyncio.to_thread(self.local_fn, items):
+                yield result
+            return
+
+        loop = asyncio.get_running_loop()
+        pool = self._pool()
+        chunks = iter(chunked(items, self.chunk_size))
+        pending: List[asyncio.Future] = []
+        try:
+            for chunk in chunks:
+                pending.append(loop.run_in_executor(pool, self.worker_fn, chunk))
+                if len(pending) >= 2 * self.max_workers:
+                    break
+            while pending:
+                chunk_results = await pending.pop(0)
+                next_chunk = next(chunks, None)
+                if next_chunk is not None:
+                    pending.append(loop.run_in_executor(pool, self.worker_fn, next_chunk))
+                for result in chunk_results:
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def shutdown_all() -> None:
+    """Stop the workers of every pool; a pool used again starts new ones"""
+    for pool in _pools:
+        pool.shutdown()
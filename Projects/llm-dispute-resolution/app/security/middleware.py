@@ -0,0 +1,130 @@
+"""
+Security and Access-Audit ASGI Middleware.
+
+A pure ASGI middleware (no ``BaseHTTPMiddleware`` task or body-stream
+wrapping) that authenticates API keys, applies the rate limiter and hands
+one access event per request to the batched access log writer.
+"""
+
+import json
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+from ..core.config import get_settings
+from ..telemetry.audit_log import access_log
+from ..telemetry.tracing import tracer
+from .auth import _digest
+
+settings = get_settings()
+
+# Access log key that access events are recorded under
+ACCESS_LOG_KEY = "access"
+
+EXEMPT_PATHS = frozenset({"/docs", "/redoc", "/metrics", "/health", "/ready"})
+
+
+class SecurityMiddleware:
+    """
+    Authenticates, rate limits and access-logs HTTP requests.
+
+    API keys are resolved by ``SecurityManager.resolve_api_key`` (digest
+    comparison in constant time, cached per key). Access events are queued
+    on the access log without waiting for the write.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.span("http.request", method=scope["method"], path=scope["path"]) as span:
+            status = await self._handle(scope, receive, send)
+            if span is not None:
+                span.set_attribute("http.status_code", status)
+
+    async def _handle(self, scope, receive, send) -> int:
+        path = scope["path"]
+        api_key = _header(scope, b"x-api-key")
+        started = time.time()
+        security = scope["app"].state.security
+
+        if path.startswith("/v1") and security.resolve_api_key(api_key) is None:
+            await _send_json(send, 401, {"detail": "Invalid API key"})
+            self._log_access(api_key, scope, 401, started, event_type="AUTH_FAILURE")
+            return 401
+
+        try:
+            rate_limit = await security.check_rate_limit(key=api_key or "anonymous")
+        except HTTPException as e:
+            await _send_json(send, e.status_code, {"detail": e.detail}, e.headers)
+            self._log_access(api_key, scope, e.status_code, started, event_type="RATE_LIMITED")
+            return e.status_code
+
+        rate_limit_headers = [
+            (name.lower().encode(), value.encode()) for name, value in rate_limit.headers().items()
+        ]
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + rate_limit_headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        except Exception as e:
+            self._log_access(api_key, scope, status, started, error=str(e))
+            raise
+        self._log_access(api_key, scope, status, started)
+        return status
+
+    def _log_access(
+        self,
+        api_key: Optional[str],
+        scope,
+        status: int,
+        started: float,
+        event_type: str = "ACCESS",
+        error: Optional[str] = None
+    ) -> None:
+        if not settings.enable_audit_logging:
+            return
+        event = {
+            "step": event_type,
+            "timestamp": started,
+            "latency_ms": int((time.time() - started) * 1000),
+            "success": status < 400 and error is None,
+            # Short fingerprint only: raw API keys never reach the log
+            "user_id": _digest(api_key).hex()[:12] if api_key else "anonymous",
+            "resource": scope["path"],
+            "action": scope["method"],
+            "status": status,
+        }
+        if error is not None:
+            event["details"] = {"error": error}
+        access_log.append_many(ACCESS_LOG_KEY, [event])
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _send_json(send, status: int, content: dict, headers: Optional[dict] = None) -> None:
+    body = json.dumps(content).encode()
+    raw_headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    raw_headers += [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
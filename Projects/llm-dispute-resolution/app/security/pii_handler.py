@@ -2,20 +2,53 @@
 PII Detection and Redaction Module.
 Handles sensitive data detection and secure redaction in dispute narratives.
 """
-from typing import Dict, List, Optional, Tuple
-from presidio_analyzer import AnalyzerEngine
-from presidio_analyzer.nlp_engine import NlpEngine
-from presidio_anonymizer import AnonymizerEngine
-from presidio_anonymizer.entities import OperatorConfig
-import spacy
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from app.core.cache import LRUCache
 from app.core.config import get_settings
+from app.security.batch import BatchPool
+
+if TYPE_CHECKING:
+    from presidio_analyzer import AnalyzerEngine, RecognizerResult
+    from presidio_anonymizer import AnonymizerEngine
 
 settings = get_settings()
 
-# Initialize NLP and Presidio engines
-nlp_engine = NlpEngine(nlp_configuration={"lang_code": "en"})
-analyzer = AnalyzerEngine(nlp_engine=nlp_engine)
-anonymizer = AnonymizerEngine()
+# NLP and Presidio engines, built on first use (or by warm_up) so importing
+# this module does not load a spaCy model
+_engines: Optional[Tuple["AnalyzerEngine", "AnonymizerEngine"]] = None
+_engines_lock = threading.Lock()
+
+
+def _load_engines() -> Tuple["AnalyzerEngine", "AnonymizerEngine"]:
+    from presidio_analyzer import AnalyzerEngine
+    from presidio_analyzer.nlp_engine import NlpEngineProvider
+    from presidio_anonymizer import AnonymizerEngine
+
+    nlp_engine = NlpEngineProvider(nlp_configuration={
+        "nlp_engine_name": "spacy",
+        "models": [{"lang_code": "en", "model_name": settings.pii_spacy_model}],
+    }).create_engine()
+    return AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=["en"]), AnonymizerEngine()
+
+
+def get_engines() -> Tuple["AnalyzerEngine", "AnonymizerEngine"]:
+    """The process's (analyzer, anonymizer), loaded once, thread-safely."""
+    global _engines
+    if _engines is None:
+        with _engines_lock:
+            if _engines is None:
+                _engines = _load_engines()
+    return _engines
+
+
+def warm_up() -> None:
+    """Load the engines and run one analysis so the first request pays nothing."""
+    analyzer, _ = get_engines()
+    analyzer.analyze(text="Warm-up call to 555-0100.", language="en")
+
 
 # Custom PII patterns and rules
 CUSTOM_PII_PATTERNS = {
@@ -24,6 +57,32 @@ CUSTOM_PII_PATTERNS = {
     "PHONE_US": r"\b\d{3}[-.]?\d{3}[-.]?\d{4}\b",
 }
 
+# Threshold used by validate_text for high-risk entities
+VALIDATION_THRESHOLD = 0.9
+
+
+@dataclass(frozen=True)
+class PIIAnalysis:
+    """
+    Presidio results for one text, analyzed once at ``min_score``.
+    
+    Presidio de-duplicates results before applying its score threshold, so
+    filtering these results by a higher threshold gives the same entities
+    as analyzing again at that threshold.
+    """
+    min_score: float
+    results: Tuple["RecognizerResult", ...]
+    
+    def at(self, threshold: float) -> List["RecognizerResult"]:
+        """Results scoring at least ``threshold`` (>= ``min_score``)"""
+        return [r for r in self.results if r.score >= threshold]
+
+
+# Analyses by (text digest, min score), shared by every PIIHandler in the
+# process so the pipeline and the analytics endpoints reuse one NLP pass
+_analysis_cache: LRUCache[PIIAnalysis] = LRUCache("pii_analysis", settings.pii_analysis_cache_size)
+
+
 class PIIHandler:
     """Handles PII detection and redaction in text."""
     
@@ -31,6 +90,31 @@ class PIIHandler:
         """Initialize PII handler with configuration."""
         self.confidence_threshold = settings.pii_confidence_threshold
         self.enabled = settings.enable_pii_redaction
+        # Lowest threshold any method filters at: analyze once at this score
+        self.min_score = min(self.confidence_threshold, VALIDATION_THRESHOLD)
+
+    def analyze(self, text: str) -> PIIAnalysis:
+        """
+        Run presidio once per text (cached) at the lowest threshold in use.
+        
+        Args:
+            text: Input text to analyze
+            
+        Returns:
+            PIIAnalysis to filter per use with ``at(threshold)``
+        """
+        key = (hashlib.sha256(text.encode()).digest(), self.min_score)
+        analysis = _analysis_cache.get(key)
+        if analysis is None:
+            analyzer, _ = get_engines()
+            results = analyzer.analyze(
+                text=text,
+                language="en",
+                score_threshold=self.min_score
+            )
+            analysis = PIIAnalysis(self.min_score, tuple(results))
+            _analysis_cache.set(key, analysis)
+        return analysis
     
     async def analyze_text(self, text: str) -> Dict[str, List[Dict]]:
         """
@@ -46,11 +130,7 @@ class PIIHandler:
             return {"pii_found": [], "stats": {"total_pii": 0}}
             
         # Get PII analysis results
-        results = analyzer.analyze(
-            text=text,
-            language="en",
-            score_threshold=self.confidence_threshold
-        )
+        results = self.analyze(text).at(self.confidence_threshold)
         
         # Group findings by PII type
         pii_findings = {}
@@ -97,15 +177,15 @@ class PIIHandler:
         Returns:
             Tuple of (redacted_text, redaction_stats)
         """
+        return self._redact(text, mask_type, preserve_format)
+
+    def _redact(self, text: str, mask_type: str, preserve_format: bool) -> Tuple[str, Dict]:
+        """Synchronous body of ``redact_text``, shared with the batch workers."""
         if not self.enabled or not text:
             return text, {"total_redactions": 0}
             
         # Analyze text for PII
-        results = analyzer.analyze(
-            text=text,
-            language="en",
-            score_threshold=self.confidence_threshold
-        )
+        results = self.analyze(text).at(self.confidence_threshold)
         
         # Configure anonymizer
         operator_config = {
@@ -116,6 +196,7 @@ class PIIHandler:
         }
         
         # Perform redaction
+        _, anonymizer = get_engines()
         anon_results = anonymizer.anonymize(
             text=text,
             analyzer_results=results,
@@ -135,6 +216,32 @@ class PIIHandler:
         
         return anon_results.text, stats
 
+    def redact_many(
+        self,
+        texts: Sequence[str],
+        mask_type: str = "hash",
+        preserve_format: bool = True
+    ) -> List[Tuple[str, Dict]]:
+        """
+        Redact a batch of texts across the worker process pool.
+        
+        The presidio engines are loaded once per worker, not per call.
+        
+        Returns:
+            One ``redact_text`` result per text, in input order
+        """
+        return _handler_pool.map([(text, mask_type, preserve_format) for text in texts])
+
+    async def stream_redact_many(
+        self,
+        texts: Sequence[str],
+        mask_type: str = "hash",
+        preserve_format: bool = True
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """Async ``redact_many``: yields results in input order as they are ready."""
+        async for result in _handler_pool.stream([(text, mask_type, preserve_format) for text in texts]):
+            yield result
+
     async def validate_text(self, text: str) -> Tuple[bool, Optional[str]]:
         """
         Validate text for potential sensitive data leaks.
@@ -149,11 +256,7 @@ class PIIHandler:
             return True, None
             
         # Check for high-risk PII patterns
-        results = analyzer.analyze(
-            text=text,
-            language="en",
-            score_threshold=0.9  # Higher threshold for validation
-        )
+        results = self.analyze(text).at(VALIDATION_THRESHOLD)  # Higher threshold for validation
         
         high_risk_types = {"CREDIT_CARD", "SSN", "PASSPORT_NUMBER"}
         found_high_risk = [r for r in results if r.entity_type in high_risk_types]
@@ -162,4 +265,26 @@ class PIIHandler:
             types_found = {r.entity_type for r in found_high_risk}
             return False, f"Found sensitive data: {', '.join(types_found)}"
             
-        return True, None
\ No newline at end of file
+        return True, None
+
+
+# Handler of a batch worker process, built once by the pool initializer
+_worker_handler: Optional[PIIHandler] = None
+
+
+def _init_handler_worker() -> None:
+    global _worker_handler
+    _worker_handler = PIIHandler()
+    get_engines()
+
+
+def _redact_chunk(items: List[Tuple[str, str, bool]]) -> List[Tuple[str, Dict]]:
+    return [_worker_handler._redact(*item) for item in items]
+
+
+def _redact_chunk_locally(items: List[Tuple[str, str, bool]]) -> List[Tuple[str, Dict]]:
+    handler = PIIHandler()
+    return [handler._redact(*item) for item in items]
+
+
+_handler_pool = BatchPool(_init_handler_worker, _redact_chunk, _redact_chunk_locally)
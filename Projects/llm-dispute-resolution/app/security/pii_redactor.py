@@ -7,9 +7,22 @@ from being sent to external LLM providers.
 """
 
 import re
-from typing import Dict, List, Tuple
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from enum import Enum
 from dataclasses import dataclass
+from ..core.config import get_settings
+from ..telemetry.audit import current_dispute_id
+from ..telemetry.tracing import tracer
+from ..telemetry import prometheus
+from .batch import BatchPool
+from .vault import pii_vault
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+settings = get_settings()
 
 class PIIType(Enum):
     """Types of PII that can be detected and redacted"""
@@ -37,51 +50,145 @@ class PIIRedactor:
     Features:
     - Multiple PII type detection (SSN, email, phone, credit cards, etc.)
     - Configurable redaction patterns
+    - Reversible per-case tokens instead of masks (see ``vault.py``)
     - Audit trail of redactions
     - Context-aware replacement
     """
     
+    # Pattern sources in priority order: when two patterns match at the same
+    # position the earlier one wins (e.g. a card number over a phone number).
+    # Every pattern starts at a word boundary; the leading \b is added when
+    # compiling so the combined scanner can test it once per position.
+    # Every repetition is bounded (the email local part at 256 characters,
+    # the domain and TLD at their RFC 1035 limits, separators after an
+    # account keyword at 64) so no match reaches further than
+    # ``max_match_length`` and chunked scanning needs only a fixed window.
+    PATTERNS: Dict[PIIType, str] = {
+        PIIType.EMAIL: r'[A-Za-z0-9._%+-]{1,256}@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,63}\b',
+        PIIType.CREDIT_CARD: r'(?:4\d{3}|5[1-5]\d{2}|3[47]\d{2}|6011)[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b',
+        PIIType.ACCOUNT_NUMBER: r'(?i:(?:account|acct)[\s#:]{0,64}\d{8,16}\b)',
+        PIIType.ROUTING_NUMBER: r'(?i:(?:routing|rtn)[\s#:]{0,64}\d{9}\b)',
+        PIIType.SSN: r'\d{3}-?\d{2}-?\d{4}\b',
+        PIIType.IP_ADDRESS: r'(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b',
+        PIIType.PHONE: r'(?:\+?1[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b',
+    }
+    # Union of the characters any pattern can start with; lets the scanner
+    # reject most positions before trying the alternatives
+    FIRST_CHARS = r'[\w(+.%-]'
+
+    # Every pattern except EMAIL needs at least this many \d characters (IP
+    # addresses need the fewest: four octets). EMAIL needs an '@'. A text
+    # with neither cannot match and is not scanned.
+    # tests/test_pii_prefilter.py checks this against PATTERNS.
+    MIN_DIGITS = 4
+    _ENOUGH_DIGITS = re.compile(r'\d(?:\D*\d){%d}' % (MIN_DIGITS - 1))
+
     def __init__(self):
         self.patterns = self._init_patterns()
-        self.redaction_map = {}  # For reversal if needed
+        self.scanner = self._init_scanner(self.PATTERNS)
+        # Types after each one in priority order, tried where it matches
+        types = list(self.PATTERNS)
+        self._lower_types = {pii_type.name: types[i + 1:] for i, pii_type in enumerate(types)}
+        self.max_match_length = self._max_match_length(self.scanner)
+        self.texts_checked = 0
+        self.texts_skipped = 0
         
     def _init_patterns(self) -> Dict[PIIType, re.Pattern]:
         """Initialize regex patterns for PII detection"""
+        return {pii_type: re.compile(r'\b' + source) for pii_type, source in self.PATTERNS.items()}
+
+    def _init_scanner(self, patterns: Dict[PIIType, str]) -> re.Pattern:
+        """All patterns as one alternation, one named group per PII type"""
+        alternatives = "|".join(
+            f"(?P<{pii_type.name}>{source})" for pii_type, source in patterns.items()
+        )
+        return re.compile(rf'\b(?={self.FIRST_CHARS})(?:{alternatives})')
+
+    def _max_match_length(self, scanner: re.Pattern) -> int:
+        """Longest text a scanner can match (its assertions peek one character either side)"""
+        width = sre_parse.parse(scanner.pattern).getwidth()[1]
+        if width >= sre_parse.MAXREPEAT:
+            raise ValueError("PII patterns must have bounded repetitions for chunked scanning")
+        return width
+
+    def may_contain_pii(self, text: str) -> bool:
+        """Cheap necessary condition for any pattern to match"""
+        return '@' in text or self._ENOUGH_DIGITS.search(text) is not None
+
+    def prefilter_stats(self) -> Dict[str, float]:
+        """How many texts the pre-filter has seen and let skip the scan"""
         return {
-            PIIType.SSN: re.compile(r'\b\d{3}-?\d{2}-?\d{4}\b'),
-            PIIType.EMAIL: re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'),
-            PIIType.PHONE: re.compile(r'\b(?:\+?1[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}\b'),
-            PIIType.CREDIT_CARD: re.compile(r'\b(?:4\d{3}|5[1-5]\d{2}|3[47]\d{2}|6011)[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b'),
-            PIIType.IP_ADDRESS: re.compile(r'\b(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\b'),
-            PIIType.ACCOUNT_NUMBER: re.compile(r'\b(?:account|acct)[\s#:]*(\d{8,16})\b', re.IGNORECASE),
-            PIIType.ROUTING_NUMBER: re.compile(r'\b(?:routing|rtn)[\s#:]*(\d{9})\b', re.IGNORECASE),
+            "checked": self.texts_checked,
+            "skipped": self.texts_skipped,
+            "skipped_fraction": round(self.texts_skipped / self.texts_checked, 4) if self.texts_checked else 0.0,
         }
     
     def detect_pii(self, text: str) -> List[PIIMatch]:
         """
         Detect all PII instances in the given text
         
+        Scans once with the combined pattern, stopping at every position
+        where any pattern matches. There the pattern listed first in
+        ``PATTERNS`` is reported, then any other that reaches further. A
+        match is only reported if it extends past the ones before it, so
+        matches may overlap (e.g. a card number starting inside a phone
+        number) and together cover every span any pattern matches.
+        
         Args:
             text: Input text to scan for PII
             
         Returns:
-            List of PIIMatch objects representing detected PII
+            List of PIIMatch objects representing detected PII, in text order
         """
         matches = []
         
-        for pii_type, pattern in self.patterns.items():
-            for match in pattern.finditer(text):
-                confidence = self._calculate_confidence(pii_type, match.group())
-                if confidence > 0.7:  # Threshold for PII detection
-                    matches.append(PIIMatch(
-                        pii_type=pii_type,
-                        original_text=match.group(),
-                        start_pos=match.start(),
-                        end_pos=match.end(),
-                        confidence=confidence
-                    ))
+        self.texts_checked += 1
+        if not self.may_contain_pii(text):
+            self.texts_skipped += 1
+            prometheus.record_pii_prefilter(skipped=True)
+            return matches
+        prometheus.record_pii_prefilter(skipped=False)
         
-        return sorted(matches, key=lambda x: x.start_pos)
+        covered = 0
+        pos = 0
+        while True:
+            found = self._matches_at_next(text, pos)
+            if not found:
+                break
+            for pii_type, match in found:
+                if match.end() > covered:
+                    pii_match = self._to_match(pii_type, match)
+                    if pii_match is not None:
+                        matches.append(pii_match)
+                        covered = match.end()
+            pos = found[0][1].start() + 1
+        
+        return matches
+
+    def _matches_at_next(self, text: str, pos: int) -> List[Tuple[PIIType, re.Match]]:
+        """Every pattern's match at the first position from ``pos`` where any matches, in priority order"""
+        match = self.scanner.search(text, pos)
+        if match is None:
+            return []
+        found = [(PIIType[match.lastgroup], match)]
+        for pii_type in self._lower_types[match.lastgroup]:
+            other = self.patterns[pii_type].match(text, match.start())
+            if other is not None:
+                found.append((pii_type, other))
+        return found
+
+    def _to_match(self, pii_type: PIIType, match: re.Match, offset: int = 0) -> Optional[PIIMatch]:
+        """PIIMatch for a pattern match, or None below the confidence threshold"""
+        confidence = self._calculate_confidence(pii_type, match.group())
+        if confidence <= 0.7:  # Threshold for PII detection
+            return None
+        return PIIMatch(
+            pii_type=pii_type,
+            original_text=match.group(),
+            start_pos=offset + match.start(),
+            end_pos=offset + match.end(),
+            confidence=confidence
+        )
     
     def _calculate_confidence(self, pii_type: PIIType, text: str) -> float:
         """Calculate confidence score for PII detection"""
@@ -100,30 +207,147 @@ class PIIRedactor:
             
         return base_confidence
     
-    def redact_text(self, text: str, redaction_char: str = "*") -> Tuple[str, List[PIIMatch]]:
+    def redact_text(
+        self,
+        text: str,
+        redaction_char: str = "*",
+        replace: Optional[Callable[[PIIMatch], str]] = None
+    ) -> Tuple[str, List[PIIMatch]]:
         """
         Redact PII from text while preserving structure
         
         Args:
             text: Input text to redact
             redaction_char: Character to use for redaction
+            replace: Replacement for each match instead of a mask, e.g. a
+                vault token (called once per match)
             
         Returns:
             Tuple of (redacted_text, detected_pii_list)
         """
         pii_matches = self.detect_pii(text)
-        redacted_text = text
+        replace = replace or (lambda match: self._generate_redaction(match, redaction_char))
         
-        # Process matches in reverse order to preserve positions
-        for match in reversed(pii_matches):
-            redacted_value = self._generate_redaction(match, redaction_char)
-            redacted_text = (
-                redacted_text[:match.start_pos] + 
-                redacted_value + 
-                redacted_text[match.end_pos:]
-            )
+        # Matches are ordered, each ending past the last: stitch the output together once
+        segments = []
+        position = 0
+        for cluster in _clusters(pii_matches):
+            start, end = cluster[0].start_pos, cluster[-1].end_pos
+            segments.append(text[position:start])
+            segments.append(_replace_cluster(text[start:end], cluster, replace))
+            position = end
+        segments.append(text[position:])
             
-        return redacted_text, pii_matches
+        return "".join(segments), pii_matches
+    
+    def iter_redact(
+        self,
+        chunks: Iterable[str],
+        redaction_char: str = "*",
+        replace: Optional[Callable[[PIIMatch], str]] = None
+    ) -> Iterator[Tuple[str, List[PIIMatch]]]:
+        """
+        Redact text arriving in chunks, yielding (redacted segment, matches)
+        
+        Joining the segments gives exactly ``redact_text`` of the joined
+        chunks, with match positions relative to the whole text. Only a
+        window of the latest chunk plus ``max_match_length + 1`` characters
+        is held: a match found at position p is only committed once the
+        buffer extends past p + max_match_length, the furthest character
+        the scanner can look at from p, so no later text can change it.
+        
+        Args:
+            chunks: Consecutive pieces of the input text
+            redaction_char: Character to use for redaction
+            replace: As for ``redact_text``
+        """
+        replace = replace or (lambda match: self._generate_redaction(match, redaction_char))
+        lookahead = self.max_match_length + 1
+        buffer = ""
+        base = 0  # position of buffer[0] in the whole text
+        pos = 0   # next scan position in buffer; buffer[pos - 1] is kept as \b context
+        emitted = 0  # end in buffer of the text already yielded
+        cluster: List[PIIMatch] = []  # overlapping matches not yet replaced
+        
+        for chunk in _with_end_marker(chunks):
+            final = chunk is None
+            if not final:
+                buffer += chunk
+            # Positions up to here have every character they depend on
+            decided = len(buffer) if final else len(buffer) - lookahead
+            segments = []
+            matches = []
+            while pos <= decided:
+                found = self._matches_at_next(buffer, pos)
+                if not found or (found[0][1].start() > decided and not final):
+                    pos = len(buffer) if final else max(pos, decided + 1)
+                    break
+                for pii_type, match in found:
+                    covered = cluster[-1].end_pos - base if cluster else emitted
+                    if match.end() <= covered:
+                        continue
+                    pii_match = self._to_match(pii_type, match, base)
+                    if pii_match is None:
+                        continue
+                    if cluster and match.start() >= covered:
+                        emitted = self._flush_cluster(buffer, base, cluster, replace, segments, matches)
+                    if not cluster:
+                        segments.append(buffer[emitted:match.start()])
+                        emitted = match.start()
+                    cluster.append(pii_match)
+                pos = found[0][1].start() + 1
+            # No match can start before pos: a cluster ending by then is
+            # complete, and text up to it without one is final
+            if cluster and pos >= cluster[-1].end_pos - base:
+                emitted = self._flush_cluster(buffer, base, cluster, replace, segments, matches)
+            if not cluster and pos > emitted:
+                segments.append(buffer[emitted:pos])
+                emitted = pos
+            
+            # Keep one character before the scan position for \b, and any
+            # pending cluster
+            keep_from = max(min(pos - 1, emitted), 0)
+            buffer = buffer[keep_from:]
+            base += keep_from
+            pos -= keep_from
+            emitted -= keep_from
+            
+            segment = "".join(segments)
+            if segment or matches:
+                yield segment, matches
+
+    @staticmethod
+    def _flush_cluster(
+        buffer: str,
+        base: int,
+        cluster: List[PIIMatch],
+        replace: Callable[[PIIMatch], str],
+        segments: List[str],
+        matches: List[PIIMatch]
+    ) -> int:
+        """Replace a complete cluster into ``segments``; returns its end in buffer"""
+        start, end = cluster[0].start_pos - base, cluster[-1].end_pos - base
+        segments.append(_replace_cluster(buffer[start:end], cluster, replace))
+        matches.extend(cluster)
+        cluster.clear()
+        return end
+
+    def redact_text_chunked(
+        self,
+        text: str,
+        redaction_char: str = "*",
+        chunk_size: Optional[int] = None,
+        replace: Optional[Callable[[PIIMatch], str]] = None
+    ) -> Tuple[str, List[PIIMatch]]:
+        """``redact_text`` through ``iter_redact``, scanning ``chunk_size`` characters at a time"""
+        chunk_size = chunk_size or settings.pii_scan_chunk_size
+        segments = []
+        pii_matches = []
+        chunks = (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+        for segment, matches in self.iter_redact(chunks, redaction_char, replace):
+            segments.append(segment)
+            pii_matches.extend(matches)
+        return "".join(segments), pii_matches
     
     def _generate_redaction(self, match: PIIMatch, redaction_char: str) -> str:
         """Generate context-appropriate redaction"""
@@ -137,21 +361,32 @@ class PIIRedactor:
             return re.sub(r'\d', redaction_char, match.original_text)
         elif match.pii_type == PIIType.CREDIT_CARD:
             # Show last 4 digits: "1234 5678 9012 3456" -> "**** **** **** 3456"
-            digits_only = re.sub(r'\D', '', match.original_text)
-            if len(digits_only) >= 4:
-                last_four = digits_only[-4:]
-                redacted_part = redaction_char * (len(digits_only) - 4)
-                # Preserve original formatting
-                result = match.original_text
-                for i, char in enumerate(match.original_text):
-                    if char.isdigit():
-                        if i < len(match.original_text) - 4:
-                            result = result[:i] + redaction_char + result[i+1:]
-                return result
+            # Preserve original formatting; the last four characters are the
+            # last four digits (the pattern ends in \d{4})
+            original = match.original_text
+            keep_from = len(original) - 4
+            return "".join(
+                redaction_char if i < keep_from and char.isdigit() else char
+                for i, char in enumerate(original)
+            )
         
         # Default: replace all with redaction character
         return redaction_char * len(match.original_text)
     
+    def redact_many(self, texts: Sequence[str]) -> List[Tuple[str, List[PIIMatch]]]:
+        """
+        Redact a batch of texts across the worker process pool
+        
+        Returns one ``redact_text`` result per text, in input order. Small
+        batches run in-process.
+        """
+        return _redaction_pool.map(texts)
+
+    async def stream_redact_many(self, texts: Sequence[str]) -> AsyncIterator[Tuple[str, List[PIIMatch]]]:
+        """Async ``redact_many``: yields results in input order as they are ready"""
+        async for result in _redaction_pool.stream(texts):
+            yield result
+
     def get_redaction_summary(self, pii_matches: List[PIIMatch]) -> Dict[str, int]:
         """Generate summary of redacted PII types"""
         summary = {}
@@ -160,25 +395,102 @@ class PIIRedactor:
             summary[pii_type] = summary.get(pii_type, 0) + 1
         return summary
 
+def _clusters(matches: List[PIIMatch]) -> Iterator[List[PIIMatch]]:
+    """Ordered matches grouped into runs that overlap one another"""
+    cluster: List[PIIMatch] = []
+    for match in matches:
+        if cluster and match.start_pos >= cluster[-1].end_pos:
+            yield cluster
+            cluster = []
+        cluster.append(match)
+    if cluster:
+        yield cluster
+
+
+def _replace_cluster(original: str, cluster: List[PIIMatch], replace: Callable[[PIIMatch], str]) -> str:
+    """
+    Replacement for ``original``, the text covered by overlapping matches
+
+    Length-preserving replacements (masks) are merged character by
+    character: a character changed by any match stays changed, so a card
+    number starting inside a phone number is masked as both. Otherwise
+    (tokens) the whole span becomes the replacements in order.
+    """
+    replacements = [replace(match) for match in cluster]
+    if len(cluster) == 1:
+        return replacements[0]
+    if any(len(r) != len(m.original_text) for m, r in zip(cluster, replacements)):
+        return "".join(replacements)
+    start = cluster[0].start_pos
+    merged = list(original)
+    for match, replacement in zip(cluster, replacements):
+        offset = match.start_pos - start
+        for i, (before, after) in enumerate(zip(match.original_text, replacement)):
+            if before != after:
+                merged[offset + i] = after
+    return "".join(merged)
+
+
+def _with_end_marker(chunks: Iterable[str]) -> Iterator[Optional[str]]:
+    yield from chunks
+    yield None
+
 # Global redactor instance
 pii_redactor = PIIRedactor()
 
+# Redactor of a batch worker process, built once by the pool initializer
+_worker_redactor: Optional[PIIRedactor] = None
+
+
+def _init_redaction_worker() -> None:
+    global _worker_redactor
+    _worker_redactor = PIIRedactor()
+
+
+def _redact_chunk(texts: List[str]) -> List[Tuple[str, List[PIIMatch]]]:
+    return [_worker_redactor.redact_text(text) for text in texts]
+
+
+def _redact_chunk_locally(texts: List[str]) -> List[Tuple[str, List[PIIMatch]]]:
+    return [pii_redactor.redact_text(text) for text in texts]
+
+
+_redaction_pool = BatchPool(_init_redaction_worker, _redact_chunk, _redact_chunk_locally)
+
 def sanitize_for_llm(text: str) -> Tuple[str, Dict]:
     """
     Sanitize text before sending to LLM by removing PII
     
+    Inside a case (``audit_case``) and with ``PII_TOKENIZE_FOR_LLM`` on,
+    PII values become per-case vault tokens, so the LLM sees a consistent
+    reference for each value; otherwise they are masked.
+    
     Args:
         text: Input text that may contain PII
         
     Returns:
         Tuple of (sanitized_text, redaction_metadata)
     """
-    redacted_text, pii_matches = pii_redactor.redact_text(text)
+    case_id = current_dispute_id() if settings.pii_tokenize_for_llm else None
+    replace = None
+    if case_id is not None:
+        def replace(match: PIIMatch) -> str:
+            return pii_vault.tokenize(case_id, match.pii_type.name, match.original_text)
+
+    with tracer.span("pii.sanitize", text_length=len(text)) as span:
+        if len(text) > settings.pii_scan_chunk_size:
+            # Long narratives: scan a bounded window at a time
+            redacted_text, pii_matches = pii_redactor.redact_text_chunked(text, replace=replace)
+        else:
+            redacted_text, pii_matches = pii_redactor.redact_text(text, replace=replace)
+        if span is not None:
+            span.set_attribute("redaction_count", len(pii_matches))
     
     metadata = {
         "pii_detected": len(pii_matches) > 0,
         "pii_summary": pii_redactor.get_redaction_summary(pii_matches),
-        "redaction_count": len(pii_matches)
+        "redaction_count": len(pii_matches),
+        "tokenized": case_id is not None
     }
     
     return redacted_text, metadata
\ No newline at end of file
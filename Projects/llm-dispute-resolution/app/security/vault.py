@@ -0,0 +1,190 @@
+"""
+Reversible PII Tokenization Vault.
+
+Replaces PII values with tokens such as ``[EMAIL_3f9a2c1b7d04]`` that are
+stable within a case, so the LLM sees the same reference every time a value
+recurs, and can be mapped back by an authorized caller.
+
+Tokens are an HMAC of (case, type, value): issuing one needs no lookup, and
+the same value in another case gets an unrelated token. The reverse mapping
+is kept Fernet-encrypted in a bounded, TTL-evicted LRU; entries pushed out
+by the size bound can spill to per-case files on disk, still encrypted.
+Spilled entries are written and read back by a background thread, never
+on the event loop; until written, reads find them in memory.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from typing import Dict, Hashable, List, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from ..core.cache import LRUCache
+from ..core.config import get_settings
+
+settings = get_settings()
+
+TOKEN_PATTERN = re.compile(r'\[([A-Z_]+)_([0-9a-f]{12})\]')
+
+
+class PIITokenVault:
+    """
+    Per-case PII tokens with an encrypted, bounded reverse mapping.
+
+    Without a configured key a random one is generated, so tokens can only
+    be reversed by the process that issued them; set ``PII_VAULT_KEY`` to
+    share the vault across workers and restarts.
+    """
+
+    def __init__(
+        self,
+        key: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        spill_dir: Optional[str] = None
+    ):
+        key = key or settings.pii_vault_key or Fernet.generate_key().decode()
+        self._fernet = Fernet(key.encode())
+        self._hmac_key = hashlib.sha256(b"pii-token:" + key.encode()).digest()
+        self.ttl_seconds = ttl_seconds or settings.pii_vault_ttl_seconds
+        self.spill_dir = spill_dir if spill_dir is not None else settings.pii_vault_spill_dir
+        self._entries: LRUCache[bytes] = LRUCache(
+            "pii_vault",
+            max_entries or settings.pii_vault_max_entries,
+            self.ttl_seconds,
+            on_evict=self._spill if self.spill_dir else None
+        )
+        self._last_purge = time.time()
+        # Spilled lines by case file: not yet written, and being written
+        self._pending: Dict[str, List[str]] = {}
+        self._writing: Dict[str, List[str]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def tokenize(self, case_id: str, pii_type: str, value: str) -> str:
+        """Token for ``value`` in ``case_id``, recording it for reversal"""
+        digest = hmac.new(
+            self._hmac_key, f"{case_id}\0{pii_type}\0{value}".encode(), hashlib.sha256
+        ).hexdigest()[:12]
+        token = f"[{pii_type}_{digest}]"
+        key = (case_id, token)
+        # Already stored values only refresh their LRU position
+        if self._entries.get(key) is None:
+            self._entries.set(key, self._fernet.encrypt(value.encode()))
+        return token
+
+    async def detokenize(self, case_id: str, token: str) -> Optional[str]:
+        """Original value of ``token``, or None if unknown or expired"""
+        ciphertext = self._entries.get((case_id, token))
+        if ciphertext is None and self.spill_dir:
+            spilled = await asyncio.to_thread(self._read_spilled, case_id)
+            ciphertext = spilled.get(token)
+        return self._decrypt(ciphertext) if ciphertext is not None else None
+
+    async def detokenize_text(self, case_id: str, text: str) -> str:
+        """``text`` with every known token of ``case_id`` replaced by its value"""
+        segments = []
+        position = 0
+        spilled: Optional[Dict[str, bytes]] = None
+        for match in TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            ciphertext = self._entries.get((case_id, token))
+            if ciphertext is None and self.spill_dir:
+                if spilled is None:
+                    spilled = await asyncio.to_thread(self._read_spilled, case_id)
+                ciphertext = spilled.get(token)
+            value = self._decrypt(ciphertext) if ciphertext is not None else None
+            if value is None:
+                continue
+            segments.append(text[position:match.start()])
+            segments.append(value)
+            position = match.end()
+        segments.append(text[position:])
+        return "".join(segments)
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+    async def flush(self) -> None:
+        """Wait until every spilled mapping is on disk"""
+        while self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        if self._pending:
+            await asyncio.to_thread(self._write_pending)
+
+    def _decrypt(self, ciphertext: bytes) -> Optional[str]:
+        try:
+            return self._fernet.decrypt(ciphertext).decode()
+        except InvalidToken:  # written under another key
+            return None
+
+    def _spill_path(self, case_id: str) -> str:
+        name = hmac.new(self._hmac_key, case_id.encode(), hashlib.sha256).hexdigest()[:32]
+        return os.path.join(self.spill_dir, f"{name}.vault")
+
+    def _spill(self, key: Hashable, ciphertext: bytes, expires_at: float) -> None:
+        case_id, token = key
+        with self._pending_lock:
+            self._pending.setdefault(self._spill_path(case_id), []).append(
+                f"{token}\t{ciphertext.decode()}\t{expires_at}\n"
+            )
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # no event loop to block
+            self._write_pending()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_pending())
+
+    async def _flush_pending(self) -> None:
+        while self._pending:
+            await asyncio.to_thread(self._write_pending)
+
+    def _write_pending(self) -> None:
+        with self._pending_lock:
+            self._writing, self._pending = self._pending, {}
+        for path, lines in self._writing.items():
+            with open(path, "a") as f:
+                f.write("".join(lines))
+        with self._pending_lock:
+            self._writing = {}
+        now = time.time()
+        if now - self._last_purge > self.ttl_seconds:
+            self._purge_spill(now)
+
+    def _read_spilled(self, case_id: str) -> Dict[str, bytes]:
+        path = self._spill_path(case_id)
+        with self._pending_lock:
+            unwritten = self._writing.get(path, []) + self._pending.get(path, [])
+        lines: List[str] = []
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            pass
+        now = time.time()
+        entries: Dict[str, bytes] = {}
+        for line in lines + unwritten:
+            token, ciphertext, expires_at = line.rstrip("\n").split("\t")
+            if float(expires_at) > now:
+                entries[token] = ciphertext.encode()
+        return entries
+
+    def _purge_spill(self, now: float) -> None:
+        """Delete case files not written to for a whole TTL (all their entries expired)"""
+        self._last_purge = now
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            if name.endswith(".vault") and os.path.getmtime(path) + self.ttl_seconds < now:
+                os.remove(path)
+
+
+# Global vault instance
+pii_vault = PIITokenVault()
@@ -4,27 +4,44 @@ from .classifier import run_classification
 from .enrichment import run_enrichment
 from .recommendation import run_recommendation
 from ..telemetry.metrics import metrics
-from ..telemetry.audit import get_audit_events, flush_audit_events
+from ..telemetry.audit import audit_case
+from ..telemetry.audit_log import audit_log
+from ..telemetry.tracing import tracer
+from ..telemetry import prometheus
 from ..infra.db import get_session
-from ..domain.models import DisputeCase, AuditEvent
+from ..domain.models import DisputeCase
+from ..intelligence import rollups
+from ..intelligence.streaming import stream_detector
+from ..core.config import get_settings
 from sqlalchemy import select
 
+settings = get_settings()
+
 async def process_case(dispute_id: str, payload: DisputeIn):
+    with tracer.span("process_case", dispute_id=dispute_id):
+        return await _process_case(dispute_id, payload)
+
+async def _process_case(dispute_id: str, payload: DisputeIn):
     t0 = time.perf_counter()
 
-    classification = await run_classification(payload.narrative, payload.amount, payload.currency)
-    enrichment = await run_enrichment(dispute_id)
-    recommendation = await run_recommendation(classification, enrichment)
+    # Audit steps record into this case's collector; it is released on exit
+    # even when a step raises, so failed cases leave nothing behind.
+    with audit_case(dispute_id) as audit:
+        classification = await run_classification(payload.narrative, payload.amount, payload.currency)
+        enrichment = await run_enrichment(dispute_id)
+        recommendation = await run_recommendation(classification, enrichment)
+        audit_events = audit.drain()
 
     metrics.record_classification_latency(classification.get("latency_ms", 0))
     metrics.record_recommendation_latency(recommendation.get("latency_ms", 0))
     metrics.increment_case(classification.get("label"))
+    prometheus.record_case(classification.get("label"))
     # Track total LLM cost for this case (classification + recommendation)
     total_cost = float(classification.get("cost_usd", 0.0)) + float(recommendation.get("cost_usd", 0.0))
     metrics.record_case_cost(total_cost)
 
-    # Persist dispute and audit events
-    async for session in get_session():
+    # Persist dispute
+    async with get_session() as session:
         dispute = DisputeCase(
             id=dispute_id,
             external_ref=payload.external_ref,
@@ -41,28 +58,26 @@ async def process_case(dispute_id: str, payload: DisputeIn):
             recommendation_rationale={"rationale": recommendation.get("rationale")},
         )
         session.add(dispute)
-        # Persist audit events
-        audit_events = flush_audit_events(dispute_id)
-        for event in audit_events:
-            session.add(AuditEvent(
-                dispute_case_id=dispute_id,
-                step=event["step"],
-                payload_json=event,
-            ))
+        # Pattern detection rollups, committed atomically with the case
+        await rollups.record_case(session, dispute)
         await session.commit()
 
+    # Audit events go to the append-only audit log, not the case database
+    audit_log.append_many(dispute_id, audit_events)
+
+    # Real-time pattern thresholds, evaluated on the committed case
+    if settings.enable_real_time_alerts:
+        stream_detector.observe(dispute)
+
     total_latency_ms = int((time.perf_counter() - t0) * 1000)
     return classification, enrichment, recommendation, total_latency_ms, audit_events
 
 async def get_dispute_by_id(dispute_id: str):
-    async for session in get_session():
+    async with get_session() as session:
         stmt = select(DisputeCase).where(DisputeCase.id == dispute_id)
         result = await session.execute(stmt)
         dispute = result.scalar_one_or_none()
         return dispute
 
 async def get_audit_log(dispute_id: str):
-    async for session in get_session():
-        stmt = select(AuditEvent).where(AuditEvent.dispute_case_id == dispute_id)
-        result = await session.execute(stmt)
-        return [row for row in result.scalars()]
+    return await audit_log.read(dispute_id)
@@ -1,30 +1,109 @@
 import time
-from typing import Callable, Any, Coroutine
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Any, Coroutine, Iterator, Optional
 
-_AUDIT_BUFFER: dict[str, list[dict]] = {}
+from ..core.config import get_settings
+from .tracing import tracer
+from . import prometheus
+
+settings = get_settings()
+
+
+class AuditCollector:
+    """Per-case audit event buffer with a hard size cap.
+
+    Appends are O(1); once ``max_events`` is reached the oldest events are
+    discarded and counted in ``dropped``.
+    """
+
+    __slots__ = ("dispute_id", "created_at", "dropped", "_events")
+
+    def __init__(self, dispute_id: str, max_events: int):
+        self.dispute_id = dispute_id
+        self.created_at = time.monotonic()
+        self.dropped = 0
+        self._events: deque[dict] = deque(maxlen=max_events)
+
+    def append(self, event: dict) -> None:
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+
+    def events(self) -> list[dict]:
+        return list(self._events)
+
+    def drain(self) -> list[dict]:
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+
+# Collector for the case currently being processed (set by the orchestrator)
+_current_collector: ContextVar[Optional[AuditCollector]] = ContextVar("audit_collector", default=None)
+
+# Open collectors by dispute id, oldest first. Bounded by count and age so
+# collectors that were never closed cannot accumulate.
+_AUDIT_BUFFER: "OrderedDict[str, AuditCollector]" = OrderedDict()
+
+
+def _evict_orphans(now: float) -> None:
+    ttl = settings.audit_orphan_ttl_seconds
+    while _AUDIT_BUFFER:
+        oldest = next(iter(_AUDIT_BUFFER.values()))
+        if len(_AUDIT_BUFFER) < settings.audit_max_open_cases and now - oldest.created_at < ttl:
+            break
+        _AUDIT_BUFFER.popitem(last=False)
+
+
+@contextmanager
+def audit_case(dispute_id: str) -> Iterator[AuditCollector]:
+    """Open an audit collector for ``dispute_id`` in the current context.
+
+    Every ``audit_step`` awaited inside the block records into the returned
+    collector. The collector is released on exit, whether or not the case
+    succeeded.
+    """
+    _evict_orphans(time.monotonic())
+    collector = AuditCollector(dispute_id, settings.audit_max_events_per_case)
+    _AUDIT_BUFFER[dispute_id] = collector
+    token = _current_collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _current_collector.reset(token)
+        if _AUDIT_BUFFER.get(dispute_id) is collector:
+            del _AUDIT_BUFFER[dispute_id]
+
+
+def current_dispute_id() -> Optional[str]:
+    collector = _current_collector.get()
+    return collector.dispute_id if collector else None
 
 
 def audit_step(step_name: str):
     def decorator(fn: Callable[..., Coroutine[Any, Any, dict]]):
+        @wraps(fn)
         async def wrapper(*args, **kwargs):
-            dispute_id = None
-            # Attempt to extract dispute id if present among args
-            for a in args:
-                if isinstance(a, str) and a.startswith("dsp_"):
-                    dispute_id = a
+            collector = _current_collector.get()
             start = time.perf_counter()
             success = True
             try:
-                result = await fn(*args, **kwargs)
+                with tracer.span(step_name):
+                    result = await fn(*args, **kwargs)
                 return result
             except Exception as e:  # pylint: disable=broad-except
                 success = False
                 result = {"error": str(e)}
                 raise
             finally:
-                latency = int((time.perf_counter() - start) * 1000)
-                if dispute_id:
-                    _AUDIT_BUFFER.setdefault(dispute_id, []).append({
+                elapsed = time.perf_counter() - start
+                prometheus.observe_stage(step_name, elapsed)
+                latency = int(elapsed * 1000)
+                if collector is not None:
+                    collector.append({
                         "step": step_name,
                         "timestamp": time.time(),
                         "latency_ms": latency,
@@ -36,8 +115,9 @@ def audit_step(step_name: str):
 
 
 def get_audit_events(dispute_id: str):
-    return _AUDIT_BUFFER.get(dispute_id, [])
+    collector = _AUDIT_BUFFER.get(dispute_id)
+    return collector.events() if collector else []
 
 def flush_audit_events(dispute_id: str):
-    events = _AUDIT_BUFFER.pop(dispute_id, [])
-    return events
+    collector = _AUDIT_BUFFER.get(dispute_id)
+    return collector.drain() if collector else []
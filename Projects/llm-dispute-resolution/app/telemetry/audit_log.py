@@ -0,0 +1,548 @@
+"""
+Append-only Segmented Audit Log.
+
+Audit events are written as length-prefixed JSON records to rotating segment
+files instead of the relational database, keeping the API database free for
+case state.
+
+- Each worker process writes its own ``writer-NNN`` subdirectory, claimed
+  with an exclusive file lock, so workers never share a segment file; a
+  directory whose worker has exited is claimed by the next one to start
+- A single background writer per process batches records and fsyncs once
+  per batch; a batch that fails is retried, and the queue in front of the
+  writer is bounded (records past the bound are dropped and counted)
+- Each segment keeps a sparse index of dispute id -> byte range; reads
+  cover every writer directory, following other workers' open segments
+  as they grow
+- Sealed segments are dropped after the retention period and small
+  neighbouring segments are merged by the compaction job, which also
+  compacts the directories of exited workers
+
+Dispute audit trails and HTTP access events are kept in separate logs
+(``audit_log`` and ``access_log``), so no request path or key can ever
+be read back as a dispute's trail.
+"""
+
+import asyncio
+import fcntl
+import itertools
+import json
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..core.config import get_settings
+from . import prometheus
+
+settings = get_settings()
+
+_HEADER = struct.Struct(">I")  # record length prefix
+_SEGMENT_SUFFIX = ".seg"
+_INDEX_SUFFIX = ".idx"
+_WRITER_PREFIX = "writer-"
+_LOCK_NAME = "writer.lock"
+
+
+class _StaleView(Exception):
+    """A segment changed under a read (another process compacted it)"""
+
+
+@dataclass
+class _Segment:
+    """In-memory view of one segment file and its sparse index"""
+    seq: int
+    path: Path
+    size: int = 0
+    records: int = 0
+    max_ts: float = 0.0
+    # dispute id -> (first byte, end byte) of its records in this segment
+    index: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    sealed: bool = False
+    # Inode the view was built from, for segments of other writers
+    inode: Optional[int] = None
+
+    @property
+    def index_path(self) -> Path:
+        return self.path.with_suffix(_INDEX_SUFFIX)
+
+    def note(self, key: str, start: int, end: int, ts: float) -> None:
+        first, _ = self.index.get(key, (start, end))
+        self.index[key] = (first, end)
+        self.records += 1
+        self.size = end
+        self.max_ts = max(self.max_ts, ts)
+
+    def scan(self, data: bytes, base: int = 0) -> None:
+        """Index the complete records of ``data``, which starts at byte ``base``"""
+        for start, end, record in _iter_records(data):
+            self.note(record["dispute_id"], base + start, base + end, record.get("timestamp", 0.0))
+
+    def read_index(self) -> Optional[dict]:
+        try:
+            return json.loads(self.index_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load_index(self, meta: dict) -> None:
+        self.records = meta["records"]
+        self.max_ts = meta["max_ts"]
+        self.size = meta["size"]
+        self.index = {k: tuple(v) for k, v in meta["keys"].items()}
+        self.sealed = True
+
+    def seal(self) -> None:
+        """Write the sidecar index; the segment takes no more appends"""
+        tmp = self.index_path.with_suffix(".idx.tmp")
+        tmp.write_text(json.dumps({
+            "records": self.records,
+            "max_ts": self.max_ts,
+            "size": self.size,
+            # Readers in other processes only trust the index for this file
+            "inode": os.stat(self.path).st_ino,
+            "keys": self.index,
+        }))
+        os.replace(tmp, self.index_path)
+        self.sealed = True
+
+
+def _encode(record: dict) -> bytes:
+    body = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def _iter_records(data: bytes):
+    """Yield (start, end, record) for every complete record in ``data``"""
+    pos = 0
+    while pos + _HEADER.size <= len(data):
+        (length,) = _HEADER.unpack_from(data, pos)
+        end = pos + _HEADER.size + length
+        if end > len(data):
+            break  # torn tail from an interrupted write
+        try:
+            record = json.loads(data[pos + _HEADER.size:end])
+        except ValueError:
+            break  # torn tail whose length prefix made it to disk
+        yield pos, end, record
+        pos = end
+
+
+def _try_lock(directory: Path):
+    """Open and exclusively lock a writer directory; None if a live process holds it"""
+    directory.mkdir(parents=True, exist_ok=True)
+    lock = open(directory / _LOCK_NAME, "a+b")
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        return None
+    return lock
+
+
+def _load_segments(directory: Path) -> List[_Segment]:
+    """
+    Segments of a writer directory whose lock the caller holds. Indexes
+    missing after a crash are rebuilt and a torn tail is truncated; only
+    the newest segment is left open.
+    """
+    segments = []
+    for path in sorted(directory.glob(f"*{_SEGMENT_SUFFIX}")):
+        segment = _Segment(seq=int(path.stem), path=path)
+        meta = segment.read_index()
+        if meta is not None:
+            segment.load_index(meta)
+        else:
+            data = path.read_bytes()
+            segment.scan(data)
+            if segment.size < len(data):
+                with open(path, "r+b") as f:
+                    f.truncate(segment.size)
+        segments.append(segment)
+    for segment in segments[:-1]:
+        if not segment.sealed:
+            segment.seal()
+    return segments
+
+
+class SegmentedAuditLog:
+    """
+    Append-only audit sink backed by rotating segment files.
+
+    Records are queued without blocking the caller and written by one
+    background task; every batch is followed by a single fsync (group
+    commit). Lookups by dispute id only read the byte ranges recorded in
+    each segment's index.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        retention_seconds: float = 90 * 86400,
+        flush_interval_ms: int = 50,
+        max_batch: int = 1024,
+        max_queued: int = 100_000,
+    ):
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self.retention_seconds = retention_seconds
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_queued = max_queued
+        # Records dropped because the queue was full
+        self.dropped = 0
+        # This process's writer directory, held through ``_lock``
+        self.writer_dir: Optional[Path] = None
+        self._lock = None
+        self._segments: List[_Segment] = []
+        # Views of other writers' segments by path, kept current on each read
+        self._views: Dict[Path, _Segment] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._file = None
+        # Serializes segment file work: batches, compaction and reads
+        self._io_lock: Optional[asyncio.Lock] = None
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        """Recover segment state and start the background writer"""
+        self._ensure_started()
+        await self.sync()
+
+    async def stop(self) -> None:
+        if self._writer is None:
+            return
+        await self.sync()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+        self._writer = None
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+        if self._lock is not None:
+            self._lock.close()  # releases the writer directory
+            self._lock = None
+            self.writer_dir = None
+
+    def _recover(self) -> None:
+        """Claim a writer directory and load its segments"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # The lowest-numbered directory no live process holds: an exited
+        # worker's directory is picked up again by its replacement
+        for n in itertools.count():
+            writer_dir = self.directory / f"{_WRITER_PREFIX}{n:03d}"
+            lock = _try_lock(writer_dir)
+            if lock is not None:
+                break
+        self.writer_dir, self._lock = writer_dir, lock
+        self._segments = _load_segments(writer_dir)
+        if not self._segments or self._segments[-1].sealed:
+            self._roll()
+        self._file = open(self._segments[-1].path, "ab")
+
+    def _roll(self) -> None:
+        next_seq = self._segments[-1].seq + 1 if self._segments else 1
+        path = self.writer_dir / f"{next_seq:010d}{_SEGMENT_SUFFIX}"
+        path.touch()
+        self._segments.append(_Segment(seq=next_seq, path=path))
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def append_many(self, dispute_id: str, events: List[dict]) -> None:
+        """Queue events for ``dispute_id``; never blocks the caller, drops (and counts) when full"""
+        self._ensure_started()
+        for event in events:
+            try:
+                self._queue.put_nowait({"dispute_id": dispute_id, **event})
+            except asyncio.QueueFull:
+                if self.dropped == 0:
+                    print(f"Audit log queue full ({self.max_queued} records); dropping records")
+                self.dropped += 1
+                prometheus.record_audit_dropped()
+
+    async def sync(self) -> None:
+        """
+        Wait until everything queued so far is durable on disk
+
+        Raises the write error if the batch holding those records failed;
+        the records stay queued for the next attempt.
+        """
+        self._ensure_started()
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put(done)  # waits for room rather than dropping
+        await done
+
+    def _ensure_started(self) -> None:
+        if self._writer is None:
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queued)
+                self._io_lock = asyncio.Lock()
+            self._writer = asyncio.create_task(self._start_then_write())
+
+    async def _start_then_write(self) -> None:
+        await asyncio.to_thread(self._recover)
+        await self._run_writer()
+
+    async def _run_writer(self) -> None:
+        retry: List[dict] = []  # records of a failed batch, written ahead of new ones
+        while True:
+            if retry:
+                await asyncio.sleep(self.flush_interval)
+                batch = retry
+            else:
+                batch = [await self._queue.get()]
+            # Group commit: gather whatever arrives within the flush interval
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                if isinstance(item, asyncio.Future):
+                    break  # someone is waiting on durability; flush now
+
+            records = [item for item in batch if isinstance(item, dict)]
+            waiters = [item for item in batch if isinstance(item, asyncio.Future)]
+            retry = []
+            error = None
+            try:
+                if records:
+                    async with self._io_lock:
+                        await asyncio.to_thread(self._write_batch, records)
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"Audit log write error ({len(records)} records kept for retry): {e}")
+                retry, error = records, e
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if error is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(error)
+
+    def _write_batch(self, records: List[dict]) -> None:
+        segment = self._segments[-1]
+        chunks = [_encode(record) for record in records]
+        try:
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError:
+            # Cut off a partial write so the retried batch lands where the index expects
+            self._reopen(segment)
+            raise
+
+        offset = segment.size
+        for record, data in zip(records, chunks):
+            segment.note(record["dispute_id"], offset, offset + len(data), record.get("timestamp", 0.0))
+            offset += len(data)
+
+        if segment.size >= self.segment_max_bytes:
+            self._file.close()
+            segment.seal()
+            self._roll()
+            self._file = open(self._segments[-1].path, "ab")
+
+    def _reopen(self, segment: _Segment) -> None:
+        try:
+            self._file.close()
+        except OSError:
+            pass  # unflushed bytes are discarded with the partial write
+        os.truncate(segment.path, segment.size)
+        self._file = open(segment.path, "ab")
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    async def read(self, dispute_id: str) -> List[dict]:
+        """Return all events recorded for ``dispute_id``, by any worker, in time order"""
+        await self.sync()
+        async with self._io_lock:
+            return await asyncio.to_thread(self._read, dispute_id)
+
+    def _read(self, dispute_id: str, attempts: int = 3) -> List[dict]:
+        for attempt in range(attempts):
+            segments = self._segments + self._refresh_views()
+            ranges = [(segment, segment.index[dispute_id]) for segment in segments if dispute_id in segment.index]
+            try:
+                events = self._read_ranges(dispute_id, ranges)
+            except _StaleView:
+                if attempt == attempts - 1:
+                    raise
+                continue  # re-validate the views and read again
+            # Each writer's records are in write order; interleave the writers by time
+            events.sort(key=lambda event: event.get("timestamp", 0.0))
+            return events
+
+    def _refresh_views(self) -> List[_Segment]:
+        """Segments of every other writer directory, checked against the files on disk"""
+        views = []
+        seen = set()
+        for directory in sorted(self.directory.glob(f"{_WRITER_PREFIX}*")):
+            if directory == self.writer_dir:
+                continue
+            for path in sorted(directory.glob(f"*{_SEGMENT_SUFFIX}")):
+                try:
+                    views.append(self._view(path))
+                except FileNotFoundError:
+                    continue  # dropped or merged away meanwhile
+                seen.add(path)
+        for path in set(self._views) - seen:
+            del self._views[path]
+        return views
+
+    def _view(self, path: Path) -> _Segment:
+        inode = path.stat().st_ino
+        view = self._views.get(path)
+        if view is None or view.inode != inode:
+            # New segment, or replaced by a merge
+            view = self._views[path] = _Segment(seq=int(path.stem), path=path, inode=inode)
+        if view.sealed:
+            return view
+        meta = view.read_index()
+        if meta is not None and meta.get("inode") == inode:
+            view.load_index(meta)
+            return view
+        # Open segment of a live writer: index what was appended since the last look
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_ino != inode:
+                raise FileNotFoundError(path)
+            f.seek(view.size)
+            data = f.read()
+        view.scan(data, base=view.size)
+        return view
+
+    @staticmethod
+    def _read_ranges(dispute_id: str, ranges: List[Tuple[_Segment, Tuple[int, int]]]) -> List[dict]:
+        events = []
+        for segment, (start, end) in ranges:
+            try:
+                f = open(segment.path, "rb")
+            except FileNotFoundError:
+                raise _StaleView(segment.path)
+            with f:
+                if segment.inode is not None and os.fstat(f.fileno()).st_ino != segment.inode:
+                    raise _StaleView(segment.path)
+                f.seek(start)
+                data = f.read(end - start)
+            events.extend(
+                record for _, _, record in _iter_records(data)
+                if record["dispute_id"] == dispute_id
+            )
+        return events
+
+    # ------------------------------------------------------------------
+    # Retention and compaction
+    # ------------------------------------------------------------------
+    async def compact(self) -> Dict[str, int]:
+        """Drop expired sealed segments and merge small neighbouring ones"""
+        self._ensure_started()
+        async with self._io_lock:
+            return await asyncio.to_thread(self._compact)
+
+    def _compact(self) -> Dict[str, int]:
+        self._segments, stats = self._compact_segments(self._segments)
+        # Directories of exited workers are compacted by whoever can lock them
+        for directory in sorted(self.directory.glob(f"{_WRITER_PREFIX}*")):
+            if directory == self.writer_dir:
+                continue
+            lock = _try_lock(directory)
+            if lock is None:
+                continue
+            with lock:
+                # The open tail stays as it is, so segment numbers are never reused
+                _, orphan_stats = self._compact_segments(_load_segments(directory))
+            for key, value in orphan_stats.items():
+                stats[key] += value
+        return stats
+
+    def _compact_segments(self, segments: List[_Segment]) -> Tuple[List[_Segment], Dict[str, int]]:
+        """Retention and merging for the segments of one (locked) writer directory"""
+        cutoff = time.time() - self.retention_seconds
+        sealed = [s for s in segments if s.sealed]
+        expired = [s for s in sealed if s.max_ts < cutoff]
+        for segment in expired:
+            segment.path.unlink(missing_ok=True)
+            segment.index_path.unlink(missing_ok=True)
+        remaining = [s for s in sealed if s not in expired]
+
+        # Merge runs of adjacent sealed segments that fit in one segment
+        merged = 0
+        runs: List[List[_Segment]] = []
+        for segment in remaining:
+            if runs and sum(s.size for s in runs[-1]) + segment.size <= self.segment_max_bytes:
+                runs[-1].append(segment)
+            else:
+                runs.append([segment])
+        survivors = []
+        for run in runs:
+            if len(run) > 1:
+                survivors.append(self._merge(run))
+                merged += len(run) - 1
+            else:
+                survivors.extend(run)
+
+        survivors += [s for s in segments if not s.sealed]
+        return survivors, {"expired_segments": len(expired), "merged_segments": merged}
+
+    def _merge(self, run: List[_Segment]) -> _Segment:
+        # The merged segment replaces the newest one in the run, so seq order
+        # (and therefore record order) is preserved.
+        target = _Segment(seq=run[-1].seq, path=run[-1].path)
+        tmp = target.path.with_suffix(".seg.tmp")
+        with open(tmp, "wb") as out:
+            for segment in run:
+                data = segment.path.read_bytes()
+                for _, _, record in _iter_records(data):
+                    encoded = _encode(record)
+                    target.note(record["dispute_id"], target.size, target.size + len(encoded),
+                                record.get("timestamp", 0.0))
+                    out.write(encoded)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, target.path)
+        target.seal()
+        for segment in run[:-1]:
+            segment.path.unlink(missing_ok=True)
+            segment.index_path.unlink(missing_ok=True)
+        return target
+
+    async def run_compaction(self, interval_seconds: float) -> None:
+        """Background retention/compaction loop"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.compact()
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"Audit log compaction error: {e}")
+
+
+# Global audit log instance
+audit_log = SegmentedAuditLog(
+    directory=settings.audit_log_dir,
+    segment_max_bytes=settings.audit_segment_max_bytes,
+    retention_seconds=settings.audit_retention_days * 86400,
+    flush_interval_ms=settings.audit_flush_interval_ms,
+    max_queued=settings.audit_queue_max_records,
+)
+
+# Access events recorded by the security middleware
+access_log = SegmentedAuditLog(
+    directory=settings.access_log_dir,
+    segment_max_bytes=settings.audit_segment_max_bytes,
+    retention_seconds=settings.audit_retention_days * 86400,
+    flush_interval_ms=settings.audit_flush_interval_ms,
+    max_queued=settings.audit_queue_max_records,
+)
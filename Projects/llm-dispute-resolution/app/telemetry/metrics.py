@@ -1,60 +1,304 @@
-from fastapi import APIRouter
-from ..domain.schemas import MetricsOut
-import statistics
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+from pathlib import Path
+import fcntl
+import math
+import mmap
+import os
+import time
+
+import numpy as np
+from fastapi import APIRouter, Query
+from ..domain.schemas import MetricsOut, LatencyQuantilesOut
+from ..core.config import get_settings
+from .prometheus import CLASSIFICATION_LABELS, OVERFLOW_LABEL
+
+settings = get_settings()
+
+# Classification labels get fixed counter slots; anything else is counted as "other"
+CASE_LABELS = CLASSIFICATION_LABELS + (OVERFLOW_LABEL,)
+
+# Rolling windows: name -> (seconds per slot, number of slots)
+WINDOWS = {"1m": (1, 60), "5m": (5, 60), "1h": (60, 60)}
+WINDOW_PATTERN = "^(" + "|".join(WINDOWS) + ")$"
+
+
+class QuantileSketch:
+    """
+    Fixed-size streaming quantile sketch (log-bucketed, DDSketch-style).
+
+    Bucket boundaries grow geometrically by ``gamma``, so any reported
+    quantile is within ``relative_accuracy`` of the true value. Recording is
+    O(1) and memory is fixed by ``max_value``, independent of how many
+    values have been seen.
+    """
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.01,
+        max_value: float = 3_600_000,
+        counts: Optional[np.ndarray] = None
+    ):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._inv_log_gamma = 1.0 / math.log(self.gamma)
+        self.num_buckets = int(math.ceil(math.log(max_value) * self._inv_log_gamma)) + 1
+        # Bucket i holds values in (gamma^(i-1), gamma^i]; bucket 0 holds <= 1
+        self.counts = counts if counts is not None else np.zeros(self.num_buckets)
+
+    def bucket_index(self, value: float) -> int:
+        if value <= 1:
+            return 0
+        return min(int(math.ceil(math.log(value) * self._inv_log_gamma)), self.num_buckets - 1)
+
+    def bucket_value(self, index: int) -> float:
+        """Representative value of a bucket (minimises relative error)"""
+        if index == 0:
+            return 1.0
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value: float) -> None:
+        self.counts[self.bucket_index(value)] += 1
+
+    def quantiles(self, qs: Iterable[float], counts: Optional[np.ndarray] = None) -> Dict[float, float]:
+        """Estimate several quantiles from one cumulative sum over the buckets"""
+        counts = self.counts if counts is None else counts
+        cumulative = np.cumsum(counts)
+        total = cumulative[-1]
+        result = {}
+        for q in qs:
+            if not total:
+                result[q] = 0.0
+                continue
+            rank = max(1.0, math.ceil(q * total))
+            index = int(np.searchsorted(cumulative, rank))
+            result[q] = round(self.bucket_value(index), 3)
+        return result
+
+
+class RingLayout(NamedTuple):
+    """A rolling window: ``slots`` rows of ``resolution`` seconds each"""
+    resolution: int
+    slots: int
+    stamps: int  # offset of the per-slot epoch stamps
+    rows: int    # offset of the first row
+
+
+class MetricsLayout:
+    """
+    Offsets of every metric inside one flat float64 block.
+
+    All metrics live in a single fixed-size array so that the same block can
+    be backed by process memory or by a shared memory-mapped file. The array
+    holds one row of lifetime totals followed by one ring of rows per
+    rolling window; every row has the same layout.
+    """
+
+    TOTAL_CASES = 0
+    TOTAL_COST = 1
+    COSTED_CASES = 2
+    LABELS = 3
+
+    def __init__(self, sketch: QuantileSketch, labels=CASE_LABELS, windows=WINDOWS):
+        self.labels = labels
+        self.label_index = {label: i for i, label in enumerate(labels)}
+        self.classification = self.LABELS + len(labels)
+        self.recommendation = self.classification + sketch.num_buckets
+        self.row_size = self.recommendation + sketch.num_buckets
+
+        self.windows: Dict[str, RingLayout] = {}
+        offset = self.row_size
+        for name, (resolution, slots) in windows.items():
+            self.windows[name] = RingLayout(resolution, slots, offset, offset + slots)
+            offset += slots * (self.row_size + 1)
+        self.size = offset
+
+    def label_slot(self, label: Optional[str]) -> int:
+        return self.LABELS + self.label_index.get(label, self.label_index[OVERFLOW_LABEL])
 
 
 class Metrics:
+    QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
     def __init__(self):
-        self._classification_latencies: list[int] = []
-        self._recommendation_latencies: list[int] = []
-        self._cases_by_label: dict[str, int] = {}
-        self._total_cases = 0
-        self._total_cost_usd = 0.0
-        self._case_costs: list[float] = []
+        self._sketch = QuantileSketch()
+        self.layout = MetricsLayout(self._sketch)
+        self._data = np.zeros(self.layout.size)
+        # Row offsets to update, recomputed once per second: (block, second, offsets)
+        self._current = (None, None, None)
+
+    def _block(self) -> np.ndarray:
+        """Block this process records into"""
+        return self._data
+
+    def _blocks(self) -> Iterator[np.ndarray]:
+        """Blocks that make up a snapshot"""
+        yield self._data
+
+    def _split(self, block: np.ndarray):
+        """Lifetime row plus (ring, stamps, rows) views into ``block``"""
+        size = self.layout.row_size
+        rings = {
+            name: (ring, block[ring.stamps:ring.rows],
+                   block[ring.rows:ring.rows + ring.slots * size].reshape(ring.slots, size))
+            for name, ring in self.layout.windows.items()
+        }
+        return block[:size], rings
+
+    def _row_offsets(self) -> List[int]:
+        """Start of every row to update now: lifetime, then the current slot of each window"""
+        block = self._block()
+        now = time.time()
+        cached_block, second, offsets = self._current
+        if cached_block is block and second == int(now):
+            return offsets
+
+        _, rings = self._split(block)
+        offsets = [0]
+        for ring, stamps, rows in rings.values():
+            epoch = int(now // ring.resolution)
+            slot = epoch % ring.slots
+            if stamps[slot] != epoch:
+                # Slot last held an older period: recycle it
+                rows[slot] = 0
+                stamps[slot] = epoch
+            offsets.append(ring.rows + slot * self.layout.row_size)
+        self._current = (block, int(now), offsets)
+        return offsets
+
+    def _add(self, offset: int, value: float) -> None:
+        block = self._block()
+        for row in self._row_offsets():
+            block[row + offset] += value
 
     def record_classification_latency(self, ms: int):
         if ms:
-            self._classification_latencies.append(ms)
+            self._add(self.layout.classification + self._sketch.bucket_index(ms), 1)
 
     def record_recommendation_latency(self, ms: int):
         if ms:
-            self._recommendation_latencies.append(ms)
+            self._add(self.layout.recommendation + self._sketch.bucket_index(ms), 1)
 
     def increment_case(self, label: str):
-        self._total_cases += 1
-        self._cases_by_label[label] = self._cases_by_label.get(label, 0) + 1
+        self._add(MetricsLayout.TOTAL_CASES, 1)
+        self._add(self.layout.label_slot(label), 1)
 
     def record_case_cost(self, cost: float):
-        self._total_cost_usd += cost
-        self._case_costs.append(cost)
-
-    def p95(self, data: list[int]) -> float:
-        if not data:
-            return 0.0
-        data_sorted = sorted(data)
-        k = int(len(data_sorted) * 0.95) - 1
-        k = max(0, min(k, len(data_sorted) - 1))
-        return float(data_sorted[k])
-
-    def avg_cost(self) -> float:
-        if not self._case_costs:
-            return 0.0
-        return round(sum(self._case_costs) / len(self._case_costs), 6)
-
-    def snapshot(self) -> MetricsOut:
+        self._add(MetricsLayout.TOTAL_COST, cost)
+        self._add(MetricsLayout.COSTED_CASES, 1)
+
+    def total_cases(self) -> int:
+        """Lifetime case count over every block, without building a snapshot"""
+        return int(sum(block[MetricsLayout.TOTAL_CASES] for block in self._blocks()))
+
+    def _merged(self, window: Optional[str] = None) -> np.ndarray:
+        """Sum of one row type (lifetime or a window) over every block"""
+        merged = np.zeros(self.layout.row_size)
+        now = time.time()
+        for block in self._blocks():
+            lifetime, rings = self._split(block)
+            if window is None:
+                merged += lifetime
+                continue
+            ring, stamps, rows = rings[window]
+            live = stamps > int(now // ring.resolution) - ring.slots
+            if live.any():
+                merged += rows[live].sum(axis=0)
+        return merged
+
+    def _latency_out(self, counts: np.ndarray) -> LatencyQuantilesOut:
+        q = self._sketch.quantiles(self.QUANTILES, counts)
+        return LatencyQuantilesOut(p50=q[0.5], p90=q[0.9], p95=q[0.95], p99=q[0.99])
+
+    def snapshot(self, window: Optional[str] = None) -> MetricsOut:
+        """Lifetime totals, or only the last ``window`` (one of ``WINDOWS``)"""
+        data = self._merged(window)
+        layout = self.layout
+        buckets = self._sketch.num_buckets
+        classification = self._latency_out(data[layout.classification:layout.classification + buckets])
+        recommendation = self._latency_out(data[layout.recommendation:layout.recommendation + buckets])
+        costed = data[MetricsLayout.COSTED_CASES]
+        labels = data[MetricsLayout.LABELS:MetricsLayout.LABELS + len(layout.labels)]
         return MetricsOut(
-            total_cases=self._total_cases,
-            classification_latency_ms_p95=self.p95(self._classification_latencies),
-            recommendation_latency_ms_p95=self.p95(self._recommendation_latencies),
-            cases_by_label=self._cases_by_label,
-            avg_cost_per_case_usd=self.avg_cost()
+            total_cases=int(data[MetricsLayout.TOTAL_CASES]),
+            classification_latency_ms_p95=classification.p95,
+            recommendation_latency_ms_p95=recommendation.p95,
+            classification_latency_ms=classification,
+            recommendation_latency_ms=recommendation,
+            cases_by_label={label: int(n) for label, n in zip(layout.labels, labels) if n},
+            avg_cost_per_case_usd=round(float(data[MetricsLayout.TOTAL_COST] / costed), 6) if costed else 0.0,
+            window=window or "lifetime"
         )
 
 
-metrics = Metrics()
+class SharedMetrics(Metrics):
+    """
+    Metrics shared by all worker processes through memory-mapped files.
+
+    Each worker owns one file in ``directory`` and is its only writer, so
+    recording needs no locks. ``snapshot()`` sums the blocks of every
+    worker, giving the same totals whichever worker serves the request.
+
+    Every process using the directory holds a shared lock on it for its
+    lifetime. Blocks of workers that exit while others still hold it keep
+    counting towards lifetime totals; the first process to open the
+    directory once every earlier one has exited (a new server run) clears
+    the blocks they left.
+    """
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._pid: Optional[int] = None
+        self._readers: Dict[Path, np.ndarray] = {}
+        self._lock = self._join_run()
+
+    def _join_run(self):
+        """Take the directory's shared lock, clearing a previous run's blocks first"""
+        lock = open(self.directory / "metrics.lock", "a+b")
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            pass  # a live process is using the directory: same run
+        else:
+            for path in self.directory.glob("metrics_*.bin"):
+                path.unlink()
+        fcntl.flock(lock.fileno(), fcntl.LOCK_SH)
+        return lock
+
+    def _block(self) -> np.ndarray:
+        # Re-open after fork so a child never writes into its parent's file
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._data = self._map(self.directory / f"metrics_{self._pid}.bin", writable=True)
+        return self._data
+
+    def _map(self, path: Path, writable: bool) -> np.ndarray:
+        nbytes = self.layout.size * 8
+        if writable:
+            path.touch(exist_ok=True)
+        with open(path, "r+b" if writable else "rb") as f:
+            if writable and os.fstat(f.fileno()).st_size < nbytes:
+                f.truncate(nbytes)
+            mapped = mmap.mmap(f.fileno(), nbytes, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        return np.frombuffer(mapped, dtype=np.float64)
+
+    def _blocks(self) -> Iterator[np.ndarray]:
+        nbytes = self.layout.size * 8
+        for path in self.directory.glob("metrics_*.bin"):
+            block = self._readers.get(path)
+            if block is None:
+                if path.stat().st_size != nbytes:
+                    continue  # written by a build with a different layout
+                block = self._readers[path] = self._map(path, writable=False)
+            yield block
+
+
+metrics = SharedMetrics(settings.metrics_multiproc_dir) if settings.metrics_multiproc_dir else Metrics()
 metrics_router = APIRouter(tags=["metrics"])
 
 
 @metrics_router.get("/metrics", response_model=MetricsOut)
-async def get_metrics():
-    return metrics.snapshot()
+async def get_metrics(
+    window: Optional[str] = Query(None, regex=WINDOW_PATTERN, description="Rolling window; lifetime if omitted")
+):
+    return metrics.snapshot(window)
@@ -0,0 +1,250 @@
+"""
+Prometheus Instrumentation.
+
+Pipeline, LLM, cache, database and rate-limit metrics registered with
+``prometheus_client`` and served by the exporter started in ``main.py``.
+
+Label values are passed through ``LabelGuard`` so free-form input such as
+an LLM-produced classification label or a new model name cannot grow the
+number of series without bound. Metrics with several free-form labels also
+cap their label combinations with ``SeriesGuard``, since per-label caps
+alone still allow their product.
+"""
+
+import threading
+from typing import Iterable, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from ..core.config import get_settings
+
+settings = get_settings()
+
+OVERFLOW_LABEL = "other"
+
+# Classification labels the pipeline produces; shared with the /metrics counters
+CLASSIFICATION_LABELS = (
+    "FRAUD_UNAUTHORIZED", "FRAUD_CARD_LOST", "FRAUD_ACCOUNT_TAKEOVER", "MERCHANT_ERROR",
+    "SERVICE_NOT_RECEIVED", "FRIENDLY_FRAUD_RISK", "SUBSCRIPTION_CANCELLATION",
+    "REFUND_NOT_PROCESSED", "OTHER",
+)
+
+
+class LabelGuard:
+    """
+    Caps the number of distinct values a label can take.
+
+    Values in ``allowed`` always pass through. Other values are accepted
+    first-come until ``max_values`` is reached; after that they collapse to
+    ``"other"``.
+    """
+
+    def __init__(self, max_values: int, allowed: Optional[Iterable[str]] = None):
+        self.max_values = max_values
+        self._allowed = frozenset(allowed or ())
+        self._seen: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, value: Optional[str]) -> str:
+        value = str(value) if value else "unknown"
+        if value in self._allowed or value in self._seen:
+            return value
+        with self._lock:
+            if len(self._seen) < self.max_values:
+                self._seen.add(value)
+                return value
+        return OVERFLOW_LABEL
+
+
+class SeriesGuard:
+    """
+    Caps the number of label combinations of a metric family.
+
+    Each value first goes through its label's ``LabelGuard``. Combinations
+    are then accepted first-come until ``max_series`` is reached; after
+    that every new combination is recorded under a single series with all
+    labels set to ``"other"``.
+    """
+
+    def __init__(self, max_series: int, **guards: LabelGuard):
+        self.max_series = max_series
+        self._guards = guards
+        self._overflow = {name: OVERFLOW_LABEL for name in guards}
+        self._seen: set[tuple] = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, **values: Optional[str]) -> dict:
+        labels = {name: guard(values[name]) for name, guard in self._guards.items()}
+        key = tuple(labels.values())
+        if key in self._seen:
+            return labels
+        with self._lock:
+            if len(self._seen) < self.max_series:
+                self._seen.add(key)
+                return labels
+        return dict(self._overflow)
+
+
+_max = settings.prometheus_max_label_values
+guard_stage = LabelGuard(_max, ["classification", "enrichment", "recommendation"])
+guard_label = LabelGuard(_max, CLASSIFICATION_LABELS)
+guard_cache = LabelGuard(_max)
+guard_llm = SeriesGuard(
+    settings.prometheus_max_series,
+    provider=LabelGuard(_max, ["openai", "anthropic", "local", "mock"]),
+    model=LabelGuard(_max),
+    template=LabelGuard(_max),
+    template_version=LabelGuard(_max),
+)
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_LATENCY = Histogram(
+    "dispute_stage_latency_seconds",
+    "Latency of each dispute pipeline stage",
+    ["stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+CASES = Counter(
+    "dispute_cases_total",
+    "Processed dispute cases by classification label",
+    ["label"],
+)
+LLM_LATENCY = Histogram(
+    "llm_request_latency_seconds",
+    "LLM call latency including retries",
+    ["provider", "model", "template", "template_version"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "LLM tokens consumed",
+    ["provider", "model", "template", "template_version", "kind"],
+)
+LLM_COST = Counter(
+    "llm_cost_usd_total",
+    "LLM spend in USD",
+    ["provider", "model", "template", "template_version"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "LLM call attempts that failed and were retried",
+    ["provider", "model", "template", "template_version"],
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "llm_queue_depth",
+    "LLM calls waiting for a concurrency slot",
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_in_flight",
+    "LLM calls currently holding a concurrency slot",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by cache name and result",
+    ["cache", "result"],
+)
+DB_SESSION = Histogram(
+    "db_session_seconds",
+    "Time a database session is held, including commit",
+    buckets=_LATENCY_BUCKETS,
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total",
+    "Requests rejected by the rate limiter",
+)
+PII_PREFILTER = Counter(
+    "pii_prefilter_total",
+    "Texts seen by the PII pre-filter, by whether the full scan was skipped",
+    ["result"],
+)
+PATTERN_ANALYSIS = Histogram(
+    "pattern_analysis_seconds",
+    "Wall time of one pattern analysis (shared window read plus all detectors)",
+    buckets=_LATENCY_BUCKETS,
+)
+PATTERN_ROWS_READ = Histogram(
+    "pattern_analysis_rows_read",
+    "Rollup rows read by one pattern analysis",
+    buckets=(10, 100, 1_000, 10_000, 100_000, 1_000_000),
+)
+COMPONENT_LOAD = Gauge(
+    "component_load_seconds",
+    "Time taken to load each lazily started component",
+    ["component"],
+)
+STREAM_ALERTS = Counter(
+    "stream_pattern_alerts_total",
+    "Pattern alerts fired by the streaming detector on case completion",
+    ["pattern_type"],
+)
+AUDIT_DROPPED = Counter(
+    "audit_records_dropped_total",
+    "Audit records dropped because the writer queue was full",
+)
+TIME_TO_READY = Gauge(
+    "worker_time_to_ready_seconds",
+    "Time from worker process start until all components were loaded",
+)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_LATENCY.labels(stage=guard_stage(stage)).observe(seconds)
+
+
+def record_case(label: Optional[str]) -> None:
+    CASES.labels(label=guard_label(label)).inc()
+
+
+def _llm_labels(provider: str, model: str, template: str, template_version: str) -> dict:
+    return guard_llm(provider=provider, model=model, template=template, template_version=template_version)
+
+
+def record_llm_call(
+    provider: str,
+    model: str,
+    template: str,
+    template_version: str,
+    seconds: float,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cost_usd: float = 0.0,
+) -> None:
+    labels = _llm_labels(provider, model, template, template_version)
+    LLM_LATENCY.labels(**labels).observe(seconds)
+    LLM_TOKENS.labels(**labels, kind="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(**labels, kind="completion").inc(completion_tokens)
+    LLM_COST.labels(**labels).inc(cost_usd)
+
+
+def record_llm_retry(provider: str, model: str, template: str, template_version: str) -> None:
+    LLM_RETRIES.labels(**_llm_labels(provider, model, template, template_version)).inc()
+
+
+def record_pii_prefilter(skipped: bool) -> None:
+    PII_PREFILTER.labels(result="skipped" if skipped else "scanned").inc()
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=guard_cache(cache), result="hit" if hit else "miss").inc()
+
+
+def record_pattern_analysis(rows_read: int, seconds: float) -> None:
+    PATTERN_ANALYSIS.observe(seconds)
+    PATTERN_ROWS_READ.observe(rows_read)
+
+
+def record_stream_alert(pattern_type: str) -> None:
+    STREAM_ALERTS.labels(pattern_type=pattern_type).inc()
+
+
+def record_component_load(component: str, seconds: float) -> None:
+    COMPONENT_LOAD.labels(component=component).set(seconds)
+
+
+def record_audit_dropped() -> None:
+    AUDIT_DROPPED.inc()
+
+
+def record_time_to_ready(seconds: float) -> None:
+    TIME_TO_READY.set(seconds)
@@ -0,0 +1,100 @@
+"""
+Worker Readiness.
+
+Liveness (``/health``) only says the process is serving; readiness
+(``/ready``) says the lazily loaded components, such as the presidio and
+spaCy engines, have been warmed up. The time from worker start to ready is
+exported as ``worker_time_to_ready_seconds``. A failed warm-up is retried
+with backoff, so a transient error does not keep the worker out of
+rotation for good.
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from .prometheus import record_component_load, record_time_to_ready
+
+# Close to process start: the app imports this module before any model loads
+PROCESS_STARTED = time.time()
+
+
+class Readiness:
+    """Load state of the components a worker needs before taking traffic."""
+
+    def __init__(self, components: Iterable[str], started_at: float = PROCESS_STARTED):
+        self.started_at = started_at
+        self.ready_at: Optional[float] = None
+        self._load_seconds: Dict[str, Optional[float]] = {name: None for name in components}
+        self._errors: Dict[str, str] = {}
+
+    @property
+    def ready(self) -> bool:
+        return all(seconds is not None for seconds in self._load_seconds.values())
+
+    @property
+    def time_to_ready(self) -> Optional[float]:
+        return self.ready_at - self.started_at if self.ready_at is not None else None
+
+    def mark_ready(self, component: str, load_seconds: float) -> None:
+        self._load_seconds[component] = load_seconds
+        self._errors.pop(component, None)
+        record_component_load(component, load_seconds)
+        if self.ready and self.ready_at is None:
+            self.ready_at = time.time()
+            record_time_to_ready(self.time_to_ready)
+
+    def mark_failed(self, component: str, error: str) -> None:
+        self._errors[component] = error
+
+    async def load(
+        self,
+        component: str,
+        loader: Callable[[], None],
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+        max_attempts: Optional[int] = None
+    ) -> None:
+        """
+        Run a blocking ``loader`` in a thread and record how long it took.
+
+        A failure is reported by ``status()`` rather than raised, and the
+        loader is run again after ``retry_delay`` seconds, doubling up to
+        ``max_retry_delay``, until it succeeds or ``max_attempts`` have
+        failed. Meanwhile the component loads lazily on first use.
+        """
+        delay = retry_delay
+        for attempt in itertools.count(1):
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(loader)
+            except Exception as e:
+                self.mark_failed(component, f"{type(e).__name__}: {e}")
+                if max_attempts is not None and attempt >= max_attempts:
+                    return
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_retry_delay)
+                continue
+            self.mark_ready(component, time.perf_counter() - started)
+            return
+
+    def status(self) -> dict:
+        time_to_ready = self.time_to_ready
+        return {
+            "ready": self.ready,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "time_to_ready_seconds": round(time_to_ready, 3) if time_to_ready is not None else None,
+            "components": {
+                name: {
+                    "ready": seconds is not None,
+                    "load_seconds": round(seconds, 3) if seconds is not None else None,
+                    **({"error": self._errors[name]} if name in self._errors else {}),
+                }
+                for name, seconds in self._load_seconds.items()
+            },
+        }
+
+
+# Components warmed up by the lifespan task in main.py
+readiness = Readiness(["pii_engines"])
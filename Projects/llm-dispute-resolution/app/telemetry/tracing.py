@@ -0,0 +1,254 @@
+"""
+Lightweight Span Tracing.
+
+Spans are propagated through contextvars, so nested awaits and decorated
+steps attach to the request that started them without passing a context
+object around. A trace is exported when its root span ends; spans that
+end later (e.g. of a task the request left running) are dropped. Finished
+traces are exported to:
+
+- an in-process ring buffer, served by ``GET /v1/debug/traces``
+- an optional OTLP/JSON file (one ``resourceSpans`` document per line)
+"""
+
+import asyncio
+import json
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from fastapi import APIRouter, Query
+
+from ..core.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class _Trace:
+    """Spans finished so far in one trace, shared by all of its spans"""
+    spans: List["Span"] = field(default_factory=list)
+    finished: bool = False
+
+
+@dataclass
+class Span:
+    """A timed operation inside a trace"""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    status: str = "OK"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _trace: _Trace = field(default_factory=_Trace, repr=False)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class RingBufferExporter:
+    """Keeps the most recent finished traces in memory"""
+
+    def __init__(self, capacity: int):
+        self._traces: Deque[List[Span]] = deque(maxlen=capacity)
+
+    def export(self, spans: List[Span]) -> None:
+        self._traces.append(spans)
+
+    def recent(self, min_duration_ms: float = 0.0, limit: int = 20) -> List[List[Span]]:
+        """Most recent traces whose root span took at least ``min_duration_ms``"""
+        found = []
+        for spans in reversed(self._traces):
+            if spans[-1].duration_ms >= min_duration_ms:
+                found.append(spans)
+                if len(found) >= limit:
+                    break
+        return found
+
+
+class OTLPFileExporter:
+    """
+    Appends traces to a file in the OTLP/JSON encoding.
+
+    Writes happen on a daemon thread so the event loop never blocks on disk.
+    """
+
+    def __init__(self, path: str, service_name: str = "llm-dispute-resolution"):
+        self.path = path
+        self.service_name = service_name
+        self._queue: "queue.SimpleQueue[List[Span]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, spans: List[Span]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="otlp-file-exporter", daemon=True)
+            self._thread.start()
+        self._queue.put(spans)
+
+    def _run(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                lines = [self._encode(self._queue.get())]
+                while not self._queue.empty():
+                    lines.append(self._encode(self._queue.get()))
+                f.write("".join(lines))
+                f.flush()
+
+    def _encode(self, spans: List[Span]) -> str:
+        document = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.telemetry.tracing"},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "kind": 1,  # SPAN_KIND_INTERNAL
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns),
+                            "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                            "status": {"code": 2 if span.status == "ERROR" else 1},
+                        }
+                        for span in spans
+                    ],
+                }],
+            }]
+        }
+        return json.dumps(document, separators=(",", ":")) + "\n"
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+
+class Tracer:
+    """Creates spans and hands finished traces to the exporters"""
+
+    def __init__(self, enabled: bool = True, exporters: Optional[List[Any]] = None):
+        self.enabled = enabled
+        self.exporters = exporters or []
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else f"{random.getrandbits(128):032x}",
+            span_id=f"{random.getrandbits(64):016x}",
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+            _trace=parent._trace if parent else _Trace(),
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            trace = span._trace
+            if not trace.finished:
+                trace.spans.append(span)
+                if parent is None:
+                    # Root finished: the trace is complete (root is last)
+                    trace.finished = True
+                    spans = list(trace.spans)
+                    trace.spans.clear()
+                    for exporter in self.exporters:
+                        exporter.export(spans)
+
+    def traced(self, name: str) -> Callable:
+        """Decorator that wraps a sync or async function in a span"""
+        def decorator(fn: Callable) -> Callable:
+            if asyncio.iscoroutinefunction(fn):
+                @wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+# Global tracer and exporters
+trace_buffer = RingBufferExporter(settings.trace_buffer_size)
+_exporters: List[Any] = [trace_buffer]
+if settings.trace_export_path:
+    _exporters.append(OTLPFileExporter(settings.trace_export_path))
+tracer = Tracer(enabled=settings.enable_tracing, exporters=_exporters)
+
+traces_router = APIRouter(prefix="/v1/debug", tags=["debug"])
+
+
+@traces_router.get("/traces")
+async def get_recent_traces(
+    min_duration_ms: float = Query(settings.trace_slow_ms, ge=0, description="Only traces at least this slow"),
+    limit: int = Query(20, ge=1, le=500)
+):
+    """Recent traces from the in-process buffer, newest first"""
+    return [
+        {
+            "trace_id": spans[-1].trace_id,
+            "root": spans[-1].name,
+            "duration_ms": round(spans[-1].duration_ms, 3),
+            "spans": [span.to_dict() for span in spans],
+        }
+        for spans in trace_buffer.recent(min_duration_ms, limit)
+    ]
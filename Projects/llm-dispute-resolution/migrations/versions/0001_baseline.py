@@ -0,0 +1,106 @@
+"""Baseline schema: the tables created by init_db before migrations existed
+
+Databases already created by ``init_db`` (``create_all``) should be stamped
+at this revision (``alembic stamp 0001``) and then upgraded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "dispute_case",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("external_ref", sa.String(), nullable=True),
+        sa.Column("customer_id", sa.String(), nullable=True),
+        sa.Column("merchant_id", sa.String(), nullable=True),
+        sa.Column("amount_cents", sa.Integer(), nullable=False),
+        sa.Column("currency", sa.String(3), nullable=False),
+        sa.Column("narrative", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("classification", sa.String(), nullable=True),
+        sa.Column("classification_confidence", sa.Float(), nullable=True),
+        sa.Column("recommendation_action", sa.String(), nullable=True),
+        sa.Column("recommendation_confidence", sa.Float(), nullable=True),
+        sa.Column("recommendation_rationale", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "audit_event",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("dispute_case_id", sa.String(), sa.ForeignKey("dispute_case.id"), nullable=False),
+        sa.Column("step", sa.String(), nullable=False),
+        sa.Column("timestamp", sa.Float(), nullable=False),
+        sa.Column("latency_ms", sa.Integer(), nullable=False),
+        sa.Column("success", sa.Boolean(), nullable=False),
+        sa.Column("payload_json", sa.JSON(), nullable=False),
+    )
+    op.create_table(
+        "evidence_item",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("dispute_case_id", sa.String(), sa.ForeignKey("dispute_case.id"), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("content", sa.JSON(), nullable=False),
+        sa.Column("fetched_at", sa.Float(), nullable=False),
+        sa.Column("agent_run_id", sa.String(), nullable=True),
+    )
+    op.create_table(
+        "transaction_ledger",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("customer_id", sa.String(), nullable=False),
+        sa.Column("merchant_id", sa.String(), nullable=False),
+        sa.Column("amount_cents", sa.Integer(), nullable=False),
+        sa.Column("currency", sa.String(3), nullable=False),
+        sa.Column("occurred_at", sa.Float(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("transaction_type", sa.String(), nullable=False),
+    )
+    op.create_table(
+        "rollup_merchant_hour",
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("merchant_id", sa.String(), primary_key=True),
+        sa.Column("dispute_count", sa.Integer(), nullable=False),
+        sa.Column("fraud_count", sa.Integer(), nullable=False),
+        sa.Column("amount_sum", sa.Integer(), nullable=False),
+        sa.Column("fraud_amount_sum", sa.Integer(), nullable=False),
+        sa.Column("customers_hll", sa.LargeBinary(), nullable=True),
+    )
+    op.create_table(
+        "rollup_customer_hour",
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("customer_id", sa.String(), primary_key=True),
+        sa.Column("dispute_count", sa.Integer(), nullable=False),
+        sa.Column("amount_sum", sa.Integer(), nullable=False),
+        sa.Column("merchants_hll", sa.LargeBinary(), nullable=True),
+    )
+    op.create_table(
+        "rollup_label_hour",
+        sa.Column("bucket_start", sa.DateTime(), primary_key=True),
+        sa.Column("label_bucket", sa.String(), primary_key=True),
+        sa.Column("hour_of_day", sa.Integer(), nullable=False),
+        sa.Column("dispute_count", sa.Integer(), nullable=False),
+        sa.Column("amount_sum", sa.Integer(), nullable=False),
+        sa.Column("round_amount_count", sa.Integer(), nullable=False),
+        sa.Column("round_amounts", sa.JSON(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    for table in (
+        "rollup_label_hour", "rollup_customer_hour", "rollup_merchant_hour",
+        "transaction_ledger", "evidence_item", "audit_event", "dispute_case",
+    ):
+        op.drop_table(table)
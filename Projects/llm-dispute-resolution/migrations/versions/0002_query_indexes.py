@@ -0,0 +1,55 @@
+"""Indexes for the hot dispute_case and transaction_ledger queries
+
+- dispute_case: a window index leading with created_at that carries the
+  grouped and aggregated columns (a covering index for window scans);
+  merchant + created_at, also covering per-merchant aggregates; customer +
+  created_at
+- evidence_item: lookups by case (audit trails are read from the
+  segmented audit log, not audit_event)
+- transaction_ledger: customer (and merchant) + occurred_at for enrichment
+- rollups: per-merchant / per-customer reads (the primary keys lead with
+  bucket_start and only serve whole-window reads)
+
+Indexes that already exist are skipped: a database created by a current
+``init_db`` (``create_all``) has them all.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns) - kept in step with __table_args__ in app/domain/models.py
+INDEXES = [
+    (
+        "ix_dispute_case_created_window", "dispute_case",
+        ["created_at", "merchant_id", "customer_id", "amount_cents", "classification"],
+    ),
+    (
+        "ix_dispute_case_merchant_created", "dispute_case",
+        ["merchant_id", "created_at", "amount_cents", "classification"],
+    ),
+    ("ix_dispute_case_customer_created", "dispute_case", ["customer_id", "created_at"]),
+    ("ix_evidence_item_case", "evidence_item", ["dispute_case_id"]),
+    ("ix_transaction_ledger_customer_time", "transaction_ledger", ["customer_id", "occurred_at"]),
+    ("ix_transaction_ledger_merchant_time", "transaction_ledger", ["merchant_id", "occurred_at"]),
+    ("ix_rollup_merchant_hour_merchant", "rollup_merchant_hour", ["merchant_id", "bucket_start"]),
+    ("ix_rollup_customer_hour_customer", "rollup_customer_hour", ["customer_id", "bucket_start"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,49 @@
+"""Materialized merchant risk scores and their refresh state
+
+Skipped if ``init_db`` (``create_all``) already created the tables.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("merchant_risk_score"):
+        return
+    op.create_table(
+        "merchant_risk_score",
+        sa.Column("window_days", sa.Integer(), primary_key=True),
+        sa.Column("merchant_id", sa.String(), primary_key=True),
+        sa.Column("risk_score", sa.Float(), nullable=False),
+        sa.Column("risk_level", sa.String(), nullable=False),
+        sa.Column("fraud_score", sa.Float(), nullable=False),
+        sa.Column("frequency_score", sa.Float(), nullable=False),
+        sa.Column("diversity_score", sa.Float(), nullable=False),
+        sa.Column("total_disputes", sa.Integer(), nullable=False),
+        sa.Column("fraud_disputes", sa.Integer(), nullable=False),
+        sa.Column("amount_sum", sa.Integer(), nullable=False),
+        sa.Column("unique_customers", sa.Integer(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_merchant_risk_score_rank", "merchant_risk_score", ["window_days", "risk_score", "merchant_id"])
+    op.create_table(
+        "merchant_risk_refresh",
+        sa.Column("window_days", sa.Integer(), primary_key=True),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("merchant_risk_refresh")
+    op.drop_index("ix_merchant_risk_score_rank", table_name="merchant_risk_score")
+    op.drop_table("merchant_risk_score")
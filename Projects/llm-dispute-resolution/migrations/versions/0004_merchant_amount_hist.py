@@ -0,0 +1,32 @@
+"""Hourly amount histograms on rollup_merchant_hour
+
+The amount-outlier detector bounds each merchant's z-scores from these
+histograms and only reads the cases of merchants that may have outliers.
+Hours rolled up before this revision have no histogram and are read as
+before until ``scripts/backfill_rollups.py`` rebuilds them. Skipped if
+``init_db`` (``create_all``) already created the column.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = sa.inspect(op.get_bind()).get_columns("rollup_merchant_hour")
+    if any(column["name"] == "amount_hist" for column in columns):
+        return
+    op.add_column("rollup_merchant_hour", sa.Column("amount_hist", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("rollup_merchant_hour", "amount_hist")
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Rebuild the pattern detection rollup tables from dispute_case.
+
+Run once after deploying the rollups, or whenever they may have drifted
+(e.g. cases written by a path that bypassed ``rollups.record_case``).
+Safe while the API is serving: the hours live cases still update are
+left alone (see ``rollups.REBUILD_MARGIN``).
+
+Usage: python scripts/backfill_rollups.py
+"""
+
+import asyncio
+import sys
+import os
+import time
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.infra.db import init_db, get_session
+from app.intelligence.rollups import rebuild_rollups
+
+
+async def backfill():
+    await init_db()
+    started = time.perf_counter()
+    async with get_session() as session:
+        cases = await rebuild_rollups(session)
+    print(f"Rebuilt rollups from {cases} cases in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
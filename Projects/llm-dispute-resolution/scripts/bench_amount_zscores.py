@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Benchmark for the per-merchant robust z-scores of dispute amounts.
+
+Scores 10M synthetic (merchant, amount) rows, with outliers injected at a
+few merchants, through the vectorized grouped median/MAD and through the
+full amount-outlier detector, and compares with a pandas groupby baseline.
+
+Then, end to end from a temporary SQLite database of ``cases`` synthetic
+cases at ``db_merchants`` merchants: loading the analysis window and
+detecting, once reading the amounts of every merchant with enough disputes
+and once only those the amount histograms cannot rule out. The rollup
+read is the same for both and timed on its own.
+
+Usage: python scripts/bench_amount_zscores.py [rows] [merchants] [cases] [db_merchants]
+"""
+
+import asyncio
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.domain.models import Base, DisputeCase, MerchantHourRollup
+from app.infra.db import db_state, get_session
+from app.intelligence import pattern_detector
+from app.intelligence.pattern_detector import CaseAmounts, PatternDetectionEngine, PatternFrame
+from app.intelligence.robust_stats import robust_zscores
+from app.intelligence.rollups import hour_bucket, rebuild_rollups
+
+DAYS = 30
+BATCH = 20_000
+
+
+def synthetic_amounts(rows: int, merchants: int) -> CaseAmounts:
+    rng = np.random.default_rng(42)
+    codes = rng.integers(0, merchants, rows)
+    # Each merchant has its own typical ticket size
+    typical = rng.lognormal(8, 1, merchants)
+    amounts = (typical[codes] * rng.lognormal(0, 0.3, rows)).astype(np.int64) + 100
+    # The first 20 merchants get a burst of disputes far above their usual amounts
+    burst = np.flatnonzero(codes < 20)[:200]
+    amounts[burst] *= 50
+    merchant_ids = np.array([f"m{i:06d}" for i in range(merchants)], dtype=object)
+    return CaseAmounts(merchant_ids, codes.astype(np.int64), amounts)
+
+
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(rows: int = 10_000_000, merchants: int = 20_000):
+    amounts = synthetic_amounts(rows, merchants)
+    print(f"{rows:,} rows, {merchants:,} merchants")
+
+    seconds = best_of(lambda: robust_zscores(amounts.codes, amounts.amounts, merchants))
+    print(f"robust_zscores (two packed sorts)    {seconds * 1000:>9.0f} ms")
+
+    engine = PatternDetectionEngine()
+    empty = pd.DataFrame()
+
+    def detect():
+        frame = PatternFrame(1, empty, empty, empty, amounts)
+        return engine._detect_merchant_amount_outliers(frame)
+
+    seconds = best_of(detect)
+    alerts = detect()
+    caught = sum(alert.entities_involved[0] in amounts.merchant_ids[:20] for alert in alerts)
+    print(f"amount-outlier detector (end to end)  {seconds * 1000:>9.0f} ms, "
+          f"{len(alerts)} alerts ({caught}/20 injected bursts)")
+
+    def pandas_baseline():
+        frame = pd.DataFrame({"merchant": amounts.codes, "amount": amounts.amounts})
+        grouped = frame.groupby("merchant")["amount"]
+        median = grouped.transform("median")
+        deviation = (frame["amount"] - median).abs()
+        mad = deviation.groupby(frame["merchant"]).transform("median")
+        return 0.6745 * (frame["amount"] - median) / mad
+
+    seconds = best_of(pandas_baseline, repeat=1)
+    print(f"pandas groupby median/MAD baseline    {seconds * 1000:>9.0f} ms")
+
+
+def scored_merchants(merchants: pd.DataFrame):
+    """Every merchant with enough disputes: the amounts read before the histograms"""
+    counts = merchants.groupby("merchant_id")["dispute_count"].sum()
+    return counts.index[counts >= pattern_detector.MIN_AMOUNT_DISPUTES].tolist()
+
+
+async def populate(cases: CaseAmounts, now: dt.datetime) -> None:
+    rng = np.random.default_rng(7)
+    seconds = rng.integers(0, (DAYS - 1) * 86400, len(cases))
+    for start in range(0, len(cases), BATCH):
+        rows = [
+            {
+                "id": f"case_{i}", "merchant_id": cases.merchant_ids[cases.codes[i]],
+                "customer_id": f"c{i % 50_000}", "amount_cents": int(cases.amounts[i]),
+                "currency": "USD", "narrative": "n/a", "classification": "MERCHANT_ERROR",
+                "created_at": now - dt.timedelta(seconds=int(seconds[i])),
+            }
+            for i in range(start, min(start + BATCH, len(cases)))
+        ]
+        async with get_session() as session:
+            await session.execute(insert(DisputeCase), rows)
+    async with get_session() as session:
+        # Nothing else writes: rebuild every hour, including the current one
+        await rebuild_rollups(session, before=now + dt.timedelta(hours=1))
+
+
+async def bench_database(cases: CaseAmounts, path: str) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    db_state.engine = engine
+    db_state.session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    await populate(cases, dt.datetime.utcnow())
+    print(f"{len(cases):,} cases in SQLite, {len(cases.merchant_ids):,} merchants")
+
+    detector = PatternDetectionEngine()
+    since = hour_bucket(dt.datetime.utcnow() - dt.timedelta(days=DAYS))
+    for label, select_merchants in [
+        ("every scored merchant's amounts", scored_merchants),
+        ("amounts of histogram candidates", pattern_detector._amount_merchants),
+    ]:
+        async with get_session() as session:
+            start = time.perf_counter()
+            merchants = await pattern_detector._read_rollup(session, MerchantHourRollup, since)
+            rollup_seconds = time.perf_counter() - start
+            amounts = await pattern_detector._read_case_amounts(session, since, select_merchants(merchants))
+        frame = PatternFrame(DAYS, merchants, pd.DataFrame(), pd.DataFrame(), amounts)
+        alerts = detector._detect_merchant_amount_outliers(frame)
+        seconds = time.perf_counter() - start - rollup_seconds
+        print(f"{label:<36} {seconds * 1000:>9.0f} ms, {len(amounts):,} amounts read "
+              f"of {len(amounts.merchant_ids):,} merchants, {len(alerts)} alerts "
+              f"(+{rollup_seconds * 1000:.0f} ms merchant rollups)")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    merchants = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    run(rows, merchants)
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = synthetic_amounts(
+            int(sys.argv[3]) if len(sys.argv) > 3 else 500_000,
+            int(sys.argv[4]) if len(sys.argv) > 4 else 1_000
+        )
+        asyncio.run(bench_database(cases, os.path.join(tmp, "amounts.db")))
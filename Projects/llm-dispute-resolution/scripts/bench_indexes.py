@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Benchmark for the query indexes (migration 0002).
+
+Builds a synthetic SQLite database at the baseline schema (migration 0001),
+fills dispute_case and transaction_ledger, and times the hot
+queries before and after upgrading to the indexed schema. Also reports how
+long building the indexes took and the plan each query used.
+
+Usage: python scripts/bench_indexes.py [dispute_rows] [db_path]
+"""
+
+import datetime as dt
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from alembic import command
+from alembic.config import Config
+
+PROJECT_DIR = os.path.join(os.path.dirname(__file__), '..')
+LABELS = ["FRAUD_UNAUTHORIZED", "MERCHANT_ERROR", "SERVICE_NOT_RECEIVED", "DUPLICATE_CHARGE", "OTHER"]
+START = dt.datetime(2026, 1, 1)
+DAYS = 180
+BATCH = 50_000
+
+QUERIES = {
+    "window scan (7d)": (
+        "SELECT created_at, merchant_id, customer_id, amount_cents, classification "
+        "FROM dispute_case WHERE created_at >= ?",
+        lambda: [str(START + dt.timedelta(days=DAYS - 7))],
+    ),
+    "merchant counts (30d)": (
+        "SELECT merchant_id, count(*), sum(amount_cents) FROM dispute_case "
+        "WHERE created_at >= ? GROUP BY merchant_id",
+        lambda: [str(START + dt.timedelta(days=DAYS - 30))],
+    ),
+    "merchant cases (30d)": (
+        "SELECT * FROM dispute_case WHERE merchant_id = ? AND created_at >= ?",
+        lambda: ["m00042", str(START + dt.timedelta(days=DAYS - 30))],
+    ),
+    "customer cases (all)": (
+        "SELECT * FROM dispute_case WHERE customer_id = ? AND created_at >= ?",
+        lambda: ["c0004242", str(START)],
+    ),
+    "ledger (customer, 30d)": (
+        "SELECT * FROM transaction_ledger WHERE customer_id = ? AND occurred_at BETWEEN ? AND ? "
+        "ORDER BY occurred_at DESC",
+        lambda: ["c0004242", START.timestamp() + (DAYS - 30) * 86400, START.timestamp() + DAYS * 86400],
+    ),
+}
+
+
+def alembic_config(path: str) -> Config:
+    config = Config(os.path.join(PROJECT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_DIR, "migrations"))
+    config.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{path}")
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def populate(db: sqlite3.Connection, rows: int) -> None:
+    rng = random.Random(42)
+    merchants = max(rows // 2000, 10)
+    customers = max(rows // 5, 10)
+    span = DAYS * 86400
+
+    def cases(lo, hi):
+        for i in range(lo, hi):
+            created = START + dt.timedelta(seconds=rng.randrange(span))
+            yield (
+                f"d{i:08d}", f"c{rng.randrange(customers):07d}", f"m{rng.randrange(merchants):05d}",
+                rng.choice((10000, 2599, 4999, 50000, rng.randrange(100, 100000))), "USD",
+                "Synthetic dispute", "COMPLETED", rng.choice(LABELS), str(created), str(created),
+            )
+
+    def ledger(lo, hi):
+        for i in range(lo, hi):
+            yield (
+                f"t{i:08d}", f"c{rng.randrange(customers):07d}", f"m{rng.randrange(merchants):05d}",
+                rng.randrange(100, 100000), "USD", START.timestamp() + rng.random() * span,
+                "COMPLETED", "PURCHASE",
+            )
+
+    statements = [
+        ("INSERT INTO dispute_case (id, customer_id, merchant_id, amount_cents, currency, narrative, "
+         "status, classification, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?,?,?)", cases),
+        ("INSERT INTO transaction_ledger (id, customer_id, merchant_id, amount_cents, currency, "
+         "occurred_at, status, transaction_type) VALUES (?,?,?,?,?,?,?,?)", ledger),
+    ]
+    for sql, generate in statements:
+        for lo in range(0, rows, BATCH):
+            db.executemany(sql, generate(lo, min(lo + BATCH, rows)))
+        db.commit()
+
+
+def time_queries(db: sqlite3.Connection, repeat: int = 3) -> dict:
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        args = params()
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            db.execute(sql, args).fetchall()
+            best = min(best, time.perf_counter() - start)
+        detail = " | ".join(row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", args))
+        results[name] = (best * 1000, detail)
+    return results
+
+
+def run(rows: int = 5_000_000, path: str = None):
+    path = path or os.path.join(tempfile.mkdtemp(), "bench_indexes.db")
+    config = alembic_config(path)
+    command.upgrade(config, "0001")
+
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = OFF")
+    start = time.perf_counter()
+    populate(db, rows)
+    print(f"Populated {rows:,} cases and {rows:,} ledger rows "
+          f"in {time.perf_counter() - start:.1f}s ({path})")
+
+    before = time_queries(db)
+    db.close()
+
+    start = time.perf_counter()
+    command.upgrade(config, "0002")
+    print(f"Built indexes (0001 -> 0002) in {time.perf_counter() - start:.1f}s\n")
+
+    db = sqlite3.connect(path)
+    db.execute("ANALYZE")
+    after = time_queries(db)
+    db.close()
+
+    print(f"{'query':<24} {'before ms':>10} {'after ms':>10} {'speedup':>8}  plan after")
+    for name in QUERIES:
+        before_ms, _ = before[name]
+        after_ms, detail = after[name]
+        print(f"{name:<24} {before_ms:>10.1f} {after_ms:>10.1f} {before_ms / max(after_ms, 1e-3):>7.0f}x  {detail}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000,
+        sys.argv[2] if len(sys.argv) > 2 else None
+    )
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Benchmark for bulk merchant risk scoring.
+
+Fills ``rollup_merchant_hour`` of a temporary SQLite database with 30 days
+of synthetic hourly rows (with customer sketches) and times scoring every
+merchant one ``get_merchant_risk_score`` call at a time (a sample,
+extrapolated), a full bulk refresh of ``merchant_risk_score``, an
+incremental refresh after new disputes at a few merchants, and a top-K read.
+
+Usage: python scripts/bench_merchant_risk.py [merchants] [hours_per_merchant]
+"""
+
+import asyncio
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.domain.models import Base, MerchantHourRollup
+from app.infra.db import db_state, get_session
+from app.intelligence import merchant_risk
+from app.intelligence.pattern_detector import PatternDetectionEngine
+from app.intelligence.rollups import MERCHANT_HLL_PRECISION, hour_bucket
+
+DAYS = 30
+BATCH = 20_000
+SAMPLE = 200
+
+
+def rollup_rows(merchants: int, hours_per_merchant: int, now: dt.datetime):
+    rng = np.random.default_rng(42)
+    width = 1 << MERCHANT_HLL_PRECISION
+    start = hour_bucket(now) - dt.timedelta(days=DAYS)
+    for m in range(merchants):
+        hours = np.sort(rng.choice(DAYS * 24, size=hours_per_merchant, replace=False))
+        disputes = rng.integers(1, 6, hours_per_merchant)
+        fraud = rng.binomial(disputes, rng.uniform(0, 0.7))
+        amounts = disputes * rng.integers(1000, 50000, hours_per_merchant)
+        # Sparse sketches: a few customers per hour
+        registers = np.zeros((hours_per_merchant, width), dtype=np.uint8)
+        for row, n in enumerate(disputes):
+            registers[row, rng.integers(0, width, n)] = rng.integers(1, 6, n)
+        for i in range(hours_per_merchant):
+            yield {
+                "bucket_start": start + dt.timedelta(hours=int(hours[i])),
+                "merchant_id": f"m{m:06d}",
+                "dispute_count": int(disputes[i]),
+                "fraud_count": int(fraud[i]),
+                "amount_sum": int(amounts[i]),
+                "fraud_amount_sum": 0,
+                "customers_hll": registers[i].tobytes(),
+            }
+
+
+async def populate(merchants: int, hours_per_merchant: int, now: dt.datetime) -> int:
+    rows = 0
+    batch = []
+    for row in rollup_rows(merchants, hours_per_merchant, now):
+        batch.append(row)
+        if len(batch) == BATCH:
+            async with get_session() as session:
+                await session.execute(insert(MerchantHourRollup), batch)
+            rows += len(batch)
+            batch = []
+    if batch:
+        async with get_session() as session:
+            await session.execute(insert(MerchantHourRollup), batch)
+        rows += len(batch)
+    return rows
+
+
+async def timed(label: str, coro):
+    start = time.perf_counter()
+    result = await coro
+    print(f"{label:<42} {(time.perf_counter() - start) * 1000:>9.0f} ms")
+    return result
+
+
+async def bench(merchants: int, hours_per_merchant: int, path: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    db_state.engine = engine
+    db_state.session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    now = dt.datetime.utcnow()
+    rows = await populate(merchants, hours_per_merchant, now)
+    print(f"{merchants:,} merchants, {rows:,} hourly rollup rows")
+
+    detector = PatternDetectionEngine()
+    sample = [f"m{m:06d}" for m in range(0, merchants, max(merchants // SAMPLE, 1))][:SAMPLE]
+    start = time.perf_counter()
+    for merchant_id in sample:
+        await detector.get_merchant_risk_score(merchant_id, DAYS)
+    per_call = (time.perf_counter() - start) / len(sample)
+    print(f"{'per-merchant calls (extrapolated)':<42} {per_call * merchants * 1000:>9.0f} ms "
+          f"({per_call * 1000:.2f} ms/merchant)")
+
+    async def refresh(**kwargs):
+        async with get_session() as session:
+            return await merchant_risk.refresh_merchant_risk(session, DAYS, **kwargs)
+
+    summary = await timed("bulk full refresh", refresh(now=now, full=True))
+    print(f"  scored {summary['scored']:,} merchants")
+
+    # New disputes at 1% of merchants, in the current hour
+    later = now + dt.timedelta(minutes=10)
+    touched = [{
+        "bucket_start": hour_bucket(later) + dt.timedelta(hours=1),
+        "merchant_id": f"m{m:06d}",
+        "dispute_count": 1, "fraud_count": 1, "amount_sum": 5000, "fraud_amount_sum": 5000,
+        "customers_hll": None,
+    } for m in range(0, merchants, 100)]
+    async with get_session() as session:
+        await session.execute(insert(MerchantHourRollup), touched)
+    summary = await timed("incremental refresh (1% of merchants)", refresh(now=later))
+    print(f"  re-scored {summary['scored']:,} merchants")
+
+    await timed("top 100 (materialized)", merchant_risk.top_merchants(DAYS, 100, max_age_seconds=3600))
+    await engine.dispose()
+
+
+def run(merchants: int = 20_000, hours_per_merchant: int = 50):
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(bench(merchants, hours_per_merchant, os.path.join(tmp, "risk.db")))
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    )
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Benchmark for the security/audit middleware.
+
+Drives a minimal FastAPI app directly through its ASGI interface (no
+sockets) and reports requests per second for:
+
+- before: the previous ``@app.middleware("http")`` wrapper
+  (``BaseHTTPMiddleware``), with the same checks done per request
+- after:  the pure ASGI ``SecurityMiddleware``
+
+Usage: python scripts/bench_middleware.py [requests] [concurrency]
+"""
+
+import asyncio
+import sys
+import os
+import tempfile
+import time
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("AUDIT_LOG_DIR", tempfile.mkdtemp(prefix="bench_audit_"))
+os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "100000000")
+os.environ.setdefault("RATE_LIMIT_BURST", "100000000")
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from app.core.config import get_settings
+from app.security.auth import SecurityManager
+from app.security.middleware import SecurityMiddleware, ACCESS_LOG_KEY
+from app.telemetry.audit_log import audit_log
+
+settings = get_settings()
+
+
+def build_app(pure_asgi: bool) -> FastAPI:
+    app = FastAPI()
+    app.state.security = SecurityManager()
+
+    @app.get("/v1/ping")
+    async def ping():
+        return {"ok": True}
+
+    if pure_asgi:
+        app.add_middleware(SecurityMiddleware)
+        return app
+
+    @app.middleware("http")
+    async def security_middleware(request: Request, call_next):
+        if request.url.path in ["/docs", "/redoc", "/metrics", "/health"]:
+            return await call_next(request)
+        key = request.headers.get("x-api-key")
+        if request.url.path.startswith("/v1") and key != settings.api_key:
+            return JSONResponse(status_code=401, content={"detail": "Invalid API key"})
+        try:
+            rate_limit = await app.state.security.check_rate_limit(key=key or "anonymous")
+        except HTTPException as e:
+            return JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers=e.headers)
+        response = await call_next(request)
+        response.headers.update(rate_limit.headers())
+        audit_log.append_many(ACCESS_LOG_KEY, [{
+            "step": "ACCESS", "timestamp": time.time(), "latency_ms": 0, "success": True,
+            "user_id": key, "resource": request.url.path, "action": request.method,
+        }])
+        return response
+
+    return app
+
+
+async def call(app, scope) -> int:
+    status = 0
+    sent_body = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Client stays connected until the response is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif not message.get("more_body", False):
+            finished.set()
+
+    await app(dict(scope), receive, send)
+    return status
+
+
+async def measure(app, total: int, concurrency: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/v1/ping", "raw_path": b"/v1/ping",
+        "root_path": "", "query_string": b"", "server": ("bench", 80), "client": ("bench", 1),
+        "headers": [(b"host", b"bench"), (b"x-api-key", settings.api_key.encode())],
+    }
+    assert await call(app, scope) == 200
+
+    async def worker(n: int):
+        for _ in range(n):
+            await call(app, scope)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(total // concurrency) for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def run(total: int, concurrency: int):
+    await audit_log.start()
+    print(f"{'middleware':>12} {'req/s':>10}")
+    for name, pure in (("before", False), ("after", True)):
+        rps = await measure(build_app(pure), total, concurrency)
+        print(f"{name:>12} {rps:>10,.0f}")
+    await audit_log.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    ))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for PIIRedactor.redact_text on large narratives.
+
+Compares the single-pass combined scanner with the previous implementation
+(one regex pass per PII type, then string rebuilding per match, and per
+digit for card numbers), reproduced below as ``LegacyPIIRedactor``, and
+with chunked scanning (``iter_redact``), which also reports the peak
+memory of consuming the redacted segments as they are produced.
+
+Usage: python scripts/bench_pii_redactor.py [narrative_kb] [pii_per_kb]
+"""
+
+import random
+import re
+import sys
+import os
+import time
+import tracemalloc
+from typing import List, Tuple
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.security.pii_redactor import PIIMatch, PIIRedactor, PIIType
+
+FILLER = (
+    "The cardholder reports a charge they do not recognise from the merchant "
+    "and says the goods never arrived despite several follow ups. "
+)
+PII_SAMPLES = [
+    "jane.doe@example.com", "4111 1111 1111 1111", "5500-0000-0000-0004",
+    "123-45-6789", "(555) 123-4567", "+1 555.987.6543", "192.168.10.42",
+    "account #12345678901", "routing 021000021",
+]
+
+
+class LegacyPIIRedactor(PIIRedactor):
+    """The per-pattern scanner and per-match string rebuilding it replaced"""
+
+    def detect_pii(self, text: str) -> List[PIIMatch]:
+        matches = []
+        for pii_type, pattern in self.patterns.items():
+            for match in pattern.finditer(text):
+                confidence = self._calculate_confidence(pii_type, match.group())
+                if confidence > 0.7:
+                    matches.append(PIIMatch(pii_type, match.group(), match.start(), match.end(), confidence))
+        return sorted(matches, key=lambda x: x.start_pos)
+
+    def redact_text(self, text: str, redaction_char: str = "*") -> Tuple[str, List[PIIMatch]]:
+        pii_matches = self.detect_pii(text)
+        redacted_text = text
+        for match in reversed(pii_matches):
+            redacted_value = self._generate_redaction(match, redaction_char)
+            redacted_text = redacted_text[:match.start_pos] + redacted_value + redacted_text[match.end_pos:]
+        return redacted_text, pii_matches
+
+    def _generate_redaction(self, match: PIIMatch, redaction_char: str) -> str:
+        if match.pii_type == PIIType.CREDIT_CARD:
+            result = match.original_text
+            for i, char in enumerate(match.original_text):
+                if char.isdigit() and i < len(match.original_text) - 4:
+                    result = result[:i] + redaction_char + result[i + 1:]
+            return result
+        return super()._generate_redaction(match, redaction_char)
+
+
+def make_narrative(rng: random.Random, size_kb: int, pii_per_kb: float) -> str:
+    parts = []
+    length = 0
+    while length < size_kb * 1024:
+        part = FILLER
+        if rng.random() < pii_per_kb * len(FILLER) / 1024:
+            part = rng.choice(PII_SAMPLES) + " " + part
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)
+
+
+def run(size_kb: int = 50, pii_per_kb: float = 2.0, repeats: int = 20):
+    rng = random.Random(42)
+    narratives = [make_narrative(rng, size_kb, pii_per_kb) for _ in range(5)]
+    total_mb = size_kb * len(narratives) * repeats / 1024
+
+    print(f"{size_kb} KB narratives, ~{pii_per_kb} PII values per KB")
+    print(f"{'implementation':>16} {'MB/s':>8} {'ms/narrative':>13}")
+    outputs = {}
+    for name, redactor in (("legacy", LegacyPIIRedactor()), ("single-pass", PIIRedactor())):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            outputs[name] = [redactor.redact_text(text)[0] for text in narratives]
+        elapsed = time.perf_counter() - start
+        per_text = elapsed / (repeats * len(narratives)) * 1000
+        print(f"{name:>16} {total_mb / elapsed:>8.2f} {per_text:>13.2f}")
+
+    redactor = PIIRedactor()
+    chunk_size = 8192
+
+    def chunks(text):
+        return (text[i:i + chunk_size] for i in range(0, len(text), chunk_size))
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        outputs["chunked"] = ["".join(s for s, _ in redactor.iter_redact(chunks(text))) for text in narratives]
+    elapsed = time.perf_counter() - start
+    per_text = elapsed / (repeats * len(narratives)) * 1000
+    print(f"{'chunked':>16} {total_mb / elapsed:>8.2f} {per_text:>13.2f}")
+
+    for name, consume in (
+        ("single-pass", lambda text: redactor.redact_text(text)[0]),
+        ("chunked", lambda text: sum(len(s) for s, _ in redactor.iter_redact(chunks(text)))),
+    ):
+        tracemalloc.start()
+        consume(narratives[0])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"peak memory, {name}: {peak / 1024:.0f} KB")
+
+    for name in ("single-pass", "chunked"):
+        same = sum(a == b for a, b in zip(outputs["legacy"], outputs[name]))
+        print(f"identical output, legacy vs {name}: {same}/{len(narratives)} narratives")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    )
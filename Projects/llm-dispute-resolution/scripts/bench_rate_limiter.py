@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the GCRA RateLimiter.
+
+Spreads checks over 100k API keys (10% of traffic on one hot key, which
+gets throttled) and reports the per-check cost and the number of tracked
+keys. The per-check cost should not depend on how many keys or requests
+the limiter has seen; idle keys are expired as the clock advances.
+
+Usage: python scripts/bench_rate_limiter.py [num_keys] [checks]
+"""
+
+import random
+import sys
+import os
+import time
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.security.auth import RateLimiter
+
+
+def run(num_keys: int = 100_000, checks: int = 2_000_000, rounds: int = 5):
+    rng = random.Random(42)
+    keys = [f"key_{i:06d}" for i in range(num_keys)]
+    # Pre-generate a pool of keys so the benchmark measures the limiter, not RNG
+    pool = [keys[0] if rng.random() < 0.1 else keys[rng.randrange(num_keys)] for _ in range(100_000)]
+
+    limiter = RateLimiter(rate_per_minute=100, burst=20)
+    step = checks // rounds
+    print(f"{'checks':>12} {'keys':>8} {'ns/check':>9} {'denied':>8}")
+
+    done = 0
+    now = time.time()
+    while done < checks:
+        denied = 0
+        start = time.perf_counter()
+        for i in range(done, done + step):
+            # Simulated clock: 20k requests per second across all keys
+            if not limiter.acquire(pool[i % 100_000], now=now + i / 20_000).allowed:
+                denied += 1
+        elapsed = time.perf_counter() - start
+        done += step
+
+        print(f"{done:>12,} {len(limiter._tat):>8,} {elapsed / step * 1e9:>9.0f} {denied:>8,}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2_000_000
+    )
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Benchmark for the streaming pattern detector.
+
+Feeds 1M completed cases (Zipf-distributed merchants, many customers, a
+few fraud bursts) through the detector and reports traced memory and
+per-event cost at regular checkpoints. Both should stay flat: the work per
+event is constant and the tracked entities are bounded.
+
+Usage: python scripts/bench_streaming.py [events] [max_entities]
+"""
+
+import datetime as dt
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.intelligence.streaming import StreamingPatternDetector
+
+LABELS = ["FRAUD_UNAUTHORIZED", "MERCHANT_ERROR", "SERVICE_NOT_RECEIVED", "OTHER", "OTHER", "OTHER"]
+START = dt.datetime(2026, 3, 1)
+
+
+def make_events(count: int):
+    rng = random.Random(42)
+    events = []
+    for i in range(count):
+        merchant = f"m{min(int(rng.paretovariate(1.1)), 200_000)}"
+        label = rng.choice(LABELS)
+        if i % 10_000 < 20:  # a fraud burst at one merchant every 10k cases
+            merchant, label = f"burst{i // 10_000}", "FRAUD_UNAUTHORIZED"
+        events.append(SimpleNamespace(
+            merchant_id=merchant,
+            customer_id=f"c{rng.randrange(count // 3 + 1)}",
+            amount_cents=rng.randrange(100, 100_000),
+            classification=label,
+            # About 30 cases per second of case time
+            created_at=START + dt.timedelta(seconds=i / 30),
+        ))
+    return events
+
+
+def feed(events, max_entities: int, checkpoints: int, traced: bool):
+    """Rows of (events, traced MiB, us/event, merchants, customers, alerts) per checkpoint"""
+    if traced:
+        tracemalloc.start()
+    detector = StreamingPatternDetector(
+        window_seconds=3600, bucket_seconds=300, max_entities=max_entities, max_alerts=1000
+    )
+    step = len(events) // checkpoints
+    fired = 0
+    rows = []
+    for done in range(0, step * checkpoints, step):
+        start = time.perf_counter()
+        for event in events[done:done + step]:
+            fired += len(detector.observe(event, now=event.created_at.timestamp()))
+        elapsed = time.perf_counter() - start
+        current = tracemalloc.get_traced_memory()[0] if traced else 0
+        stats = detector.stats()
+        rows.append((done + step, current / 2**20, elapsed / step * 1e6,
+                     stats["merchants_tracked"], stats["customers_tracked"], fired))
+    if traced:
+        tracemalloc.stop()
+    return rows
+
+
+def run(total: int = 1_000_000, max_entities: int = 100_000, checkpoints: int = 10):
+    events = make_events(total)
+    # Timed without tracemalloc (it slows every allocation); memory from a second, traced pass
+    timed = feed(events, max_entities, checkpoints, traced=False)
+    traced = feed(events, max_entities, checkpoints, traced=True)
+    print(f"{'events':>10} {'traced MiB':>11} {'us/event':>9} {'merchants':>10} {'customers':>10} {'alerts':>7}")
+    for (done, _, us, merchants, customers, fired), (_, mib, *_) in zip(timed, traced):
+        print(f"{done:>10,} {mib:>11.1f} {us:>9.2f} {merchants:>10,} {customers:>10,} {fired:>7,}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    )
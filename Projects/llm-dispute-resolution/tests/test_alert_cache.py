@@ -0,0 +1,130 @@
+"""
+Pattern alert cache tests: one analysis per window however many callers,
+stale entries served while they revalidate, early invalidation once
+enough new cases have arrived, and background refreshes of stale windows
+only.
+"""
+import asyncio
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.intelligence.alert_cache import PatternAlertCache
+
+
+class CountingEngine:
+    """Stands in for the pattern engine; counts analyses per window"""
+
+    def __init__(self):
+        self.calls = {}
+        self.release = None
+
+    async def analyze_dispute_patterns(self, days_back):
+        self.calls[days_back] = self.calls.get(days_back, 0) + 1
+        if self.release is not None:
+            await self.release.wait()
+        return [f"alert-{days_back}-{self.calls[days_back]}"]
+
+
+def make_cache(engine, cases, ttl=60, max_stale=600, invalidate=50):
+    return PatternAlertCache(engine, lambda: cases[0], ttl, max_stale, invalidate)
+
+
+def test_concurrent_cold_misses_share_one_analysis():
+    async def run():
+        engine = CountingEngine()
+        engine.release = asyncio.Event()
+        cache = make_cache(engine, [0])
+        callers = [asyncio.create_task(cache.get(7)) for _ in range(5)]
+        await asyncio.sleep(0)
+        engine.release.set()
+        results = await asyncio.gather(*callers)
+        assert engine.calls == {7: 1}
+        assert all(r.alerts == ["alert-7-1"] for r in results)
+
+        # Fresh hit: no new analysis
+        assert (await cache.get(7)).alerts == ["alert-7-1"]
+        assert engine.calls == {7: 1}
+
+    asyncio.run(run())
+
+
+def test_stale_entry_is_served_then_revalidated():
+    async def run():
+        engine = CountingEngine()
+        cache = make_cache(engine, [0], ttl=60)
+        await cache.get(30)
+        cache._entries[30].computed_at -= 120  # past the TTL, within max stale
+
+        stale = await cache.get(30)
+        assert stale.alerts == ["alert-30-1"]
+        assert stale.age_seconds() >= 120
+        await asyncio.sleep(0)  # let the background refresh run
+        fresh = await cache.get(30)
+        assert fresh.alerts == ["alert-30-2"]
+        assert fresh.age_seconds() < 1
+
+    asyncio.run(run())
+
+
+def test_new_cases_invalidate_early():
+    async def run():
+        engine = CountingEngine()
+        cases = [100]
+        cache = make_cache(engine, cases, invalidate=50)
+        await cache.get(1)
+
+        cases[0] = 149
+        await cache.get(1)
+        await asyncio.sleep(0)
+        assert engine.calls == {1: 1}
+
+        cases[0] = 150
+        assert (await cache.get(1)).alerts == ["alert-1-1"]
+        await asyncio.sleep(0)
+        assert engine.calls == {1: 2}
+        assert cache._entries[1].total_cases == 150
+
+    asyncio.run(run())
+
+
+def test_expired_entry_blocks_for_a_recompute():
+    async def run():
+        engine = CountingEngine()
+        cache = make_cache(engine, [0], ttl=60, max_stale=600)
+        await cache.get(7)
+        cache._entries[7].computed_at -= 661
+
+        assert (await cache.get(7)).alerts == ["alert-7-2"]
+
+    asyncio.run(run())
+
+
+def test_refresh_loop_recomputes_only_stale_windows():
+    async def run():
+        engine = CountingEngine()
+        cases = [0]
+        cache = make_cache(engine, cases, ttl=60, max_stale=600)
+        # Cold pre-computed windows are all computed
+        assert sorted(await cache.refresh_stale()) == [1, 7, 30]
+
+        # Fresh entries are left alone
+        assert await cache.refresh_stale() == []
+        assert engine.calls == {1: 1, 7: 1, 30: 1}
+
+        cache._entries[7].computed_at -= 120
+        assert await cache.refresh_stale() == [7]
+        assert await cache.refresh_stale() == []
+        cases[0] = 50
+        assert sorted(await cache.refresh_stale()) == [1, 7, 30]
+        assert engine.calls == {1: 2, 7: 3, 30: 2}
+
+        # A window nobody requested lately is dropped, not recomputed
+        await cache.get(90)
+        cache._requested[90] -= 661
+        assert await cache.refresh_stale() == []
+        assert 90 not in cache._entries and engine.calls[90] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,107 @@
+"""
+Audit capture tests: each case records into its own collector through the
+contextvar, collectors are capped and always released, and orphaned
+collectors are evicted by count and by age.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.telemetry import audit
+from app.telemetry.audit import AuditCollector, audit_case, audit_step, current_dispute_id, get_audit_events
+
+
+@pytest.fixture(autouse=True)
+def clean_buffer():
+    audit._AUDIT_BUFFER.clear()
+    yield
+    audit._AUDIT_BUFFER.clear()
+
+
+@audit_step("first")
+async def first_step(delay: float) -> dict:
+    await asyncio.sleep(delay)
+    return {"dispute_id": current_dispute_id()}
+
+
+@audit_step("second")
+async def second_step(fail: bool) -> dict:
+    if fail:
+        raise ValueError("step failed")
+    return {}
+
+
+def test_concurrent_cases_record_into_their_own_collectors():
+    async def process(dispute_id: str, delay: float, fail: bool = False):
+        with audit_case(dispute_id) as collector:
+            seen = (await first_step(delay))["dispute_id"]
+            try:
+                await second_step(fail)
+            except ValueError:
+                pass
+            return seen, collector.events()
+
+    async def run():
+        # Interleaved: the second case starts and finishes inside the first
+        return await asyncio.gather(process("dsp_a", 0.05), process("dsp_b", 0.01, fail=True))
+
+    (seen_a, events_a), (seen_b, events_b) = asyncio.run(run())
+
+    assert (seen_a, seen_b) == ("dsp_a", "dsp_b")
+    assert [(e["step"], e["success"]) for e in events_a] == [("first", True), ("second", True)]
+    assert [(e["step"], e["success"]) for e in events_b] == [("first", True), ("second", False)]
+    assert current_dispute_id() is None
+    assert audit._AUDIT_BUFFER == {}
+
+
+def test_steps_outside_a_case_are_not_recorded():
+    assert asyncio.run(first_step(0))["dispute_id"] is None
+    assert audit._AUDIT_BUFFER == {}
+
+
+def test_collector_cap_counts_dropped_events():
+    collector = AuditCollector("dsp_cap", max_events=3)
+    for i in range(5):
+        collector.append({"step": f"s{i}"})
+
+    assert [e["step"] for e in collector.events()] == ["s2", "s3", "s4"]
+    assert collector.dropped == 2
+    assert [e["step"] for e in collector.drain()] == ["s2", "s3", "s4"]
+    assert collector.events() == []
+
+
+def test_collector_released_on_exception():
+    with pytest.raises(RuntimeError):
+        with audit_case("dsp_err") as collector:
+            collector.append({"step": "before"})
+            assert get_audit_events("dsp_err") == [{"step": "before"}]
+            raise RuntimeError("pipeline failed")
+
+    assert "dsp_err" not in audit._AUDIT_BUFFER
+    assert current_dispute_id() is None
+
+
+def test_orphans_evicted_by_count(monkeypatch):
+    monkeypatch.setattr(audit, "settings", audit.settings.copy(update={"audit_max_open_cases": 3}))
+    # Collectors left open (e.g. by a case that never finished)
+    for i in range(5):
+        audit._AUDIT_BUFFER[f"dsp_{i}"] = AuditCollector(f"dsp_{i}", 8)
+
+    with audit_case("dsp_new"):
+        assert list(audit._AUDIT_BUFFER) == ["dsp_3", "dsp_4", "dsp_new"]
+
+
+def test_orphans_evicted_by_age(monkeypatch):
+    monkeypatch.setattr(audit, "settings", audit.settings.copy(update={"audit_orphan_ttl_seconds": 60}))
+    stale, fresh = AuditCollector("dsp_stale", 8), AuditCollector("dsp_fresh", 8)
+    stale.created_at -= 120
+    audit._AUDIT_BUFFER["dsp_stale"] = stale
+    audit._AUDIT_BUFFER["dsp_fresh"] = fresh
+
+    with audit_case("dsp_new"):
+        assert list(audit._AUDIT_BUFFER) == ["dsp_fresh", "dsp_new"]
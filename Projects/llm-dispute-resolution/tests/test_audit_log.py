@@ -0,0 +1,250 @@
+"""
+Segmented audit log tests: torn-tail recovery, rotation with sealed
+indexes, retention and merge compaction, range reads, several writer
+processes sharing one log directory, failed batches and the queue bound.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.telemetry import audit_log as audit_log_module
+from app.telemetry.audit_log import SegmentedAuditLog, _encode
+
+
+def event(step: str, ts: float = None) -> dict:
+    return {"step": step, "timestamp": time.time() if ts is None else ts}
+
+
+def segments(directory):
+    return sorted(p.relative_to(directory).as_posix() for p in directory.rglob("*.seg"))
+
+
+def test_range_reads_return_only_the_requested_dispute(tmp_path):
+    async def run():
+        log = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1)
+        await log.start()
+        for i in range(50):
+            log.append_many(f"dsp_{i % 5}", [event(f"s{i}")])
+        events = await log.read("dsp_3")
+        missing = await log.read("dsp_unknown")
+        await log.stop()
+        return events, missing
+
+    events, missing = asyncio.run(run())
+    assert [e["step"] for e in events] == [f"s{i}" for i in range(3, 50, 5)]
+    assert all(e["dispute_id"] == "dsp_3" for e in events)
+    assert missing == []
+
+
+def test_torn_tail_is_truncated_on_recovery(tmp_path):
+    async def write():
+        log = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1)
+        await log.start()
+        log.append_many("dsp_a", [event("classify"), event("recommend")])
+        await log.stop()
+        return log
+
+    asyncio.run(write())
+    (segment,) = (tmp_path / "writer-000").glob("*.seg")
+    intact = segment.stat().st_size
+    # A crash mid-write: a whole length prefix and half of the body
+    with open(segment, "ab") as f:
+        f.write(_encode({"dispute_id": "dsp_a", "step": "torn"})[:-5])
+
+    async def recover():
+        log = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1)
+        await log.start()
+        after_recovery = segment.stat().st_size
+        log.append_many("dsp_a", [event("after")])
+        events = await log.read("dsp_a")
+        await log.stop()
+        return after_recovery, events
+
+    after_recovery, events = asyncio.run(recover())
+    assert after_recovery == intact
+    assert [e["step"] for e in events] == ["classify", "recommend", "after"]
+
+
+def test_rotation_seals_segments_with_an_index(tmp_path):
+    async def run():
+        log = SegmentedAuditLog(str(tmp_path), segment_max_bytes=400, flush_interval_ms=1)
+        await log.start()
+        for i in range(20):
+            log.append_many(f"dsp_{i % 2}", [event(f"s{i}")])
+            await log.sync()
+        await log.stop()
+
+        # A new instance loads the sealed indexes instead of scanning
+        reopened = SegmentedAuditLog(str(tmp_path), segment_max_bytes=400, flush_interval_ms=1)
+        await reopened.start()
+        sealed = [s for s in reopened._segments if s.sealed]
+        events = await reopened.read("dsp_1")
+        await reopened.stop()
+        return sealed, events
+
+    sealed, events = asyncio.run(run())
+    assert len(sealed) >= 3
+    assert all(s.index_path.exists() and s.size >= 400 for s in sealed)
+    assert [e["step"] for e in events] == [f"s{i}" for i in range(1, 20, 2)]
+
+
+def test_retention_drops_and_merges_sealed_segments(tmp_path):
+    now = time.time()
+
+    async def run():
+        log = SegmentedAuditLog(str(tmp_path), segment_max_bytes=140,
+                                retention_seconds=86400, flush_interval_ms=1)
+        await log.start()
+        # Two records per segment: two segments past retention, then recent ones
+        for i in range(4):
+            log.append_many("dsp_old", [event(f"old{i}", now - 10 * 86400)])
+            await log.sync()
+        for i in range(12):
+            log.append_many(f"dsp_{i % 3}", [event(f"new{i}", now - i)])
+            await log.sync()
+        before = len(log._segments)
+        # Larger segments allowed from here on, so the small ones merge
+        log.segment_max_bytes = 10_000
+        stats = await log.compact()
+        after = len(log._segments)
+        events = {key: await log.read(key) for key in ("dsp_old", "dsp_1")}
+        await log.stop()
+        return before, stats, after, events
+
+    before, stats, after, events = asyncio.run(run())
+    assert stats["expired_segments"] == 2
+    assert stats["merged_segments"] >= 1
+    assert after == before - stats["expired_segments"] - stats["merged_segments"]
+    assert events["dsp_old"] == []
+    assert sorted(e["step"] for e in events["dsp_1"]) == ["new1", "new10", "new4", "new7"]
+
+
+def test_writers_sharing_a_directory(tmp_path):
+    async def run():
+        a = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1)
+        b = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1)
+        await a.start()
+        await b.start()
+        a.append_many("dsp_a", [event("a1")])
+        b.append_many("dsp_b", [event("b1")])
+        a.append_many("dsp_shared", [event("from_a", 1.0)])
+        b.append_many("dsp_shared", [event("from_b", 2.0)])
+        await a.sync()
+        await b.sync()
+        # Every instance sees every writer's records, including open segments
+        reads = [await log.read(key) for log in (a, b) for key in ("dsp_a", "dsp_b", "dsp_shared")]
+        dirs = (a.writer_dir.name, b.writer_dir.name)
+
+        # A later record in the other writer's open segment is picked up too
+        b.append_many("dsp_b", [event("b2")])
+        await b.sync()
+        followed = await a.read("dsp_b")
+
+        await a.stop()
+        await b.stop()
+        return reads, dirs, followed
+
+    reads, dirs, followed = asyncio.run(run())
+    assert dirs == ("writer-000", "writer-001")
+    for offset in (0, 3):
+        assert [e["step"] for e in reads[offset]] == ["a1"]
+        assert [e["step"] for e in reads[offset + 1]] == ["b1"]
+        assert [e["step"] for e in reads[offset + 2]] == ["from_a", "from_b"]
+    assert [e["step"] for e in followed] == ["b1", "b2"]
+    assert segments(tmp_path) == ["writer-000/0000000001.seg", "writer-001/0000000001.seg"]
+
+
+def test_exited_writer_directory_is_reclaimed_and_compacted(tmp_path):
+    now = time.time()
+
+    async def run():
+        gone = SegmentedAuditLog(str(tmp_path), segment_max_bytes=200,
+                                 retention_seconds=86400, flush_interval_ms=1)
+        live = SegmentedAuditLog(str(tmp_path), retention_seconds=86400, flush_interval_ms=1)
+        await gone.start()
+        await live.start()
+        for i in range(6):
+            gone.append_many("dsp_gone", [event(f"g{i}", now - (10 * 86400 if i < 3 else 0))])
+            await gone.sync()
+        await gone.stop()
+
+        # The live worker compacts the exited writer's directory...
+        stats = await live.compact()
+        events = await live.read("dsp_gone")
+        # ...and a replacement worker takes it over
+        replacement = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1)
+        await replacement.start()
+        replacement.append_many("dsp_gone", [event("g6")])
+        await replacement.sync()
+        taken_over = replacement.writer_dir.name
+        after = await live.read("dsp_gone")
+        await replacement.stop()
+        await live.stop()
+        return stats, events, taken_over, after
+
+    stats, events, taken_over, after = asyncio.run(run())
+    assert stats["expired_segments"] >= 1
+    assert [e["step"] for e in events] == ["g3", "g4", "g5"]
+    assert taken_over == "writer-000"
+    assert [e["step"] for e in after] == ["g3", "g4", "g5", "g6"]
+
+
+def test_failed_batch_is_reported_and_retried(tmp_path, monkeypatch):
+    fsync = os.fsync
+    failures = []
+
+    def failing_fsync(fd):
+        if not failures:
+            failures.append(fd)
+            raise OSError("disk full")
+        fsync(fd)
+
+    async def run():
+        log = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1)
+        await log.start()
+        monkeypatch.setattr(audit_log_module.os, "fsync", failing_fsync)
+        log.append_many("dsp_a", [event("classify"), event("recommend")])
+        with pytest.raises(OSError):
+            await log.sync()
+        # The records were kept and land once the disk recovers
+        log.append_many("dsp_a", [event("after")])
+        await log.sync()
+        events = await log.read("dsp_a")
+        await log.stop()
+        return events
+
+    events = asyncio.run(run())
+    assert len(failures) == 1
+    assert [e["step"] for e in events] == ["classify", "recommend", "after"]
+
+    # The partial write was cut off: the segment holds each record once
+    async def reread():
+        log = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1)
+        await log.start()
+        events = await log.read("dsp_a")
+        await log.stop()
+        return events
+
+    assert [e["step"] for e in asyncio.run(reread())] == ["classify", "recommend", "after"]
+
+
+def test_queue_is_bounded_and_drops_are_counted(tmp_path):
+    async def run():
+        log = SegmentedAuditLog(str(tmp_path), flush_interval_ms=1, max_queued=5)
+        await log.start()
+        # The writer cannot run while the caller holds the event loop
+        log.append_many("dsp_a", [event(f"s{i}") for i in range(8)])
+        dropped = log.dropped
+        events = await log.read("dsp_a")
+        await log.stop()
+        return dropped, events
+
+    dropped, events = asyncio.run(run())
+    assert dropped == 3
+    assert [e["step"] for e in events] == [f"s{i}" for i in range(5)]
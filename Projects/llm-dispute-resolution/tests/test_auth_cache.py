@@ -0,0 +1,123 @@
+"""
+Credential cache tests: cached JWTs never outlive their `exp`, entries are
+bounded by the cache TTL, revoked tokens are re-verified, and the hit
+rates are reported by cache_stats. The "*" scope is honored for API keys
+only.
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core import cache as cache_module
+from app.security import auth
+from app.security.auth import SecurityManager
+
+API_KEY = "test-key-123"
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(time.time())
+    # The cache and the token expiry check both read time.time
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def security(monkeypatch):
+    monkeypatch.setattr(auth, "settings", auth.settings.copy(update={
+        "auth_cache_ttl_seconds": 60, "auth_cache_size": 100, "rate_limit_backend": "memory",
+    }))
+    return SecurityManager(api_keys=[API_KEY])
+
+
+def test_cached_token_is_not_served_past_its_exp(security, clock):
+    token = security.create_access_token({"sub": "analyst", "scopes": ["read"]}, timedelta(seconds=10))
+    assert asyncio.run(security.verify_token(token)).sub == "analyst"
+    assert asyncio.run(security.verify_token(token)).sub == "analyst"
+    assert security.cache_stats()["jwt"]["hits"] == 1
+
+    # Past exp but well inside the 60s TTL: the entry is gone and the token
+    # is checked again, which rejects it
+    clock.now += 11
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(security.verify_token(token))
+    assert error.value.status_code == 401
+    assert security.cache_stats()["jwt"]["size"] == 0
+
+
+def test_entries_are_bounded_by_the_cache_ttl(security, clock):
+    token = security.create_access_token({"sub": "analyst"}, timedelta(hours=1))
+    asyncio.run(security.verify_token(token))
+    assert security.resolve_api_key(API_KEY) is not None
+
+    clock.now += 30
+    asyncio.run(security.verify_token(token))
+    security.resolve_api_key(API_KEY)
+    stats = security.cache_stats()
+    assert (stats["jwt"]["hits"], stats["api_key_principal"]["hits"]) == (1, 1)
+
+    # One TTL after they were stored both entries have expired
+    clock.now += 31
+    asyncio.run(security.verify_token(token))
+    security.resolve_api_key(API_KEY)
+    stats = security.cache_stats()
+    assert (stats["jwt"]["misses"], stats["api_key_principal"]["misses"]) == (2, 2)
+
+
+def test_revoked_token_is_verified_again(security, clock):
+    token = security.create_access_token({"sub": "analyst"}, timedelta(hours=1))
+    asyncio.run(security.verify_token(token))
+    security.revoke_token(token)
+    assert security.cache_stats()["jwt"]["size"] == 0
+
+    asyncio.run(security.verify_token(token))
+    stats = security.cache_stats()["jwt"]
+    assert (stats["hits"], stats["misses"], stats["size"]) == (0, 2, 1)
+
+
+def test_cache_stats_report_hit_rates(security, clock):
+    for _ in range(4):
+        assert security.resolve_api_key(API_KEY) is not None
+    # Invalid keys are looked up but never cached
+    assert security.resolve_api_key("wrong") is None
+    assert security.resolve_api_key("wrong") is None
+
+    stats = security.cache_stats()
+    assert stats["api_key_principal"] == {
+        "size": 1, "max_size": 100, "hits": 3, "misses": 3, "hit_rate": 0.5,
+    }
+    assert stats["jwt"]["hit_rate"] == 0.0
+
+
+def test_wildcard_scope_is_honored_only_for_api_keys(security, clock):
+    principal = security.resolve_api_key(API_KEY)
+    assert security.verify_scope("disputes:write", principal)
+
+    token = security.create_access_token({"sub": "analyst", "scopes": ["*"]}, timedelta(hours=1))
+    token_data = asyncio.run(security.verify_token(token))
+    with pytest.raises(HTTPException) as error:
+        security.verify_scope("disputes:write", token_data)
+    assert error.value.status_code == 403
+
+    # Nor can a token claim an API key subject
+    forged = security.create_access_token({"sub": principal.sub, "scopes": ["*"]}, timedelta(hours=1))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(security.verify_token(forged))
+    assert error.value.status_code == 401
@@ -0,0 +1,93 @@
+"""
+Batch pool tests: streamed results keep input order whatever order the
+chunks finish in, at most two chunks per worker are in flight, and small
+batches run off the event loop.
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pydantic import ValidationError
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.api.routers.analytics import PIIBatchRequest, settings as analytics_settings
+from app.security.batch import BatchPool
+
+
+class Tracker:
+    """Worker function recording how many chunks run at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.rng = random.Random(5)
+
+    def __call__(self, chunk):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            delay = self.rng.uniform(0, 0.02)
+        time.sleep(delay)  # chunks finish out of order
+        with self.lock:
+            self.running -= 1
+        return [item * 10 for item in chunk]
+
+
+def pool_with_threads(worker_fn, max_workers, chunk_size):
+    pool = BatchPool(lambda: None, worker_fn, worker_fn, max_workers=max_workers, chunk_size=chunk_size)
+    # Threads stand in for the worker processes, with room for more chunks than allowed
+    pool._executor = ThreadPoolExecutor(max_workers=16)
+    return pool
+
+
+def collect(pool, items):
+    async def run():
+        return [result async for result in pool.stream(items)]
+    return asyncio.run(run())
+
+
+def test_stream_keeps_input_order_and_bounds_chunks_in_flight():
+    tracker = Tracker()
+    pool = pool_with_threads(tracker, max_workers=2, chunk_size=3)
+    try:
+        assert collect(pool, range(100)) == [i * 10 for i in range(100)]
+        streamed_max = tracker.max_running
+        assert pool.map(range(100)) == [i * 10 for i in range(100)]
+    finally:
+        pool.shutdown()
+    assert 1 < streamed_max <= 4
+
+
+def test_small_batches_run_off_the_event_loop():
+    threads = []
+
+    def local_fn(chunk):
+        threads.append(threading.get_ident())
+        return list(chunk)
+
+    pool = BatchPool(lambda: None, local_fn, local_fn, max_workers=4, chunk_size=10)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        results = [result async for result in pool.stream(["a", "b"])]
+        return loop_thread, results
+
+    loop_thread, results = asyncio.run(run())
+    assert results == ["a", "b"]
+    assert threads and threads[0] != loop_thread
+    assert pool._executor is None  # no worker processes for an inline batch
+
+
+def test_batch_request_caps_text_length():
+    limit = analytics_settings.max_narrative_length
+    assert PIIBatchRequest(texts=["x" * limit]).texts
+    with pytest.raises(ValidationError):
+        PIIBatchRequest(texts=["ok", "x" * (limit + 1)])
@@ -0,0 +1,46 @@
+"""
+Label guard tests: single labels and whole label combinations stay within
+their caps, and the case counters share the Prometheus label allow-list.
+"""
+import itertools
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.telemetry.metrics import CASE_LABELS
+from app.telemetry.prometheus import (
+    CLASSIFICATION_LABELS, OVERFLOW_LABEL, LabelGuard, SeriesGuard, guard_label,
+)
+
+
+def test_label_guard_caps_distinct_values():
+    guard = LabelGuard(2, allowed=["openai"])
+    assert [guard(v) for v in ["a", None, "c", "a", "openai"]] == ["a", "unknown", "other", "a", "openai"]
+
+
+def test_series_guard_caps_label_combinations():
+    # Each label alone stays under its cap of 10; their product would not
+    guard = SeriesGuard(
+        20,
+        provider=LabelGuard(10), model=LabelGuard(10),
+        template=LabelGuard(10), template_version=LabelGuard(10),
+    )
+    series = set()
+    for provider, model, template, version in itertools.product(range(4), repeat=4):
+        labels = guard(provider=f"p{provider}", model=f"m{model}", template=f"t{template}", template_version=f"v{version}")
+        series.add(tuple(labels.values()))
+
+    overflow = (OVERFLOW_LABEL,) * 4
+    assert overflow in series
+    assert len(series) == 21
+    # Combinations admitted before the cap keep their own series
+    assert guard(provider="p0", model="m0", template="t0", template_version="v0") == {
+        "provider": "p0", "model": "m0", "template": "t0", "template_version": "v0",
+    }
+
+
+def test_case_labels_share_the_classification_allow_list():
+    assert CASE_LABELS == CLASSIFICATION_LABELS + (OVERFLOW_LABEL,)
+    assert all(guard_label(label) == label for label in CLASSIFICATION_LABELS)
@@ -0,0 +1,176 @@
+"""
+Merchant risk tests: bulk scores match the per-merchant risk score, an
+incremental refresh re-scores only the merchants whose window changed,
+concurrent refreshes (as from several workers) do not conflict, and the
+top-K ranking comes back riskiest first.
+"""
+import asyncio
+import datetime as dt
+import os
+import random
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.domain.models import Base, DisputeCase, MerchantRiskScore
+from app.infra.db import db_state, get_session
+from app.intelligence import merchant_risk, rollups
+from app.intelligence.pattern_detector import PatternDetectionEngine
+
+NOW = dt.datetime.utcnow()
+
+
+def make_cases(n: int, seed: int = 11):
+    rng = random.Random(seed)
+    cases = []
+    for i in range(n):
+        merchant = f"m_{i % 12}"
+        # Fraud-heavy and repeat-customer merchants so the scores spread out
+        fraud = rng.random() < (0.8 if merchant in ("m_0", "m_1") else 0.15)
+        customer = f"c_{rng.randint(0, 2)}" if merchant == "m_2" else f"c_{rng.randint(0, 300)}"
+        cases.append(DisputeCase(
+            id=f"case_{i}",
+            customer_id=customer,
+            merchant_id=merchant,
+            amount_cents=rng.randint(100, 90000),
+            currency="USD",
+            narrative="n/a",
+            classification="FRAUD_UNAUTHORIZED" if fraud else "MERCHANT_ERROR",
+            created_at=NOW - dt.timedelta(hours=rng.randint(2, 24 * 20), minutes=rng.randint(0, 59)),
+        ))
+    return cases
+
+
+def case(case_id: str, merchant_id: str, created_at: dt.datetime) -> DisputeCase:
+    return DisputeCase(
+        id=case_id, customer_id="c_new", merchant_id=merchant_id, amount_cents=5000,
+        currency="USD", narrative="n/a", classification="FRAUD_UNAUTHORIZED", created_at=created_at,
+    )
+
+
+@pytest.fixture
+def database(tmp_path):
+    async def setup():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'risk.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return engine
+
+    engine = asyncio.run(setup())
+    previous = db_state.engine, db_state.session_maker
+    db_state.engine = engine
+    db_state.session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    yield
+    db_state.engine, db_state.session_maker = previous
+    asyncio.run(engine.dispose())
+
+
+async def _insert_cases(cases):
+    async with get_session() as session:
+        for c in cases:
+            session.add(c)
+            await rollups.record_case(session, c)
+
+
+async def _refresh(now, full=False):
+    async with get_session() as session:
+        return await merchant_risk.refresh_merchant_risk(session, 30, now, full)
+
+
+async def _stored_scores():
+    async with get_session() as session:
+        rows = (await session.execute(select(MerchantRiskScore))).scalars().all()
+    return {
+        row.merchant_id: (row.risk_score, row.risk_level, row.total_disputes, row.fraud_disputes, row.unique_customers)
+        for row in rows
+    }
+
+
+def test_bulk_scores_match_per_merchant_scores(database):
+    engine = PatternDetectionEngine()
+
+    async def run():
+        await _insert_cases(make_cases(600))
+        summary = await _refresh(NOW)
+        ranking = await merchant_risk.top_merchants(30, top_k=100)
+        single = {m: await engine.get_merchant_risk_score(m, 30) for m in (f"m_{i}" for i in range(12))}
+        return summary, ranking, single
+
+    summary, ranking, single = asyncio.run(run())
+
+    assert summary == {"mode": "full", "scored": 12}
+    assert len(ranking["merchants"]) == 12
+    for report in ranking["merchants"]:
+        expected = single[report["merchant_id"]]
+        assert report["risk_score"] == expected["risk_score"]
+        assert report["risk_level"] == expected["risk_level"]
+        assert report["stats"] == pytest.approx(expected["stats"])
+        for name, factor in report["factors"].items():
+            assert factor == pytest.approx(expected["factors"][name])
+
+
+def test_incremental_refresh_rescores_only_changed_merchants(database):
+    later = NOW + dt.timedelta(hours=2)
+
+    async def run():
+        # m_old's only case leaves the window between the two refreshes
+        await _insert_cases(make_cases(300) + [case("old", "m_old", NOW - dt.timedelta(days=30) + dt.timedelta(minutes=30))])
+        first = await _refresh(NOW)
+        await _insert_cases([case(f"new_{i}", "m_3", NOW + dt.timedelta(minutes=30)) for i in range(4)])
+        second = await _refresh(later)
+        incremental = await _stored_scores()
+        full = await _refresh(later, full=True)
+        return first, second, incremental, full, await _stored_scores()
+
+    first, second, incremental, full, rebuilt = asyncio.run(run())
+
+    assert first == {"mode": "full", "scored": 13}
+    # m_3 gained cases; m_old was looked at but has nothing left to score
+    assert second == {"mode": "incremental", "scored": 1}
+    assert "m_old" not in incremental
+    assert incremental["m_3"][2] == rebuilt["m_3"][2] > 0
+    assert full == {"mode": "full", "scored": 12}
+    assert incremental == rebuilt
+
+
+def test_concurrent_refreshes_do_not_conflict(database):
+    later = NOW + dt.timedelta(hours=2)
+
+    async def run():
+        await _insert_cases(make_cases(300))
+        # Separate sessions, bypassing the in-process lock, as separate workers would
+        first = await asyncio.gather(_refresh(NOW), _refresh(NOW), _refresh(NOW + dt.timedelta(seconds=1)))
+        await _insert_cases([case(f"new_{i}", "m_3", NOW + dt.timedelta(minutes=30)) for i in range(4)])
+        second = await asyncio.gather(_refresh(later), _refresh(later))
+        concurrent = await _stored_scores()
+        await _refresh(later, full=True)
+        return first, second, concurrent, await _stored_scores()
+
+    first, second, concurrent, rebuilt = asyncio.run(run())
+
+    assert [summary["scored"] for summary in first] == [12, 12, 12]
+    assert all(summary["scored"] >= 1 for summary in second)
+    assert concurrent == rebuilt and len(rebuilt) == 12
+
+
+def test_top_merchants_ranking(database):
+    async def run():
+        await _insert_cases(make_cases(600))
+        top = await merchant_risk.top_merchants(30, top_k=5)
+        everything = await merchant_risk.top_merchants(30, top_k=100)
+        return top, everything
+
+    top, everything = asyncio.run(run())
+
+    # The first request computes the window; both read the same scores
+    assert top["refreshed_at"] == everything["refreshed_at"]
+    scores = [m["risk_score"] for m in everything["merchants"]]
+    assert scores == sorted(scores, reverse=True)
+    assert top["merchants"] == everything["merchants"][:5]
+    assert {m["merchant_id"] for m in top["merchants"][:2]} == {"m_0", "m_1"}
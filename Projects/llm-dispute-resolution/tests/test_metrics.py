@@ -0,0 +1,139 @@
+"""
+Metrics tests: quantile sketch accuracy and merging, totals shared
+across worker processes (and not carried over from a previous server
+run), and rolling-window expiry.
+"""
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.telemetry import metrics as metrics_module
+from app.telemetry.metrics import Metrics, MetricsLayout, QuantileSketch, SharedMetrics
+
+QS = (0.5, 0.9, 0.95, 0.99)
+
+
+def test_quantile_sketch_relative_accuracy():
+    values = np.random.default_rng(3).lognormal(6, 1.5, 50_000)
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    estimates = sketch.quantiles(QS)
+    for q in QS:
+        exact = np.quantile(values, q, method="inverted_cdf")
+        # Within the sketch's 1% (plus the 3-decimal rounding of the result)
+        assert abs(estimates[q] - exact) <= 0.01 * exact + 0.001
+
+
+def test_quantile_sketch_merge_equals_single_sketch():
+    rng = np.random.default_rng(5)
+    fast, slow = rng.lognormal(4, 0.5, 5_000), rng.lognormal(8, 0.5, 5_000)
+    merged_input, a, b = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in fast:
+        a.add(value)
+        merged_input.add(value)
+    for value in slow:
+        b.add(value)
+        merged_input.add(value)
+
+    # Sketches merge by adding bucket counts (as blocks from several workers do)
+    assert a.quantiles(QS, a.counts + b.counts) == merged_input.quantiles(QS)
+    assert len(a.counts) == a.num_buckets  # fixed size however many values were added
+
+
+def test_quantile_sketch_empty_and_out_of_range():
+    sketch = QuantileSketch(max_value=1000)
+    assert sketch.quantiles(QS) == {q: 0.0 for q in QS}
+    sketch.add(0.5)
+    sketch.add(10 ** 9)  # clamped into the last bucket
+    assert sketch.counts[0] == 1 and sketch.counts[-1] == 1
+
+
+def _record_cases(metrics: SharedMetrics, n: int) -> None:
+    for _ in range(n):
+        metrics.increment_case("MERCHANT_ERROR")
+        metrics.record_classification_latency(120)
+
+
+def test_shared_metrics_sum_worker_blocks(tmp_path):
+    metrics = SharedMetrics(str(tmp_path))
+    # The parent maps its block before forking, as a preloaded app would
+    _record_cases(metrics, 2)
+
+    fork = multiprocessing.get_context("fork")
+    workers = [fork.Process(target=_record_cases, args=(metrics, 5)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    # Each child re-mapped its own file instead of writing into the parent's
+    blocks = sorted(p.name for p in tmp_path.glob("metrics_*.bin"))
+    assert blocks == sorted(f"metrics_{pid}.bin" for pid in [os.getpid()] + [w.pid for w in workers])
+    assert metrics._block()[MetricsLayout.TOTAL_CASES] == 2
+
+    snapshot = metrics.snapshot()
+    assert snapshot.total_cases == 17
+    assert snapshot.cases_by_label == {"MERCHANT_ERROR": 17}
+    assert abs(snapshot.classification_latency_ms.p50 - 120) <= 1.2
+    assert metrics.total_cases() == 17
+    # Another process opening the directory sees the same totals
+    assert SharedMetrics(str(tmp_path)).snapshot().total_cases == 17
+
+
+def test_blocks_of_a_previous_run_are_cleared(tmp_path):
+    previous = SharedMetrics(str(tmp_path))
+    _record_cases(previous, 3)
+    assert SharedMetrics(str(tmp_path)).snapshot().total_cases == 3
+
+    # Every process of that run has exited: the next one starts from zero
+    previous._lock.close()
+    current = SharedMetrics(str(tmp_path))
+    assert list(tmp_path.glob("metrics_*.bin")) == []
+    _record_cases(current, 2)
+    assert current.snapshot().total_cases == 2
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+def test_window_rings_expire_old_slots(monkeypatch):
+    clock = Clock(1_000_000.0)
+    monkeypatch.setattr(metrics_module.time, "time", clock.time)
+    metrics = Metrics()
+
+    metrics.increment_case("FRAUD_UNAUTHORIZED")
+    clock.now += 30
+    metrics.increment_case("MERCHANT_ERROR")
+    assert metrics.snapshot("1m").total_cases == 2
+
+    # 70s after the first case: only the second is left in the last minute
+    clock.now += 40
+    one_minute = metrics.snapshot("1m")
+    assert one_minute.total_cases == 1
+    assert one_minute.cases_by_label == {"MERCHANT_ERROR": 1}
+    assert metrics.snapshot("5m").total_cases == 2
+
+    # Exactly one ring length (60 x 1s) after the second case its slot comes
+    # round again: recording there recycles it instead of adding to it
+    clock.now += 20
+    metrics.increment_case("OTHER")
+    assert metrics.snapshot("1m").cases_by_label == {"OTHER": 1}
+    assert metrics.snapshot("5m").total_cases == 3
+
+    # Past every window nothing is live, but lifetime totals keep counting
+    clock.now += 3600
+    assert [metrics.snapshot(w).total_cases for w in ("1m", "5m", "1h")] == [0, 0, 0]
+    assert metrics.snapshot().total_cases == 3
@@ -0,0 +1,107 @@
+"""
+PII analysis cache tests: one presidio pass per text serves every
+threshold the handler filters at, analyses are cached by text digest
+(never the raw text) and shared across handlers, and the cache is bounded.
+"""
+import asyncio
+import hashlib
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.cache import LRUCache
+from app.security import pii_handler
+from app.security.pii_handler import PIIHandler
+
+TEXT = "SSN 123-45-6789, call 555-010-0199 about order 42"
+
+
+class RecordingAnalyzer:
+    """Analyzer returning fixed results above the requested threshold"""
+
+    def __init__(self):
+        self.calls = []
+
+    def analyze(self, text, language, score_threshold):
+        self.calls.append((text, score_threshold))
+        results = [
+            SimpleNamespace(entity_type="SSN", start=4, end=15, score=0.95),
+            SimpleNamespace(entity_type="PHONE_NUMBER", start=22, end=34, score=0.75),
+            SimpleNamespace(entity_type="DATE_TIME", start=41, end=49, score=0.4),
+        ]
+        return [r for r in results if r.score >= score_threshold]
+
+
+class MaskingAnonymizer:
+    def anonymize(self, text, analyzer_results, operators):
+        for r in sorted(analyzer_results, key=lambda r: r.start, reverse=True):
+            text = text[:r.start] + "#" * (r.end - r.start) + text[r.end:]
+        return SimpleNamespace(text=text)
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    analyzer = RecordingAnalyzer()
+    monkeypatch.setattr(pii_handler, "get_engines", lambda: (analyzer, MaskingAnonymizer()))
+    monkeypatch.setattr(pii_handler, "_analysis_cache", LRUCache("pii_analysis", 4))
+    monkeypatch.setattr(pii_handler, "settings", pii_handler.settings.copy(update={
+        "pii_confidence_threshold": 0.7, "enable_pii_redaction": True,
+    }))
+    return analyzer
+
+
+def test_one_analysis_serves_every_threshold(analyzer):
+    handler = PIIHandler()
+
+    async def run():
+        return (
+            await handler.analyze_text(TEXT),
+            await handler.redact_text(TEXT),
+            await handler.validate_text(TEXT),
+        )
+
+    findings, (redacted, stats), (valid, error) = asyncio.run(run())
+    assert analyzer.calls == [(TEXT, 0.7)]
+    assert [f["type"] for f in findings["pii_found"]] == ["SSN", "PHONE_NUMBER"]
+    assert stats == {"total_redactions": 2, "redactions_by_type": {"SSN": 1, "PHONE_NUMBER": 1}}
+    assert "123-45-6789" not in redacted and "555-010-0199" not in redacted
+    # Validation filters the same results at its own, higher threshold
+    assert (valid, error) == (False, "Found sensitive data: SSN")
+    assert [r.entity_type for r in handler.analyze(TEXT).at(0.9)] == ["SSN"]
+
+
+def test_cache_is_keyed_by_digest_and_shared_across_handlers(analyzer, monkeypatch):
+    first = PIIHandler().analyze(TEXT)
+    # An equal text in a new string, from another handler: served from cache
+    again = PIIHandler().analyze("".join(list(TEXT)))
+    assert again is first and len(analyzer.calls) == 1
+
+    keys = list(pii_handler._analysis_cache._entries)
+    assert keys == [(hashlib.sha256(TEXT.encode()).digest(), 0.7)]
+    assert all(TEXT not in map(str, key) for key in keys)
+
+    # A different lowest threshold is a different analysis
+    monkeypatch.setattr(pii_handler, "settings", pii_handler.settings.copy(update={"pii_confidence_threshold": 0.5}))
+    assert PIIHandler().analyze(TEXT).min_score == 0.5
+    assert analyzer.calls[-1] == (TEXT, 0.5)
+
+
+def test_least_recently_used_analyses_are_evicted(analyzer):
+    handler = PIIHandler()
+    texts = [f"{TEXT} #{i}" for i in range(5)]
+    for text in texts:
+        handler.analyze(text)
+    handler.analyze(texts[1])  # refreshed: now the most recently used
+    assert len(analyzer.calls) == 5
+
+    # Capacity 4: the fifth text pushed out the first
+    handler.analyze(texts[0])
+    assert [text for text, _ in analyzer.calls] == texts + [texts[0]]
+    assert len(pii_handler._analysis_cache) == 4
+    handler.analyze(texts[1])
+    assert len(analyzer.calls) == 6
@@ -0,0 +1,120 @@
+"""
+Chunked PII scanning tests: iter_redact over any split of a text must give
+the same redacted text and matches as redact_text on the whole text,
+including candidates as long as the patterns allow, while holding no more
+than the scanning window whatever the input.
+"""
+import os
+import random
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.security.pii_redactor import PIIRedactor, PIIType
+
+redactor = PIIRedactor()
+
+PII_SAMPLES = [
+    "jane.doe@example.com", "4111 1111 1111 1111", "5500-0000-0000-0004",
+    "123-45-6789", "(555) 123-4567", "+1 555.987.6543", "192.168.10.42",
+    "account #12345678901", "routing 021000021",
+    # Longest email the pattern matches
+    "a" * 256 + "@" + "b" * 253 + "." + "c" * 63,
+    "x" * 80 + "@example.com", "account:" + " " * 12 + "12345678901",
+    # Local part past the cap: not matched, whole or chunked
+    "z" * 300 + "@example.com",
+]
+
+
+def _key(result):
+    text, matches = result
+    return text, [(m.pii_type, m.original_text, m.start_pos, m.end_pos) for m in matches]
+
+
+def _random_text(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        words = []
+        while len(words) < rng.randint(0, 400):
+            words.append(rng.choice(PII_SAMPLES) if rng.random() < 0.1 else "charge")
+        return " ".join(words)
+    alphabet = "0123456789" * 3 + "@.-_%+() #:" + "abcdeACrtnou" + "  \n"
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 2000)))
+
+
+def test_long_candidates_match_as_in_whole_text():
+    local = "customer." + "x" * 70
+    text = f"email {local}@example.com, account:{' ' * 8}#:  12345678901 and 123-45-6789."
+    found = [(m.pii_type, m.original_text) for m in redactor.detect_pii(text)]
+    assert found == [
+        (PIIType.EMAIL, f"{local}@example.com"),
+        (PIIType.ACCOUNT_NUMBER, f"account:{' ' * 8}#:  12345678901"),
+        (PIIType.SSN, "123-45-6789"),
+    ]
+    expected = _key(redactor.redact_text(text))
+    for chunk_size in (1, 16, 100):
+        assert _key(redactor.redact_text_chunked(text, chunk_size=chunk_size)) == expected
+
+
+def test_long_runs_do_not_grow_the_buffer():
+    pieces = ["card 4111 1111 1111 1111. "] + ["y" * 1000] * 200 + ["@example.com and more text. "] * 10
+    consumed = 0
+    pending = []
+
+    def chunks():
+        nonlocal consumed
+        for piece in pieces:
+            consumed += len(piece)
+            yield piece
+
+    output = ""
+    for segment, _ in redactor.iter_redact(chunks()):
+        output += segment
+        pending.append(consumed - len(output))
+    # Text keeps being committed through the run: never more than the
+    # window and one chunk is held back
+    assert len(pending) > 100
+    assert max(pending) <= redactor.max_match_length + 1 + 1000
+    assert output == redactor.redact_text("".join(pieces))[0]
+
+
+def test_patterns_have_a_maximum_match_length():
+    assert redactor.max_match_length == 256 + 1 + 253 + 1 + 63
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 383, 384, 4096])
+def test_chunked_output_identical_to_whole_text(chunk_size):
+    rng = random.Random(chunk_size)
+    for _ in range(60):
+        text = _random_text(rng)
+        expected = _key(redactor.redact_text(text))
+        assert _key(redactor.redact_text_chunked(text, chunk_size=chunk_size)) == expected
+
+
+def test_uneven_chunks_and_match_on_boundary():
+    text = "card 4111 1111 1111 1111 and ssn 123-45-6789, mail jane.doe@example.com."
+    expected = _key(redactor.redact_text(text))
+    rng = random.Random(3)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(text)), rng.randint(1, 10)))
+        chunks = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+        segments, matches = [], []
+        for segment, found in redactor.iter_redact(chunks):
+            segments.append(segment)
+            matches.extend(found)
+        assert _key(("".join(segments), matches)) == expected
+
+
+def test_segments_are_yielded_before_the_input_ends():
+    chunks = iter(["My card 4111 1111 1111 1111. "] + ["Nothing else to report. "] * 100)
+    output = ""
+    for segment, matches in redactor.iter_redact(chunks):
+        output += segment
+        if matches:
+            break
+    assert output.startswith("My card **** **** **** 1111")
+    assert [m.start_pos for m in matches] == [8]
+    # Only the chunks needed to fill the look-ahead window were consumed
+    assert len(list(chunks)) > 50
@@ -0,0 +1,148 @@
+"""
+PII pre-filter tests.
+
+The pre-filter may only skip texts that no pattern can match. The first
+tests prove this from the patterns themselves by walking their parse
+trees; the rest check it on generated and hand-picked texts.
+"""
+import os
+import random
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+from app.security.pii_redactor import PIIRedactor, PIIType
+
+redactor = PIIRedactor()
+
+
+def _is_digit_class(items) -> bool:
+    """True if an IN (character set) token only admits \\d characters"""
+    return all(
+        (op == sre_constants.CATEGORY and arg == sre_constants.CATEGORY_DIGIT)
+        or (op == sre_constants.LITERAL and chr(arg).isdigit())
+        or (op == sre_constants.RANGE and all(chr(c).isdigit() for c in range(arg[0], arg[1] + 1)))
+        for op, arg in items
+    )
+
+
+def min_digits(tokens) -> int:
+    """Lower bound on the number of \\d characters in any match"""
+    total = 0
+    for op, arg in tokens:
+        if op == sre_constants.LITERAL:
+            total += chr(arg).isdigit()
+        elif op == sre_constants.IN:
+            total += _is_digit_class(arg)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, _, sub = arg
+            total += low * min_digits(sub)
+        elif op == sre_constants.SUBPATTERN:
+            total += min_digits(arg[-1])
+        elif op == sre_constants.BRANCH:
+            total += min(min_digits(branch) for branch in arg[1])
+        # AT (anchors), ANY, NOT_LITERAL, categories etc. contribute nothing
+    return total
+
+
+def requires_literal(tokens, char: str) -> bool:
+    """True if every match must contain ``char`` as a literal"""
+    for op, arg in tokens:
+        if op == sre_constants.LITERAL and chr(arg) == char:
+            return True
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, _, sub = arg
+            if low > 0 and requires_literal(sub, char):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if requires_literal(arg[-1], char):
+                return True
+        elif op == sre_constants.BRANCH:
+            if all(requires_literal(branch, char) for branch in arg[1]):
+                return True
+    return False
+
+
+@pytest.mark.parametrize("pii_type", list(PIIRedactor.PATTERNS))
+def test_every_pattern_needs_at_sign_or_min_digits(pii_type):
+    """Proof: each pattern requires '@' or at least MIN_DIGITS digits"""
+    tokens = sre_parse.parse(redactor.patterns[pii_type].pattern)
+    assert requires_literal(tokens, "@") or min_digits(tokens) >= PIIRedactor.MIN_DIGITS
+
+
+def test_combined_scanner_needs_at_sign_or_min_digits():
+    tokens = sre_parse.parse(redactor.scanner.pattern)
+    branches = [arg for op, arg in tokens if op == sre_constants.BRANCH]
+    assert len(branches) == 1 and len(branches[0][1]) == len(PIIRedactor.PATTERNS)
+    for alternative in branches[0][1]:
+        assert requires_literal(alternative, "@") or min_digits(alternative) >= PIIRedactor.MIN_DIGITS
+
+
+def test_analysis_detects_weaker_patterns():
+    """The proof helpers would catch a pattern the pre-filter cannot cover"""
+    assert min_digits(sre_parse.parse(r'\b\d{3}\b')) == 3
+    assert min_digits(sre_parse.parse(r'(?:\d{2}|[0-9]{5})')) == 2
+    assert not requires_literal(sre_parse.parse(r'\w+(?:@\w+)?'), "@")
+
+
+SAMPLES = {
+    PIIType.EMAIL: ["a@b.co", "jane.doe+tag@mail.example.org"],
+    PIIType.CREDIT_CARD: ["4111 1111 1111 1111", "5500-0000-0000-0004", "6011000000000004"],
+    PIIType.ACCOUNT_NUMBER: ["account 12345678", "ACCT#1234567890123456"],
+    PIIType.ROUTING_NUMBER: ["routing: 021000021", "RTN 123456789"],
+    PIIType.SSN: ["123-45-6789", "123456789"],
+    PIIType.IP_ADDRESS: ["1.2.3.4", "255.255.255.255"],
+    PIIType.PHONE: ["(555) 123-4567", "+1 555.987.6543", "5551234567"],
+}
+
+
+@pytest.mark.parametrize("pii_type,text", [(t, s) for t, texts in SAMPLES.items() for s in texts])
+def test_known_pii_passes_prefilter(pii_type, text):
+    narrative = f"Customer wrote: {text} regarding the charge"
+    assert redactor.may_contain_pii(narrative)
+    assert pii_type in {m.pii_type for m in redactor.detect_pii(narrative)}
+
+
+def test_unicode_digits_are_not_skipped():
+    # \d matches any Unicode decimal digit, so the pre-filter must count them too
+    text = "ssn ١٢٣-٤٥-٦٧٨٩ noted"
+    assert redactor.scanner.search(text)
+    assert redactor.may_contain_pii(text)
+
+
+def test_no_false_negatives_on_generated_texts():
+    rng = random.Random(1234)
+    alphabet = "0123456789" * 3 + "١३" + "@.-_%+() #:" + "abcdeACrtnou" + "  "
+    scanned = 0
+    for _ in range(50_000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        if redactor.scanner.search(text):
+            scanned += 1
+            assert redactor.may_contain_pii(text), text
+    assert scanned > 100  # the generator does produce matching texts
+
+
+def test_skips_digit_free_narratives_and_reports_fraction():
+    local = PIIRedactor()
+    texts = [
+        "I was charged twice for the same order and want a refund.",
+        "The merchant never shipped my package.",
+        "Order 12 arrived damaged.",
+        "Please contact me at jane@example.com",
+    ]
+    for text in texts:
+        local.detect_pii(text)
+    stats = local.prefilter_stats()
+    assert stats["checked"] == 4
+    assert stats["skipped"] == 3
+    assert stats["skipped_fraction"] == 0.75
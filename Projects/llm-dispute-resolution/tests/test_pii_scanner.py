@@ -0,0 +1,97 @@
+"""
+Combined PII scanner tests: matches at one position follow the order of
+PATTERNS, overlapping matches are all redacted (nothing one scan per
+pattern masks is left in clear), and on input without overlapping
+candidates the single pass finds exactly what one scan per pattern finds.
+"""
+import os
+import random
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.security.pii_redactor import PIIMatch, PIIRedactor, PIIType
+
+redactor = PIIRedactor()
+
+PII_SAMPLES = [
+    "jane.doe@example.com", "4111 1111 1111 1111", "5500-0000-0000-0004",
+    "123-45-6789", "(555) 123-4567", "+1 555.987.6543", "192.168.10.42",
+    "acct: 12345678", "rtn 021000021",
+]
+
+
+def _key(matches):
+    return [(m.pii_type, m.original_text, m.start_pos, m.end_pos) for m in matches]
+
+
+def per_pattern_scan(text):
+    """The previous implementation: every pattern over the whole text"""
+    return sorted(
+        ((pii_type, m.group(), m.start(), m.end())
+         for pii_type, pattern in redactor.patterns.items() for m in pattern.finditer(text)),
+        key=lambda match: match[2],
+    )
+
+
+def per_pattern_redact(text):
+    """The previous redaction: every match spliced in, last first"""
+    for pii_type, original, start, end in reversed(per_pattern_scan(text)):
+        match = PIIMatch(pii_type, original, start, end, 0.8)
+        text = text[:start] + redactor._generate_redaction(match, "*") + text[end:]
+    return text
+
+
+def _cleartext(original, redacted):
+    """Positions left unchanged by a length-preserving redaction"""
+    assert len(redacted) == len(original)
+    return {i for i, (a, b) in enumerate(zip(original, redacted)) if a == b}
+
+
+def test_same_position_overlaps_follow_pattern_order():
+    # Each starts both an email and a card / SSN / IP address
+    for text, shadowed in [
+        ("4111111111111111@bank.com", PIIType.CREDIT_CARD),
+        ("123-45-6789@example.org", PIIType.SSN),
+        ("192.168.10.42@host.net", PIIType.IP_ADDRESS),
+    ]:
+        assert redactor.patterns[shadowed].match(text)
+        assert _key(redactor.detect_pii(text)) == [(PIIType.EMAIL, text, 0, len(text))]
+
+
+def test_overlapping_matches_are_all_redacted():
+    # A card number starting inside a reference or phone number is masked
+    # as well, keeping only its own last four digits
+    for text, expected in [
+        ("ref 869403\n4111 1111 1111 1111 ok", "ref ******\n**** **** **** 1111 ok"),
+        ("Call (555) 123-4567 4111 1111 1111 1111 thanks", "Call (***) ***-**** **** **** **** 1111 thanks"),
+    ]:
+        assert redactor.redact_text(text)[0] == expected
+        for chunk_size in (1, 5, 16):
+            assert redactor.redact_text_chunked(text, chunk_size=chunk_size)[0] == expected
+
+
+def test_nothing_masked_per_pattern_is_left_in_clear():
+    # No '@': every mask keeps the length, so positions can be compared
+    rng = random.Random(11)
+    alphabet = "0123456789" * 6 + ".-() #:" + "acnt" + "    \n"
+    for _ in range(1000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 300)))
+        redacted = redactor.redact_text(text)[0]
+        assert _cleartext(text, redacted) <= _cleartext(text, per_pattern_redact(text))
+        assert redactor.redact_text_chunked(text, chunk_size=rng.randint(1, 64))[0] == redacted
+
+
+def test_matches_per_pattern_scan_without_overlaps():
+    rng = random.Random(7)
+    checked = 0
+    for _ in range(300):
+        words = [rng.choice(PII_SAMPLES) if rng.random() < 0.3 else "charge" for _ in range(rng.randint(1, 40))]
+        text = " ".join(words)
+        expected = per_pattern_scan(text)
+        if any(a[3] > b[2] for a, b in zip(expected, expected[1:])):
+            continue  # overlapping candidates: covered by the priority tests
+        assert _key(redactor.detect_pii(text)) == expected
+        checked += 1
+    assert checked > 100
@@ -0,0 +1,120 @@
+"""
+PII vault tests: stable per-case tokens, reversal, bounds and disk spill.
+"""
+import asyncio
+import os
+import sys
+import threading
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cryptography.fernet import Fernet
+
+from app.security import pii_redactor as pii_redactor_module
+from app.security.pii_redactor import pii_redactor, sanitize_for_llm
+from app.security.vault import TOKEN_PATTERN, PIITokenVault
+from app.telemetry.audit import audit_case
+
+KEY = Fernet.generate_key().decode()
+
+
+def test_tokens_stable_within_a_case_and_unlinkable_across_cases():
+    vault = PIITokenVault(key=KEY, max_entries=100, spill_dir="")
+    token = vault.tokenize("case-1", "EMAIL", "jane@example.com")
+    assert TOKEN_PATTERN.fullmatch(token)
+    assert vault.tokenize("case-1", "EMAIL", "jane@example.com") == token
+    assert vault.tokenize("case-1", "EMAIL", "john@example.com") != token
+    assert vault.tokenize("case-2", "EMAIL", "jane@example.com") != token
+    assert asyncio.run(vault.detokenize("case-1", token)) == "jane@example.com"
+    assert asyncio.run(vault.detokenize("case-2", token)) is None
+
+
+def test_mappings_are_stored_encrypted():
+    vault = PIITokenVault(key=KEY, max_entries=100, spill_dir="")
+    vault.tokenize("case-1", "SSN", "123-45-6789")
+    stored = [value for value, _ in vault._entries._entries.values()]
+    assert stored and all(b"123-45-6789" not in value for value in stored)
+
+
+def test_redact_and_reverse_a_narrative():
+    vault = PIITokenVault(key=KEY, max_entries=100, spill_dir="")
+    text = "Email jane@example.com, card 4111 1111 1111 1111, again jane@example.com."
+    tokenized, matches = pii_redactor.redact_text(
+        text, replace=lambda m: vault.tokenize("case-1", m.pii_type.name, m.original_text)
+    )
+    tokens = TOKEN_PATTERN.findall(tokenized)
+    assert len(matches) == 3 and len(tokens) == 3
+    assert tokens[0] == tokens[2] and tokens[0][0] == "EMAIL"
+    assert asyncio.run(vault.detokenize_text("case-1", tokenized)) == text
+    # Unknown tokens are left alone
+    assert asyncio.run(vault.detokenize_text("case-2", tokenized)) == tokenized
+
+
+def test_size_bound_evicts_and_spills_to_disk(tmp_path):
+    vault = PIITokenVault(key=KEY, max_entries=2, spill_dir=str(tmp_path))
+    tokens = [vault.tokenize("case-1", "PHONE", f"555-010{i}") for i in range(5)]
+    assert len(vault._entries) == 2
+    assert [asyncio.run(vault.detokenize("case-1", t)) for t in tokens] == [f"555-010{i}" for i in range(5)]
+    spilled = "".join(open(tmp_path / name).read() for name in os.listdir(tmp_path))
+    assert "555-010" not in spilled
+
+    bounded = PIITokenVault(key=KEY, max_entries=2, spill_dir="")
+    tokens = [bounded.tokenize("case-1", "PHONE", f"555-010{i}") for i in range(5)]
+    assert asyncio.run(bounded.detokenize("case-1", tokens[0])) is None
+
+
+def test_expired_mappings_are_not_returned():
+    vault = PIITokenVault(key=KEY, max_entries=10, ttl_seconds=60, spill_dir="")
+    token = vault.tokenize("case-1", "SSN", "123-45-6789")
+    vault._entries.set(("case-1", token), vault._entries.get(("case-1", token)), expires_at=0)
+    assert asyncio.run(vault.detokenize("case-1", token)) is None
+
+
+def test_spilled_mappings_are_written_and_read_off_the_event_loop(tmp_path):
+    readers = []
+
+    async def run():
+        vault = PIITokenVault(key=KEY, max_entries=2, spill_dir=str(tmp_path))
+        read_spilled = vault._read_spilled
+
+        def recording_read(case_id):
+            readers.append(threading.get_ident())
+            return read_spilled(case_id)
+
+        vault._read_spilled = recording_read
+        tokens = [vault.tokenize("case-1", "PHONE", f"555-010{i}") for i in range(5)]
+        # Not written yet, but still readable from memory
+        before = os.listdir(tmp_path)
+        values = [await vault.detokenize("case-1", t) for t in tokens]
+        await vault.flush()
+        text = await vault.detokenize_text("case-1", " ".join(tokens))
+        return before, values, text, threading.get_ident()
+
+    before, values, text, loop_thread = asyncio.run(run())
+    assert before == []
+    assert values == [f"555-010{i}" for i in range(5)]
+    assert text == " ".join(values)
+    assert readers and loop_thread not in readers
+    (spilled,) = os.listdir(tmp_path)
+    assert len(open(tmp_path / spilled).readlines()) == 3
+
+
+def test_sanitize_for_llm_tokenizes_inside_a_case(monkeypatch):
+    text = "Reach me at jane@example.com or jane@example.com"
+    # Off by default: masks, even inside a case
+    with audit_case("case-41"):
+        masked, metadata = sanitize_for_llm(text)
+    assert not metadata["tokenized"] and "****@example.com" in masked
+
+    monkeypatch.setattr(
+        pii_redactor_module, "settings",
+        pii_redactor_module.settings.copy(update={"pii_tokenize_for_llm": True}),
+    )
+    masked, metadata = sanitize_for_llm(text)
+    assert not metadata["tokenized"] and "****@example.com" in masked
+
+    with audit_case("case-42"):
+        tokenized, metadata = sanitize_for_llm(text)
+    tokens = TOKEN_PATTERN.findall(tokenized)
+    assert metadata["tokenized"] and len(tokens) == 2 and tokens[0] == tokens[1]
@@ -0,0 +1,138 @@
+"""
+Schema and query-plan tests: the Alembic migrations build exactly the
+schema declared in the models, also on databases init_db created, and
+the hot analytics and ledger queries are planned as index searches on
+SQLite.
+"""
+import datetime as dt
+import os
+import sqlite3
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.dialects import sqlite
+
+from app.domain.models import (
+    Base, CustomerHourRollup, DisputeCase, MerchantHourRollup, MerchantRiskScore,
+    TransactionLedger,
+)
+
+PROJECT_DIR = os.path.join(os.path.dirname(__file__), '..')
+SINCE = dt.datetime(2026, 1, 1)
+
+
+def alembic_config(path):
+    config = Config(os.path.join(PROJECT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_DIR, "migrations"))
+    config.set_main_option("sqlalchemy.url", f"sqlite+aiosqlite:///{path}")
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def migrate(path):
+    config = alembic_config(path)
+    command.upgrade(config, "head")
+    return config
+
+
+def schema_diff(path):
+    with create_engine(f"sqlite:///{path}").connect() as conn:
+        return compare_metadata(MigrationContext.configure(conn), Base.metadata)
+
+
+def plan(db, stmt):
+    sql = str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    return " | ".join(row[3] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}"))
+
+
+def test_migrations_match_the_models(tmp_path):
+    path = tmp_path / "migrated.db"
+    config = migrate(path)
+    assert schema_diff(path) == []
+
+    command.downgrade(config, "0001")
+    db = sqlite3.connect(path)
+    assert db.execute("SELECT name FROM sqlite_master WHERE name LIKE 'ix_%'").fetchall() == []
+
+
+def test_databases_created_by_init_db_upgrade(tmp_path):
+    # Created by the current init_db: everything exists already
+    current = tmp_path / "current.db"
+    engine = create_engine(f"sqlite:///{current}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    config = alembic_config(current)
+    command.stamp(config, "0001")
+    command.upgrade(config, "head")
+    assert schema_diff(current) == []
+
+    # Created by an init_db before the migrations, then started once more:
+    # create_all added the new tables but no indexes or columns to old ones
+    older = tmp_path / "older.db"
+    config = alembic_config(older)
+    command.upgrade(config, "0001")
+    engine = create_engine(f"sqlite:///{older}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    command.upgrade(config, "head")
+    assert schema_diff(older) == []
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    path = tmp_path / "plans.db"
+    migrate(path)
+    db = sqlite3.connect(path)
+
+    window_scan = select(
+        DisputeCase.created_at, DisputeCase.merchant_id, DisputeCase.customer_id,
+        DisputeCase.amount_cents, DisputeCase.classification
+    ).where(DisputeCase.created_at >= SINCE)
+    assert "USING COVERING INDEX ix_dispute_case_created_window" in plan(db, window_scan)
+
+    merchant_window = select(DisputeCase.merchant_id, func.count()).where(
+        DisputeCase.created_at >= SINCE
+    ).group_by(DisputeCase.merchant_id)
+    # Either composite index covers it; both avoid reading the table
+    assert "USING COVERING INDEX ix_dispute_case_" in plan(db, merchant_window)
+
+    merchant_cases = select(DisputeCase).where(
+        DisputeCase.merchant_id == "m1", DisputeCase.created_at >= SINCE
+    )
+    assert "INDEX ix_dispute_case_merchant_created (merchant_id=? AND created_at>?)" in plan(db, merchant_cases)
+
+    customer_cases = select(DisputeCase).where(
+        DisputeCase.customer_id == "c1", DisputeCase.created_at >= SINCE
+    )
+    assert "INDEX ix_dispute_case_customer_created" in plan(db, customer_cases)
+
+    ledger = select(TransactionLedger).where(
+        TransactionLedger.customer_id == "c1",
+        TransactionLedger.occurred_at.between(1.7e9, 1.8e9)
+    ).order_by(TransactionLedger.occurred_at.desc())
+    ledger_plan = plan(db, ledger)
+    assert "INDEX ix_transaction_ledger_customer_time (customer_id=? AND occurred_at>? AND occurred_at<?)" in ledger_plan
+    assert "TEMP B-TREE" not in ledger_plan
+
+    merchant_rollup = select(func.sum(MerchantHourRollup.dispute_count)).where(
+        MerchantHourRollup.merchant_id == "m1", MerchantHourRollup.bucket_start >= SINCE
+    )
+    assert "INDEX ix_rollup_merchant_hour_merchant" in plan(db, merchant_rollup)
+
+    customer_rollup = select(CustomerHourRollup).where(
+        CustomerHourRollup.customer_id == "c1", CustomerHourRollup.bucket_start >= SINCE
+    )
+    assert "INDEX ix_rollup_customer_hour_customer" in plan(db, customer_rollup)
+
+    riskiest = select(MerchantRiskScore).where(MerchantRiskScore.window_days == 30).order_by(
+        MerchantRiskScore.risk_score.desc(), MerchantRiskScore.merchant_id.desc()
+    ).limit(100)
+    riskiest_plan = plan(db, riskiest)
+    assert "INDEX ix_merchant_risk_score_rank (window_days=?)" in riskiest_plan
+    assert "TEMP B-TREE" not in riskiest_plan
@@ -0,0 +1,66 @@
+"""
+Readiness tests: components report ready only once loaded, and a failed
+warm-up leaves the worker not ready instead of raising, then is retried
+with backoff until it loads.
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.telemetry.readiness import Readiness
+
+
+def test_ready_after_every_component_loads():
+    readiness = Readiness(["engines", "models"], started_at=time.time() - 5)
+    assert not readiness.ready
+    assert readiness.status()["time_to_ready_seconds"] is None
+
+    asyncio.run(readiness.load("engines", lambda: time.sleep(0.01)))
+    assert not readiness.ready
+    assert readiness.status()["components"]["engines"]["load_seconds"] >= 0.01
+
+    readiness.mark_ready("models", 0.5)
+    status = readiness.status()
+    assert status["ready"]
+    assert status["time_to_ready_seconds"] >= 5
+
+
+def test_failed_warm_up_is_reported_not_raised():
+    readiness = Readiness(["engines"])
+
+    def fail():
+        raise OSError("model not installed")
+
+    asyncio.run(readiness.load("engines", fail, max_attempts=1))
+    status = readiness.status()
+    assert not status["ready"]
+    assert status["components"]["engines"]["error"] == "OSError: model not installed"
+
+    readiness.mark_ready("engines", 1.0)
+    assert readiness.ready
+    assert "error" not in readiness.status()["components"]["engines"]
+
+
+def test_failed_warm_up_is_retried_with_backoff(monkeypatch):
+    readiness = Readiness(["engines"])
+    attempts = []
+    delays = []
+
+    def flaky():
+        attempts.append(len(attempts))
+        if len(attempts) < 4:
+            raise OSError("model server unavailable")
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr("app.telemetry.readiness.asyncio.sleep", sleep)
+    asyncio.run(readiness.load("engines", flaky, retry_delay=1.0, max_retry_delay=3.0))
+    assert len(attempts) == 4
+    assert delays == [1.0, 2.0, 3.0]
+    assert readiness.ready
+    assert "error" not in readiness.status()["components"]["engines"]
@@ -0,0 +1,47 @@
+"""
+Grouped robust statistics tests: vectorized medians, MADs and modified
+z-scores match a per-group computation.
+"""
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.intelligence.robust_stats import MAD_SCALE, MEAN_AD_SCALE, robust_zscores
+
+
+def test_matches_per_group_computation():
+    rng = np.random.default_rng(3)
+    codes = rng.integers(0, 40, 4000)
+    values = rng.integers(0, 100000, 4000)
+    # Group 5 has no spread but one outlier (MAD is 0); group 45 is empty
+    values[codes == 5] = 2500
+    values[np.flatnonzero(codes == 5)[0]] = 90000
+
+    zscores, stats = robust_zscores(codes, values, 50)
+
+    for group in range(50):
+        members = values[codes == group]
+        if not len(members):
+            assert stats.counts[group] == 0
+            continue
+        median = np.median(members)
+        mad = np.median(np.abs(members - median))
+        assert stats.median[group] == median
+        assert stats.mad[group] == mad
+        if mad > 0:
+            expected = MAD_SCALE * (members - median) / mad
+        else:
+            expected = (members - median) / (MEAN_AD_SCALE * np.mean(np.abs(members - median)))
+        assert np.allclose(zscores[codes == group], expected)
+
+    assert stats.mad[5] == 0 and zscores[codes == 5].max() > 3.5
+
+
+def test_constant_group_scores_zero():
+    zscores, stats = robust_zscores(np.zeros(4, dtype=np.int64), np.full(4, 700), 1)
+    assert stats.median[0] == 700
+    assert not zscores.any()
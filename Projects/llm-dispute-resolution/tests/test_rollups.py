@@ -0,0 +1,357 @@
+"""
+Rollup tests: incrementally maintained rollups match a rebuild from raw
+cases (which leaves the hours live cases update alone), and the detectors
+reading them agree with the raw data.
+"""
+import asyncio
+import dataclasses
+import datetime as dt
+import os
+import random
+import sys
+from collections import Counter, defaultdict
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.domain.models import (
+    Base, CustomerHourRollup, DisputeCase, LabelHourRollup, MerchantHourRollup,
+)
+from app.infra.db import db_state, get_session
+from app.intelligence import pattern_detector, rollups
+from app.intelligence.pattern_detector import PatternDetectionEngine, load_pattern_frame
+from app.intelligence.sketches import HyperLogLog
+
+LABELS = ["FRAUD_UNAUTHORIZED", "FRIENDLY_FRAUD_RISK", "MERCHANT_ERROR", "SERVICE_NOT_RECEIVED", None]
+
+
+def make_cases(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    now = dt.datetime.utcnow()
+    merchants = [f"m_{i}" for i in range(8)] + [None]
+    customers = [f"c_{i}" for i in range(40)] + [None]
+    cases = []
+    for i in range(n):
+        # Hot merchant and a burst at 03:00 so some detectors fire
+        merchant = "m_hot" if i % 7 == 0 else rng.choice(merchants)
+        created = now - dt.timedelta(hours=rng.randint(0, 24 * 40))
+        if i % 5 == 0:
+            created = created.replace(hour=3)
+        cases.append(DisputeCase(
+            id=f"case_{i}",
+            customer_id=rng.choice(customers),
+            merchant_id=merchant,
+            amount_cents=rng.choice([10000, 20000, rng.randint(100, 90000)]),
+            currency="USD",
+            narrative="n/a",
+            classification="FRAUD_UNAUTHORIZED" if merchant == "m_hot" else rng.choice(LABELS),
+            created_at=created.replace(minute=rng.randint(0, 59)),
+        ))
+    return cases
+
+
+@pytest.fixture
+def database(tmp_path):
+    async def setup():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rollups.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return engine
+
+    engine = asyncio.run(setup())
+    previous = db_state.engine, db_state.session_maker
+    db_state.engine = engine
+    db_state.session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    yield
+    db_state.engine, db_state.session_maker = previous
+    asyncio.run(engine.dispose())
+
+
+async def _insert_cases(cases):
+    for case in cases:
+        async with get_session() as session:
+            session.add(case)
+            await rollups.record_case(session, case)
+
+
+async def _rollup_rows():
+    async with get_session() as session:
+        rows = {}
+        for model in (MerchantHourRollup, CustomerHourRollup, LabelHourRollup):
+            table = model.__table__
+            result = await session.execute(select(table).order_by(*table.primary_key.columns))
+            rows[model.__tablename__] = [tuple(row) for row in result.all()]
+        return rows
+
+
+def test_incremental_rollups_equal_rebuild(database):
+    async def run():
+        await _insert_cases(make_cases(300))
+        incremental = await _rollup_rows()
+        async with get_session() as session:
+            assert await rollups.rebuild_rollups(session, batch_size=64) == 300
+        return incremental, await _rollup_rows()
+
+    incremental, rebuilt = asyncio.run(run())
+    assert incremental == rebuilt
+    assert all(incremental.values())
+
+
+def test_rebuild_leaves_live_hours_alone(database):
+    live = DisputeCase(
+        id="case_live", customer_id="c_live", merchant_id="m_live", amount_cents=1234,
+        currency="USD", narrative="n/a", classification="MERCHANT_ERROR",
+        created_at=dt.datetime.utcnow(),
+    )
+
+    async def run():
+        await _insert_cases(make_cases(200) + [live])
+        before = await _rollup_rows()
+        # Stands in for a case committed after the rebuild read dispute_case
+        async with get_session() as session:
+            await session.delete(await session.get(DisputeCase, "case_live"))
+        async with get_session() as session:
+            await rollups.rebuild_rollups(session, batch_size=64)
+        return before, await _rollup_rows()
+
+    before, after = asyncio.run(run())
+    assert after == before
+    assert any(row[1] == "m_live" for row in after["rollup_merchant_hour"])
+
+
+def test_detectors_agree_with_raw_cases(database):
+    cases = make_cases(400)
+    cutoff = rollups.hour_bucket(dt.datetime.utcnow() - dt.timedelta(days=30))
+    in_window = [c for c in cases if c.created_at >= cutoff]
+    engine = PatternDetectionEngine()
+
+    async def run():
+        await _insert_cases(cases)
+        frame = await load_pattern_frame(30)
+        return (
+            engine._detect_fraud_clusters(frame),
+            engine._detect_customer_anomalies(frame),
+            engine._detect_amount_anomalies(frame),
+            await engine.get_merchant_risk_score("m_hot", 30),
+            engine._detect_merchant_anomalies(frame),
+            engine._detect_time_anomalies(frame),
+        )
+
+    clusters, customer_alerts, amount_alerts, risk, merchant_alerts, time_alerts = asyncio.run(run())
+
+    fraud_by_merchant = Counter(c.merchant_id for c in in_window if c.merchant_id and rollups.is_fraud(c.classification))
+    assert {a.entities_involved[0]: a.metadata["fraud_count"] for a in clusters} == {
+        m: n for m, n in fraud_by_merchant.items() if n >= 5
+    }
+
+    merchants_by_customer = defaultdict(set)
+    for c in in_window:
+        if c.customer_id:
+            merchants_by_customer[c.customer_id].add(c.merchant_id)
+    for alert in customer_alerts:
+        customer = alert.entities_involved[0]
+        assert alert.metadata["dispute_count"] == sum(c.customer_id == customer for c in in_window)
+        assert alert.metadata["merchant_count"] == len(merchants_by_customer[customer] - {None})
+
+    rounds = [c for c in in_window if c.amount_cents % rollups.ROUND_AMOUNT_CENTS == 0]
+    assert amount_alerts and amount_alerts[0].metadata["round_disputes"] == len(rounds)
+    assert amount_alerts[0].metadata["total_disputes"] == len(in_window)
+
+    hot = [c for c in in_window if c.merchant_id == "m_hot"]
+    hot_alert = next(a for a in merchant_alerts if a.entities_involved == ["m_hot"])
+    assert hot_alert.metadata["total_disputes"] == len(hot)
+    assert [a.metadata["hour"] for a in time_alerts] == [3]
+
+    assert risk["stats"]["total_disputes"] == len(hot)
+    assert risk["stats"]["unique_customers"] == len({c.customer_id for c in hot} - {None})
+
+
+def test_merchant_amount_outliers(database):
+    now = dt.datetime.utcnow() - dt.timedelta(hours=1)
+    amounts = {
+        "m_steady": [2500 + 10 * i for i in range(20)] + [250000, 310000, 400000],
+        "m_noisy": [1000 * (i + 1) for i in range(20)] + [30000],
+        "m_small": [2500] * 5 + [500000] * 3,
+    }
+    cases = [
+        DisputeCase(
+            id=f"{merchant}_{i}", customer_id=f"c_{i}", merchant_id=merchant, amount_cents=amount,
+            currency="USD", narrative="n/a", classification="MERCHANT_ERROR", created_at=now
+        )
+        for merchant, values in amounts.items() for i, amount in enumerate(values)
+    ]
+    engine = PatternDetectionEngine()
+
+    async def run():
+        await _insert_cases(cases)
+        return await load_pattern_frame(1)
+
+    frame = asyncio.run(run())
+    # m_small has too few disputes to be scored, and m_noisy's histogram rules
+    # out 3 outliers, so only m_steady's amounts are read
+    assert list(frame.amounts.merchant_ids) == ["m_steady"]
+    assert len(frame.amounts) == len(amounts["m_steady"])
+    alerts = engine._detect_merchant_amount_outliers(frame)
+    assert [a.entities_involved for a in alerts] == [["m_steady"]]
+    metadata = alerts[0].metadata
+    assert metadata["outlier_count"] == 3
+    assert metadata["outlier_amounts"] == [400000, 310000, 250000]
+    assert metadata["median_amount"] == 2610  # 12th of the 23 amounts
+    assert metadata["max_abs_z_score"] > 10
+
+
+def test_amounts_read_only_for_scored_merchants(database, monkeypatch):
+    now = dt.datetime.utcnow() - dt.timedelta(hours=1)
+    cases = [
+        DisputeCase(
+            id=f"{merchant}_{i}", customer_id=f"c_{i}", merchant_id=merchant, amount_cents=2500 + i,
+            currency="USD", narrative="n/a", classification="MERCHANT_ERROR", created_at=now
+        )
+        for merchant, count in (("m_a", 12), ("m_b", 10), ("m_c", 9)) for i in range(count)
+    ]
+
+    async def run():
+        await _insert_cases(cases[-9:])
+        few = await load_pattern_frame(1)
+        await _insert_cases(cases[:-9])
+        filtered = await load_pattern_frame(1)
+        # Past the merchant limit the window is scanned once instead
+        monkeypatch.setattr(pattern_detector, "MAX_AMOUNT_MERCHANTS", 1)
+        scanned = await load_pattern_frame(1)
+        return few, filtered, scanned
+
+    few, filtered, scanned = asyncio.run(run())
+    assert len(few.amounts) == 0
+    assert sorted(filtered.amounts.merchant_ids) == ["m_a", "m_b"] and len(filtered.amounts) == 22
+    assert sorted(scanned.amounts.merchant_ids) == ["m_a", "m_b", "m_c"] and len(scanned.amounts) == 31
+
+
+def test_histograms_skip_only_merchants_without_outliers(database):
+    rng = random.Random(3)
+    now = dt.datetime.utcnow() - dt.timedelta(hours=1)
+    cases = []
+    for m in range(60):
+        typical = rng.lognormvariate(8, 1)
+        spread = rng.choice([0.002, 0.05, 0.3, 1.0])
+        amounts = [int(typical * rng.lognormvariate(0, spread)) + 1 for _ in range(rng.randint(8, 40))]
+        amounts += [int(typical * rng.choice([0.05, 20, 60])) for _ in range(rng.randint(0, 4))]
+        cases += [
+            DisputeCase(
+                id=f"m_{m}_{i}", customer_id=f"c_{i}", merchant_id=f"m_{m}", amount_cents=amount,
+                currency="USD", narrative="n/a", classification="MERCHANT_ERROR",
+                created_at=now - dt.timedelta(hours=rng.randint(0, 20))
+            )
+            for i, amount in enumerate(amounts)
+        ]
+    engine = PatternDetectionEngine()
+
+    async def frames():
+        frame = await load_pattern_frame(2)
+        scored = frame.merchant_totals.index[frame.merchant_totals["dispute_count"] >= 10].tolist()
+        async with get_session() as session:
+            since = rollups.hour_bucket(dt.datetime.utcnow() - dt.timedelta(days=2))
+            every = await pattern_detector._read_case_amounts(session, since, scored)
+        return frame, dataclasses.replace(frame, amounts=every)
+
+    def outliers(frame):
+        return [
+            (a.entities_involved, a.metadata["outlier_count"], a.metadata["outlier_amounts"])
+            for a in engine._detect_merchant_amount_outliers(frame)
+        ]
+
+    async def run():
+        await _insert_cases(cases)
+        binned = await frames()
+        # Hours rolled up before the histograms existed are always read
+        async with get_session() as session:
+            await session.execute(update(MerchantHourRollup).values(amount_hist=None))
+        return binned, await frames()
+
+    (frame, every), (unbinned, _) = asyncio.run(run())
+    assert 0 < len(frame.amounts.merchant_ids) < len(every.amounts.merchant_ids)
+    assert outliers(frame) == outliers(every) != []
+    assert sorted(unbinned.amounts.merchant_ids) == sorted(every.amounts.merchant_ids)
+
+
+def test_analysis_reads_the_window_once(database):
+    engine = PatternDetectionEngine()
+
+    async def run():
+        await _insert_cases(make_cases(200))
+        frame = await load_pattern_frame(30)
+        alerts = await engine.analyze_dispute_patterns(30)
+        return frame, alerts
+
+    frame, alerts = asyncio.run(run())
+    detected = [
+        detector(frame) for detector in (
+            engine._detect_fraud_clusters, engine._detect_merchant_anomalies,
+            engine._detect_customer_anomalies, engine._detect_time_anomalies,
+            engine._detect_amount_anomalies,
+        )
+    ]
+    assert len(alerts) == sum(len(found) for found in detected) > 0
+    assert engine.last_analysis["rows_read"] == frame.rows_read > 0
+    assert engine.last_analysis["wall_ms"] > 0
+
+
+def test_distinct_counts_match_merging_each_key(database):
+    async def run():
+        await _insert_cases(make_cases(300))
+        return await load_pattern_frame(30)
+
+    frame = asyncio.run(run())
+    for rows, key_column, sketch_column, distinct in [
+        (frame.merchants, "merchant_id", "customers_hll", frame.distinct_customers),
+        (frame.customers, "customer_id", "merchants_hll", frame.distinct_merchants),
+    ]:
+        keys = set(rows[key_column])
+        assert len(keys) > 1
+        for key in keys:
+            merged = None
+            for data in rows.loc[rows[key_column] == key, sketch_column].dropna():
+                sketch = HyperLogLog.from_bytes(data)
+                merged = sketch if merged is None else merged.merge(sketch)
+            assert distinct(key) == (merged.count() if merged is not None else 0)
+        assert distinct("unknown") == 0
+
+
+def test_empty_window():
+    engine = PatternDetectionEngine()
+    empty = asyncio.run(_empty_frame())
+    for detector in (
+        engine._detect_fraud_clusters, engine._detect_merchant_anomalies,
+        engine._detect_customer_anomalies, engine._detect_time_anomalies,
+        engine._detect_amount_anomalies,
+    ):
+        assert detector(empty) == []
+
+
+async def _empty_frame():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    previous = db_state.engine, db_state.session_maker
+    db_state.engine, db_state.session_maker = engine, async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        return await load_pattern_frame(30)
+    finally:
+        db_state.engine, db_state.session_maker = previous
+        await engine.dispose()
+
+
+def test_hyperloglog_accuracy_and_merge():
+    left, right = HyperLogLog(10), HyperLogLog(10)
+    for i in range(20000):
+        (left if i % 2 else right).add(f"customer-{i}")
+    merged = HyperLogLog.from_bytes(left.to_bytes()).merge(right)
+    assert abs(merged.count() - 20000) / 20000 < 0.1
+    small = HyperLogLog(8)
+    for i in range(12):
+        small.add(f"m-{i % 6}")
+    assert small.count() == 6
@@ -0,0 +1,152 @@
+"""
+Security middleware tests: API-key authentication, rate limiting with
+RateLimit-* / Retry-After headers, exempt paths, and the access events
+queued for the access log, never the dispute audit log.
+"""
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.security import middleware
+from app.security.auth import RateLimiter, SecurityManager
+from app.security.middleware import ACCESS_LOG_KEY, SecurityMiddleware
+
+API_KEY = "test-key-123"
+
+
+class RecordingLog:
+    def __init__(self):
+        self.events = []
+
+    def append_many(self, key, events):
+        self.events.extend((key, event) for event in events)
+
+
+class Response(SimpleNamespace):
+    def json(self):
+        return json.loads(self.body)
+
+
+async def endpoint(scope, receive, send):
+    """Inner ASGI app: 200 everywhere except /v1/boom"""
+    if scope["path"] == "/v1/boom":
+        raise RuntimeError("handler failed")
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b'{"ok": true}'})
+
+
+class Client:
+    """Calls the middleware with a minimal HTTP scope"""
+
+    def __init__(self):
+        security = SecurityManager(api_keys=[API_KEY])
+        security.rate_limiter = RateLimiter(rate_per_minute=60, burst=2)
+        self.state = SimpleNamespace(security=security)
+        self.app = SecurityMiddleware(endpoint)
+
+    def get(self, path, headers=None):
+        scope = {
+            "type": "http", "method": "GET", "path": path,
+            "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+            "app": SimpleNamespace(state=self.state),
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            try:
+                await self.app(scope, receive, send)
+            except RuntimeError:
+                pass  # the server would answer 500
+        asyncio.run(run())
+        if not messages:
+            return Response(status_code=500, headers={}, body=b"")
+        start = messages[0]
+        # ASGI header names are lower case
+        return Response(
+            status_code=start["status"],
+            headers={k.decode().lower(): v.decode() for k, v in start["headers"]},
+            body=b"".join(m.get("body", b"") for m in messages[1:]),
+        )
+
+
+@pytest.fixture
+def client(monkeypatch):
+    access_log = RecordingLog()
+    monkeypatch.setattr(middleware, "access_log", access_log)
+    monkeypatch.setattr(middleware, "settings", middleware.settings.copy(update={"enable_audit_logging": True}))
+    return Client(), access_log
+
+
+def test_missing_or_invalid_key_is_rejected(client):
+    test_client, access_log = client
+    for headers in ({}, {"x-api-key": "wrong"}):
+        response = test_client.get("/v1/ping", headers=headers)
+        assert response.status_code == 401
+        assert response.json() == {"detail": "Invalid API key"}
+
+    assert [(key, e["step"], e["status"]) for key, e in access_log.events] == [
+        (ACCESS_LOG_KEY, "AUTH_FAILURE", 401), (ACCESS_LOG_KEY, "AUTH_FAILURE", 401),
+    ]
+    assert access_log.events[0][1]["user_id"] == "anonymous"
+    # Only a short fingerprint of a presented key is logged
+    assert access_log.events[1][1]["user_id"] != "wrong" and len(access_log.events[1][1]["user_id"]) == 12
+
+
+def test_allowed_requests_carry_rate_limit_headers(client):
+    test_client, access_log = client
+    response = test_client.get("/v1/ping", headers={"x-api-key": API_KEY})
+
+    assert response.status_code == 200
+    assert response.headers["ratelimit-limit"] == "2"
+    assert response.headers["ratelimit-remaining"] == "1"
+    assert int(response.headers["ratelimit-reset"]) >= 1
+    assert "retry-after" not in response.headers
+
+    (key, event), = access_log.events
+    assert (key, event["step"], event["status"], event["success"]) == (ACCESS_LOG_KEY, "ACCESS", 200, True)
+    assert (event["resource"], event["action"]) == ("/v1/ping", "GET")
+    assert API_KEY not in str(event)
+
+
+def test_rate_limited_requests_get_429_with_retry_after(client):
+    test_client, access_log = client
+    statuses = [test_client.get("/v1/ping", headers={"x-api-key": API_KEY}) for _ in range(3)]
+
+    assert [r.status_code for r in statuses] == [200, 200, 429]
+    limited = statuses[-1]
+    assert limited.json() == {"detail": "Rate limit exceeded"}
+    assert limited.headers["ratelimit-remaining"] == "0"
+    assert int(limited.headers["retry-after"]) >= 1
+    assert [e["step"] for _, e in access_log.events] == ["ACCESS", "ACCESS", "RATE_LIMITED"]
+
+
+def test_exempt_paths_skip_auth_limits_and_logging(client):
+    test_client, access_log = client
+    responses = [test_client.get("/health") for _ in range(5)]
+
+    assert all(r.status_code == 200 for r in responses)
+    assert all("ratelimit-limit" not in r.headers for r in responses)
+    assert access_log.events == []
+
+
+def test_handler_errors_are_logged(client):
+    test_client, access_log = client
+    response = test_client.get("/v1/boom", headers={"x-api-key": API_KEY})
+
+    assert response.status_code == 500
+    (_, event), = access_log.events
+    assert event["success"] is False
+    assert event["details"] == {"error": "handler failed"}
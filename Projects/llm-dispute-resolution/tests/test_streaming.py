@@ -0,0 +1,121 @@
+"""
+Streaming pattern detection tests: thresholds fire on the crossing event,
+once per severity level, windows slide and re-arm, and memory stays bounded.
+"""
+import datetime as dt
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.domain.models import DisputeCase
+from app.intelligence.pattern_detector import AlertSeverity, PatternType
+from app.intelligence.streaming import StreamingPatternDetector, WindowCounter
+
+START = dt.datetime(2026, 3, 1, 12, 0)
+
+
+def case(i, at, merchant="m_1", customer=None, label="FRAUD_UNAUTHORIZED"):
+    return DisputeCase(
+        id=f"case_{i}", merchant_id=merchant, customer_id=customer or f"c_{i}",
+        amount_cents=5000, currency="USD", narrative="n/a", classification=label, created_at=at
+    )
+
+
+def detector(**overrides):
+    options = dict(window_seconds=3600, bucket_seconds=300, max_entities=1000, max_alerts=100)
+    options.update(overrides)
+    return StreamingPatternDetector(**options)
+
+
+def now_of(at):
+    return at.replace(tzinfo=dt.timezone.utc).timestamp()
+
+
+def clusters(alerts):
+    return [a for a in alerts if a.pattern_type == PatternType.FRAUD_CLUSTER]
+
+
+def test_fraud_burst_fires_on_the_crossing_case():
+    stream = detector()
+    fired = []
+    for i in range(12):
+        at = START + dt.timedelta(minutes=i)
+        fired.append(clusters(stream.observe(case(i, at), now=now_of(at))))
+
+    # 5th fraud case: MEDIUM; 10th: HIGH; nothing in between or after
+    assert [i for i, alerts in enumerate(fired) if alerts] == [4, 9]
+    assert fired[4][0].severity == AlertSeverity.MEDIUM
+    assert fired[4][0].metadata["fraud_count"] == 5
+    assert fired[9][0].severity == AlertSeverity.HIGH
+    assert clusters(stream.recent_alerts())[0].severity == AlertSeverity.HIGH
+
+
+def test_window_slides_and_rearms():
+    stream = detector()
+    for i in range(5):
+        at = START + dt.timedelta(minutes=i)
+        stream.observe(case(i, at), now=now_of(at))
+    assert len(clusters(stream.recent_alerts())) == 1
+
+    # Two hours later the first burst has left the window: a new one alerts again
+    later = START + dt.timedelta(hours=2)
+    fired = []
+    for i in range(5, 10):
+        at = later + dt.timedelta(minutes=i)
+        fired.extend(clusters(stream.observe(case(i, at), now=now_of(at))))
+    assert len(fired) == 1 and fired[0].metadata["fraud_count"] == 5
+
+    # Cases spread wider than the window never reach the threshold
+    spread = detector()
+    for i in range(20):
+        at = START + dt.timedelta(minutes=15 * i)
+        assert not clusters(spread.observe(case(i, at), now=now_of(at)))
+
+
+def test_late_events_and_customer_bursts():
+    stream = detector()
+    stream.observe(case(0, START, label="MERCHANT_ERROR"), now=now_of(START))
+    stale = START - dt.timedelta(hours=2)
+    stream.observe(case(1, stale, label="MERCHANT_ERROR"), now=now_of(START))
+    assert stream.stats()["late_events"] == 1
+
+    fired = []
+    for i in range(8):
+        at = START + dt.timedelta(minutes=i)
+        fired.extend(stream.observe(
+            case(10 + i, at, merchant=f"m_{i}", customer="c_busy", label="MERCHANT_ERROR"), now=now_of(at)
+        ))
+    assert [(a.pattern_type, a.severity) for a in fired] == [
+        (PatternType.CUSTOMER_ANOMALY, AlertSeverity.MEDIUM),
+        (PatternType.CUSTOMER_ANOMALY, AlertSeverity.HIGH),
+    ]
+
+
+def test_memory_is_bounded():
+    stream = detector(max_entities=50, max_alerts=10)
+    # Many one-off merchants, then a few hot ones firing more alerts than are kept
+    for i in range(5000):
+        at = START + dt.timedelta(seconds=i)
+        stream.observe(case(i, at, merchant=f"m_{i}"), now=now_of(at))
+    for i in range(5000, 5100):
+        at = START + dt.timedelta(seconds=i)
+        stream.observe(case(i, at, merchant=f"hot_{i % 10}"), now=now_of(at))
+    stats = stream.stats()
+    assert stats["merchants_tracked"] == 50
+    assert stats["customers_tracked"] == 50
+    assert stats["alerts_buffered"] == 10
+
+
+def test_window_counter_expires_buckets():
+    counter = WindowCounter(4)
+    counter.add(10, 1, 1, 100)
+    counter.add(12, 1, 0, 50)
+    counter.add(11, 1, 0, 25)  # out of order, still in the window
+    assert counter.totals == [3, 1, 175]
+    counter.advance(14)  # bucket 10 leaves the window
+    assert counter.totals == [2, 0, 75]
+    assert not counter.add(10, 1, 0, 1)
+    counter.advance(1000)  # long gap: one pass over the ring
+    assert counter.totals == [0, 0, 0]
@@ -0,0 +1,86 @@
+"""
+Tracing tests: nested spans share the root's trace and parent links,
+a trace is exported once when its root ends (spans ending afterwards are
+dropped), and the ring buffer keeps the newest traces and filters slow ones.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.telemetry.tracing import RingBufferExporter, Tracer
+
+
+class Recorder:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+def test_children_nest_under_the_root():
+    recorder = Recorder()
+    tracer = Tracer(exporters=[recorder])
+    with tracer.span("request", route="/v1/disputes") as root:
+        with tracer.span("classify") as child:
+            with tracer.span("llm.call") as grandchild:
+                pass
+        with pytest.raises(ValueError):
+            with tracer.span("recommend"):
+                raise ValueError("bad")
+
+    (spans,) = recorder.traces
+    assert [s.name for s in spans] == ["llm.call", "classify", "recommend", "request"]
+    assert {s.trace_id for s in spans} == {root.trace_id}
+    assert root.parent_id is None
+    assert child.parent_id == root.span_id and grandchild.parent_id == child.span_id
+    assert spans[2].status == "ERROR" and spans[2].attributes["error"] == "ValueError: bad"
+    assert root.attributes == {"route": "/v1/disputes"}
+
+    # A new root starts a new trace
+    with tracer.span("next") as other:
+        pass
+    assert other.trace_id != root.trace_id and len(recorder.traces) == 2
+
+
+def test_spans_ending_after_the_root_are_not_attached():
+    recorder = Recorder()
+    tracer = Tracer(exporters=[recorder])
+
+    async def run():
+        release = asyncio.Event()
+
+        async def background():
+            with tracer.span("late"):
+                await release.wait()
+
+        with tracer.span("request"):
+            task = asyncio.create_task(background())
+            await asyncio.sleep(0)  # the task's span starts inside the trace
+        exported = list(recorder.traces[0])
+        release.set()
+        await task
+        return exported
+
+    exported = asyncio.run(run())
+    assert [s.name for s in exported] == ["request"]
+    assert [[s.name for s in spans] for spans in recorder.traces] == [["request"]]
+
+
+def test_ring_buffer_keeps_recent_and_filters_slow_traces():
+    buffer = RingBufferExporter(capacity=3)
+    tracer = Tracer(exporters=[buffer])
+    for i, duration_ms in enumerate([50, 5, 80, 120, 1]):
+        with tracer.span(f"request-{i}") as root:
+            pass
+        root.end_ns = root.start_ns + duration_ms * 1_000_000
+
+    # Capacity 3: requests 0 and 1 have been dropped; newest first
+    assert [spans[-1].name for spans in buffer.recent()] == ["request-4", "request-3", "request-2"]
+    assert [spans[-1].name for spans in buffer.recent(min_duration_ms=60)] == ["request-3", "request-2"]
+    assert [spans[-1].name for spans in buffer.recent(min_duration_ms=60, limit=1)] == ["request-3"]